@@ -0,0 +1,6 @@
+'''
+Admin page for the analytics app.
+'''
+
+
+# Register your models here.
@@ -0,0 +1,28 @@
+"""
+Management command rolling up locker occupancy from the RentEvent log.
+
+Run it every few minutes (e.g. from cron):
+
+    python manage.py rollup_occupancy
+"""
+
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from analytics.rollup import run_rollup
+
+
+class Command(BaseCommand):
+    """
+    Add the RentEvents appended since the last run to the hourly occupancy rollup.
+    """
+    help = 'Roll up RentEvents appended since the last run into hourly occupancy rows.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of events processed per transaction.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        processed = run_rollup(batch_size=options['batch_size'])
+        self.stdout.write(f'Rolled up {processed} events.')
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('bloqId', models.CharField(blank=True, max_length=255)),
+                ('size', models.CharField(choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], max_length=2)),
+                ('lockers', models.PositiveIntegerField(default=0)),
+                ('dropoffs', models.PositiveIntegerField(default=0)),
+                ('pickups', models.PositiveIntegerField(default=0)),
+                ('occupiedSeconds', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OccupancyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bloqId', models.CharField(max_length=255)),
+                ('size', models.CharField(choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], max_length=2)),
+                ('occupied', models.IntegerField(default=0)),
+                ('accruedUntil', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('lastEventId', models.BigIntegerField(default=0)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='occupancystate',
+            constraint=models.UniqueConstraint(fields=('bloqId', 'size'), name='analytics_state_bloq_size'),
+        ),
+        migrations.AddConstraint(
+            model_name='occupancyrollup',
+            constraint=models.UniqueConstraint(fields=('bloqId', 'bucket', 'size'), name='analytics_rollup_bloq_bucket_size'),
+        ),
+    ]
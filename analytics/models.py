@@ -0,0 +1,79 @@
+'''
+Models for the Analytics app.
+
+Occupancy is rolled up per hour from the RentEvent log by the
+``rollup_occupancy`` command. Every row is kept per Bloq and locker size, and
+once more for the whole fleet (``bloqId`` set to ``FLEET``), so dashboards
+read a few hundred pre-aggregated rows instead of scanning Lockers and Rents.
+'''
+from django.db import models
+from locker.models import LockerSize
+
+FLEET = ''
+
+
+class OccupancyRollup(models.Model):
+    '''
+    Hourly occupancy of the lockers of one size in a Bloq (or the fleet).
+    '''
+    bucket = models.DateTimeField()
+    bloqId = models.CharField(max_length=255, blank=True)
+    size = models.CharField(max_length=2, choices=LockerSize.choices)
+    lockers = models.PositiveIntegerField(default=0)
+    dropoffs = models.PositiveIntegerField(default=0)
+    pickups = models.PositiveIntegerField(default=0)
+    occupiedSeconds = models.FloatField(default=0)
+
+    objects = models.Manager()
+
+    class Meta:
+        '''
+        Meta class for OccupancyRollup.
+        '''
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bloqId', 'bucket', 'size'], name='analytics_rollup_bloq_bucket_size'
+            ),
+        ]
+
+    def __str__(self):
+        return f"OccupancyRollup {self.bloqId or 'fleet'} {self.size} {self.bucket:%Y-%m-%d %H:00}"
+
+
+class OccupancyState(models.Model):
+    '''
+    Number of occupied lockers of one size in a Bloq, as of ``accruedUntil``.
+    '''
+    bloqId = models.CharField(max_length=255)
+    size = models.CharField(max_length=2, choices=LockerSize.choices)
+    occupied = models.IntegerField(default=0)
+    accruedUntil = models.DateTimeField()
+
+    objects = models.Manager()
+
+    class Meta:
+        '''
+        Meta class for OccupancyState.
+        '''
+        constraints = [
+            models.UniqueConstraint(fields=['bloqId', 'size'], name='analytics_state_bloq_size'),
+        ]
+
+    def __str__(self):
+        return f"OccupancyState {self.bloqId} {self.size} {self.occupied}"
+
+
+class RollupWatermark(models.Model):
+    '''
+    ID of the last RentEvent rolled up from a shard.
+
+    One row per shard, numbered from 1 in ``DATABASE_SHARDS`` order.
+    '''
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    lastEventId = models.BigIntegerField(default=0)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"RollupWatermark {self.lastEventId}"
@@ -0,0 +1,288 @@
+"""
+Incremental occupancy rollup.
+
+Each run reads the RentEvent rows appended since the watermark of each shard,
+in ID order, replays them against the per Bloq and size occupancy state and adds the
+resulting dropoffs, pickups and occupied seconds to the hourly rollup rows.
+Events younger than ``lag`` are left for the next run, so transactions that
+were still open when their event ID was allocated are not skipped.
+
+Each batch only reads and writes the states of the Bloqs and sizes its events
+touch. Once every shard is caught up, one pass accounts for the time every
+Locker spent in its state since; it reads the states still behind the cutoff
+in batches and moves them to the cutoff with one UPDATE per batch.
+
+Occupancy and capacity are both counted by the size of the Locker (a Rent may
+fit a larger Locker than its own size), and the capacity is read once per run.
+"""
+
+import datetime
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from locker.models import Locker
+from project_bloq import sharding
+from project_bloq.operations import batches
+from rent.models import RentEvent, RentEventType
+from .models import FLEET, OccupancyRollup, OccupancyState, RollupWatermark
+
+HOUR = datetime.timedelta(hours=1)
+# Size key of the Lockers without a size.
+UNSIZED = ''
+
+Key = Tuple[str, str]
+RollupKey = Tuple[str, str, datetime.datetime]
+
+
+def hour_bucket(moment: datetime.datetime) -> datetime.datetime:
+    """
+    Return the start of the hour containing the given moment.
+    """
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class Totals:
+    """
+    Rollup increments of one hourly row.
+    """
+    __slots__ = ('dropoffs', 'pickups', 'occupied_seconds')
+
+    def __init__(self) -> None:
+        self.dropoffs = 0
+        self.pickups = 0
+        self.occupied_seconds = 0.0
+
+
+def accrue(state: OccupancyState, until: datetime.datetime,
+           totals: Dict[RollupKey, Totals]) -> None:
+    """
+    Add the occupied seconds of a state up to ``until``, split by hour.
+    """
+    start = state.accruedUntil
+    while start < until:
+        bucket = hour_bucket(start)
+        end = min(bucket + HOUR, until)
+        totals[(state.bloqId, state.size, bucket)].occupied_seconds += (
+            state.occupied * (end - start).total_seconds()
+        )
+        start = end
+    state.accruedUntil = max(state.accruedUntil, until)
+
+
+def locker_capacity() -> Dict[Key, int]:
+    """
+    Count the Lockers per Bloq and size, and per size for the whole fleet.
+    """
+    capacity: Dict[Key, int] = defaultdict(int)
+    for queryset in sharding.each_shard(Locker.objects.all()):
+        for row in queryset.values('bloqId__id', 'size').annotate(total=Count('key')):
+            size = row['size'] or UNSIZED
+            capacity[(row['bloqId__id'], size)] += row['total']
+            capacity[(FLEET, size)] += row['total']
+    return capacity
+
+
+def locker_sizes(events: Iterable[dict]) -> Dict[str, str]:
+    """
+    Return the size of the Locker of each event, by Locker ID.
+
+    Events of Lockers that no longer exist are left out.
+    """
+    by_shard = defaultdict(set)
+    for event in events:
+        by_shard[sharding.shard_for_bloq(event['bloqId'])].add(event['lockerId'])
+    sizes: Dict[str, str] = {}
+    for alias, locker_ids in by_shard.items():
+        for locker_id, size in (Locker.objects.using(alias).filter(id__in=locker_ids)
+                                .values_list('id', 'size')):
+            sizes[locker_id] = size or UNSIZED
+    return sizes
+
+
+def event_key(event: dict, sizes: Dict[str, str]) -> Key:
+    """
+    Return the Bloq and size an event is counted by.
+
+    Events are counted by the size of their Locker, or by the Rent's size if the
+    Locker is gone.
+    """
+    return event['bloqId'], sizes.get(event['lockerId'], event['size'])
+
+
+def replay(events: Iterable[dict], sizes: Dict[str, str], states: Dict[Key, OccupancyState],
+           totals: Dict[RollupKey, Totals]) -> None:
+    """
+    Apply events to the occupancy states, collecting hourly totals.
+
+    Args:
+        events (Iterable[dict]): The events, in ID order.
+        sizes (Dict[str, str]): The size of the Locker of each event (see locker_sizes).
+        states (Dict[Key, OccupancyState]): The states of the events' keys, completed
+            with new states for keys without one.
+        totals (Dict[RollupKey, Totals]): The hourly totals to add to.
+    """
+    for event in events:
+        key = event_key(event, sizes)
+        moment = event['createdAt']
+        state = states.get(key)
+        if state is None:
+            state = states[key] = OccupancyState(
+                bloqId=key[0], size=key[1], occupied=0, accruedUntil=moment
+            )
+        accrue(state, moment, totals)
+        row = totals[(key[0], key[1], hour_bucket(moment))]
+        if event['eventType'] == RentEventType.DROPOFF:
+            state.occupied += 1
+            row.dropoffs += 1
+        elif event['eventType'] == RentEventType.PICKUP:
+            state.occupied = max(state.occupied - 1, 0)
+            row.pickups += 1
+
+
+def save_totals(totals: Dict[RollupKey, Totals], capacity: Dict[Key, int]) -> int:
+    """
+    Add hourly totals to the per Bloq and fleet rollup rows.
+
+    Args:
+        totals (Dict[RollupKey, Totals]): The increments per Bloq, size and hour.
+        capacity (Dict[Key, int]): The number of Lockers per Bloq (or fleet) and size.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    fleet: Dict[RollupKey, Totals] = defaultdict(Totals)
+    for (_, size, bucket), row in totals.items():
+        target = fleet[(FLEET, size, bucket)]
+        target.dropoffs += row.dropoffs
+        target.pickups += row.pickups
+        target.occupied_seconds += row.occupied_seconds
+    merged = {**totals, **fleet}
+    if not merged:
+        return 0
+
+    buckets = {bucket for _, _, bucket in merged}
+    existing = {
+        (row.bloqId, row.size, row.bucket): row
+        for row in OccupancyRollup.objects.filter(
+            bucket__in=buckets, bloqId__in={bloq for bloq, _, _ in merged}
+        )
+    }
+    created: List[OccupancyRollup] = []
+    updated: List[OccupancyRollup] = []
+    for key, row in merged.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = OccupancyRollup(bloqId=key[0], size=key[1], bucket=key[2])
+            created.append(rollup)
+        else:
+            updated.append(rollup)
+        rollup.lockers = capacity.get((key[0], key[1]), 0)
+        rollup.dropoffs += row.dropoffs
+        rollup.pickups += row.pickups
+        rollup.occupiedSeconds += row.occupied_seconds
+    OccupancyRollup.objects.bulk_create(created, batch_size=1000)
+    OccupancyRollup.objects.bulk_update(
+        updated, ['lockers', 'dropoffs', 'pickups', 'occupiedSeconds'], batch_size=1000
+    )
+    return len(merged)
+
+
+def run_batch(alias: str, batch_size: int, cutoff: datetime.datetime,
+              capacity: Dict[Key, int]) -> Tuple[int, bool]:
+    """
+    Roll up one batch of the events of a shard older than ``cutoff``.
+
+    Returns:
+        Tuple[int, bool]: The number of events processed and whether events
+        older than the cutoff remain.
+    """
+    shard_map = sharding.get_shard_map()
+    watermark_id = shard_map.aliases.index(alias) + 1
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(pk=watermark_id)
+        watermark = RollupWatermark.objects.select_for_update().get(pk=watermark_id)
+        events = list(
+            RentEvent.objects.using(alias).filter(id__gt=watermark.lastEventId)
+            .order_by('id')
+            .values('id', 'bloqId', 'lockerId', 'size', 'eventType', 'createdAt')
+            [:batch_size + 1]
+        )
+        more = len(events) > batch_size
+        ready = []
+        for event in events[:batch_size]:
+            if event['createdAt'] > cutoff:
+                more = False
+                break
+            ready.append(event)
+
+        sizes = locker_sizes(ready)
+        keys = {event_key(event, sizes) for event in ready}
+        states = {
+            (state.bloqId, state.size): state
+            for state in OccupancyState.objects.filter(
+                bloqId__in={bloq for bloq, _ in keys}, size__in={size for _, size in keys}
+            )
+            if (state.bloqId, state.size) in keys
+        }
+        known = set(states)
+        totals: Dict[RollupKey, Totals] = defaultdict(Totals)
+        replay(ready, sizes, states, totals)
+        save_totals(totals, capacity)
+
+        OccupancyState.objects.bulk_create(
+            [state for key, state in states.items() if key not in known]
+        )
+        OccupancyState.objects.bulk_update(
+            [state for key, state in states.items() if key in known],
+            ['occupied', 'accruedUntil'],
+        )
+        if ready:
+            watermark.lastEventId = ready[-1]['id']
+        watermark.save()
+    return len(ready), more
+
+
+def accrue_all(cutoff: datetime.datetime, capacity: Dict[Key, int], batch_size: int) -> None:
+    """
+    Account for the time every Locker spent in its state up to ``cutoff``.
+
+    Only valid once the events of every shard are rolled up to the cutoff. This
+    also writes a row for every hour without events. Each batch of states runs
+    in its own transaction, holding the watermarks so concurrent runs take
+    turns.
+    """
+    for states in batches(OccupancyState.objects.filter(accruedUntil__lt=cutoff), batch_size):
+        with transaction.atomic():
+            list(RollupWatermark.objects.select_for_update().order_by('pk'))
+            totals: Dict[RollupKey, Totals] = defaultdict(Totals)
+            for state in states:
+                accrue(state, cutoff, totals)
+            save_totals(totals, capacity)
+            states.update(accruedUntil=cutoff)
+
+
+def run_rollup(batch_size: int = 5000, now: Optional[datetime.datetime] = None) -> int:
+    """
+    Roll up every event appended since the last run.
+
+    Args:
+        batch_size (int): The number of events processed per transaction.
+        now (Optional[datetime.datetime]): The current time, for tests.
+
+    Returns:
+        int: The number of events processed.
+    """
+    lag = datetime.timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_LAG_SECONDS', 60))
+    cutoff = (now or timezone.now()) - lag
+    capacity = locker_capacity()
+    processed = 0
+    for alias in sharding.get_shard_map():
+        more = True
+        while more:
+            count, more = run_batch(alias, batch_size, cutoff, capacity)
+            processed += count
+    accrue_all(cutoff, capacity, batch_size)
+    return processed
@@ -0,0 +1,116 @@
+import datetime
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from bloq.models import Bloq
+from locker.models import Locker, LockerStatus
+from rent.models import RentEvent, RentEventType, RentStatus
+from .models import FLEET, OccupancyRollup, OccupancyState, RollupWatermark
+from .rollup import locker_capacity, run_batch, run_rollup
+
+START = datetime.datetime(2026, 1, 1, 10, 0, tzinfo=datetime.timezone.utc)
+
+
+def add_event(event_type, minutes, rent_id="1", bloq_id="1", size="M"):
+    return RentEvent.objects.create(
+        rentId=rent_id, lockerId="1", bloqId=bloq_id, size=size, eventType=event_type,
+        status=RentStatus.WAITING_PICKUP, createdAt=START + datetime.timedelta(minutes=minutes),
+    )
+
+
+class OccupancyRollupTest(TestCase):
+    def setUp(self):
+        bloq = Bloq.objects.create(id="1", title="Bloq A", address="Address A")
+        for locker_id in ("1", "2"):
+            Locker.objects.create(id=locker_id, bloqId=bloq, status=LockerStatus.OPEN,
+                                  isOccupied=False, size="M")
+
+    def test_occupied_time_is_split_by_hour(self):
+        add_event(RentEventType.DROPOFF, 30)
+        add_event(RentEventType.PICKUP, 135)
+        run_rollup(now=START + datetime.timedelta(hours=3, minutes=1))
+        rows = OccupancyRollup.objects.filter(bloqId="1").order_by('bucket')
+        self.assertEqual([row.occupiedSeconds for row in rows], [1800, 3600, 900])
+        self.assertEqual([row.lockers for row in rows], [2, 2, 2])
+        self.assertEqual(sum(row.dropoffs for row in rows), 1)
+        fleet = OccupancyRollup.objects.filter(bloqId=FLEET).order_by('bucket')
+        self.assertEqual([row.occupiedSeconds for row in fleet], [1800, 3600, 900])
+
+    def test_rents_are_counted_by_locker_size(self):
+        # A small Rent in a medium Locker occupies a medium Locker.
+        add_event(RentEventType.DROPOFF, 0, size="S")
+        run_rollup(now=START + datetime.timedelta(hours=1, minutes=1))
+        rows = OccupancyRollup.objects.filter(bloqId="1")
+        self.assertEqual([(row.size, row.lockers, row.occupiedSeconds) for row in rows],
+                         [("M", 2, 3600)])
+
+    def test_only_new_events_are_processed(self):
+        add_event(RentEventType.DROPOFF, 30)
+        self.assertEqual(run_rollup(now=START + datetime.timedelta(hours=1, minutes=1)), 1)
+        late = add_event(RentEventType.PICKUP, 90)
+        # Too recent for this run: left for the next one.
+        self.assertEqual(run_rollup(now=START + datetime.timedelta(minutes=90)), 0)
+        self.assertEqual(run_rollup(now=START + datetime.timedelta(hours=2, minutes=1)), 1)
+        self.assertEqual(RollupWatermark.objects.get(pk=1).lastEventId, late.id)
+        rows = OccupancyRollup.objects.filter(bloqId="1").order_by('bucket')
+        self.assertEqual([row.occupiedSeconds for row in rows], [1800, 1800])
+        self.assertEqual([(row.dropoffs, row.pickups) for row in rows], [(1, 0), (0, 1)])
+
+    def test_batches_only_touch_the_states_of_their_events(self):
+        idle = OccupancyState.objects.create(bloqId="2", size="M", occupied=1, accruedUntil=START)
+        add_event(RentEventType.DROPOFF, 30)
+        cutoff = START + datetime.timedelta(hours=1)
+        self.assertEqual(run_batch('default', 1, cutoff, locker_capacity()), (1, False))
+        idle.refresh_from_db()
+        self.assertEqual(idle.accruedUntil, START)
+        self.assertEqual(OccupancyState.objects.get(bloqId="1").accruedUntil,
+                         START + datetime.timedelta(minutes=30))
+        # Once caught up, every state is accrued up to the cutoff.
+        run_rollup(now=cutoff + datetime.timedelta(minutes=1))
+        self.assertEqual(set(OccupancyState.objects.values_list('accruedUntil', flat=True)),
+                         {cutoff})
+        self.assertEqual(
+            [row.occupiedSeconds for row in OccupancyRollup.objects.order_by('bloqId')],
+            [5400, 1800, 3600],
+        )
+
+
+class OccupancyAPITest(APITestCase):
+    def setUp(self):
+        bloq = Bloq.objects.create(id="1", title="Bloq A", address="Address A")
+        Locker.objects.create(id="1", bloqId=bloq, status=LockerStatus.OPEN,
+                              isOccupied=False, size="M")
+        add_event(RentEventType.DROPOFF, 0)
+        add_event(RentEventType.PICKUP, 90)
+        run_rollup(now=START + datetime.timedelta(hours=2, minutes=1))
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.range = {'start': '2026-01-01', 'end': '2026-01-02'}
+
+    def test_time_series(self):
+        url = reverse('occupancy', kwargs={'version': 'v1'})
+        response = self.client.get(url, {**self.range, 'bloqId': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['occupancyRate'] for row in response.data], [1.0, 0.5])
+        response = self.client.get(url, {**self.range, 'bucket': 'day'})
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['occupancyRate'], 0.75)
+        self.assertEqual(response.data[0]['dropoffs'], 1)
+
+    def test_by_size_and_bloq(self):
+        response = self.client.get(reverse('occupancy-sizes', kwargs={'version': 'v1'}), self.range)
+        self.assertEqual(response.data[0]['size'], 'M')
+        self.assertEqual(response.data[0]['occupiedSeconds'], 5400)
+        response = self.client.get(reverse('occupancy-bloqs', kwargs={'version': 'v1'}), self.range)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['bloqId'], '1')
+
+    def test_invalid_range(self):
+        url = reverse('occupancy', kwargs={'version': 'v1'})
+        response = self.client.get(url, {'start': '2026-01-01', 'end': '2026-03-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {'start': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
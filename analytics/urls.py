@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import OccupancyView, OccupancyBySizeView, OccupancyByBloqView
+
+urlpatterns = [
+    path('occupancy/', OccupancyView.as_view(), name='occupancy'),
+    path('occupancy/sizes/', OccupancyBySizeView.as_view(), name='occupancy-sizes'),
+    path('occupancy/bloqs/', OccupancyByBloqView.as_view(), name='occupancy-bloqs'),
+]
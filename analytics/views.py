@@ -0,0 +1,266 @@
+"""
+Views for the Analytics app.
+
+This module contains the occupancy endpoints used by the ops dashboards. They
+aggregate the hourly rollup rows maintained by ``rollup_occupancy`` by time
+bucket, by locker size or by Bloq, and never read the Locker or Rent tables.
+"""
+
+import datetime
+import logging
+from typing import Any, Dict, List
+from django.db.models import F, QuerySet, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from locker.models import LockerSize
+from .models import FLEET, OccupancyRollup
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+BUCKET_LIMITS = {
+    'hour': datetime.timedelta(days=31),
+    'day': datetime.timedelta(days=366),
+}
+
+RANGE_PARAMETERS = [
+    openapi.Parameter(
+        'start',
+        openapi.IN_QUERY,
+        description="Start of the range (ISO 8601 date or datetime, default 7 days ago)",
+        type=openapi.TYPE_STRING
+    ),
+    openapi.Parameter(
+        'end',
+        openapi.IN_QUERY,
+        description="End of the range, exclusive (ISO 8601 date or datetime, default now)",
+        type=openapi.TYPE_STRING
+    ),
+    openapi.Parameter(
+        'size',
+        openapi.IN_QUERY,
+        description="Only count lockers of this size",
+        type=openapi.TYPE_STRING,
+        enum=LockerSize.values
+    ),
+]
+
+BLOQ_PARAMETER = openapi.Parameter(
+    'bloqId',
+    openapi.IN_QUERY,
+    description="Only count lockers of this Bloq (default: the whole fleet)",
+    type=openapi.TYPE_STRING
+)
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Standard pagination class for Analytics views.
+
+    This class sets default pagination settings:
+    - Default page size is 10 items.
+    - Allows clients to set a custom page size using the 'page_size' query parameter.
+    - Maximum page size is capped at 100 items.
+    """
+    page_size: int = 10
+    page_size_query_param: str = 'page_size'
+    max_page_size: int = 100
+
+
+class OccupancyAggregateView(generics.GenericAPIView):
+    """
+    Base API view aggregating occupancy rollup rows over a time range.
+
+    Subclasses set ``group_by``, the rollup columns the rows are grouped by.
+    """
+    permission_classes = [IsAuthenticated]
+    queryset = OccupancyRollup.objects.all()
+    group_by: List[str] = []
+    default_range = datetime.timedelta(days=7)
+
+    def get_moment(self, name: str, default: datetime.datetime) -> datetime.datetime:
+        """
+        Read an ISO 8601 date or datetime query parameter.
+
+        Raises:
+            ValidationError: If the parameter is not a valid date or datetime.
+        """
+        raw = self.request.query_params.get(name)
+        if not raw:
+            return default
+        moment = parse_datetime(raw)
+        if moment is None:
+            day = parse_date(raw)
+            if day is None:
+                raise ValidationError({name: 'Must be an ISO 8601 date or datetime.'})
+            moment = datetime.datetime.combine(day, datetime.time())
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, datetime.timezone.utc)
+        return moment
+
+    def get_range(self, limit: datetime.timedelta) -> Dict[str, datetime.datetime]:
+        """
+        Read the ``start`` and ``end`` of the requested range.
+
+        Raises:
+            ValidationError: If the range is empty or longer than ``limit``.
+        """
+        end = self.get_moment('end', timezone.now())
+        start = self.get_moment('start', end - self.default_range)
+        if start >= end:
+            raise ValidationError({'start': 'Must be before end.'})
+        if end - start > limit:
+            raise ValidationError({'start': f'The range cannot exceed {limit.days} days.'})
+        return {'start': start, 'end': end}
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        """
+        Restrict the rollup rows to the requested range, Bloq and size.
+        """
+        window = self.get_range(self.get_range_limit())
+        queryset = queryset.filter(bucket__gte=window['start'], bucket__lt=window['end'])
+        if 'bloqId' not in self.group_by:
+            queryset = queryset.filter(bloqId=self.request.query_params.get('bloqId', FLEET))
+        else:
+            queryset = queryset.exclude(bloqId=FLEET)
+        size = self.request.query_params.get('size')
+        if size:
+            if size not in LockerSize.values:
+                raise ValidationError({'size': f'Must be one of {", ".join(LockerSize.values)}.'})
+            queryset = queryset.filter(size=size)
+        return queryset
+
+    def get_range_limit(self) -> datetime.timedelta:
+        """
+        Return the longest range that may be requested.
+        """
+        return BUCKET_LIMITS['day']
+
+    def aggregate(self, queryset: QuerySet) -> QuerySet:
+        """
+        Group the rollup rows and sum their counters.
+        """
+        return queryset.values(*self.group_by).annotate(
+            dropoffs=Sum('dropoffs'),
+            pickups=Sum('pickups'),
+            occupiedSeconds=Sum('occupiedSeconds'),
+            capacitySeconds=Sum(F('lockers') * 3600),
+        ).order_by(*self.group_by)
+
+    @staticmethod
+    def to_representation(row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add the occupancy rate to an aggregated row.
+        """
+        capacity = row.pop('capacitySeconds') or 0
+        row['occupancyRate'] = round(row['occupiedSeconds'] / capacity, 4) if capacity else 0.0
+        return row
+
+
+class OccupancyView(OccupancyAggregateView):
+    """
+    API view returning the occupancy per time bucket.
+
+    - **GET**: Returns the dropoffs, pickups, occupied locker seconds and
+      occupancy rate per hour or per day, for one Bloq or the whole fleet.
+    """
+    group_by = ['period']
+
+    def get_bucket(self) -> str:
+        """
+        Read the ``bucket`` query parameter.
+        """
+        bucket = self.request.query_params.get('bucket', 'hour')
+        if bucket not in BUCKET_LIMITS:
+            raise ValidationError({'bucket': 'Must be one of hour, day.'})
+        return bucket
+
+    def get_range_limit(self) -> datetime.timedelta:
+        return BUCKET_LIMITS[self.get_bucket()]
+
+    def aggregate(self, queryset: QuerySet) -> QuerySet:
+        queryset = queryset.annotate(
+            period=Trunc('bucket', self.get_bucket(), tzinfo=datetime.timezone.utc)
+        )
+        return super().aggregate(queryset)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            BLOQ_PARAMETER,
+            *RANGE_PARAMETERS,
+            openapi.Parameter(
+                'bucket',
+                openapi.IN_QUERY,
+                description="Time bucket of the series",
+                type=openapi.TYPE_STRING,
+                enum=list(BUCKET_LIMITS)
+            ),
+        ]
+    )
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests to read the occupancy time series.
+
+        Returns:
+            - Response: One row per time bucket.
+        """
+        logger.info("User '%s' requested the occupancy time series.", request.user.id)
+        rows = self.aggregate(self.filter_queryset(self.get_queryset()))
+        return Response([self.to_representation(row) for row in rows])
+
+
+class OccupancyBySizeView(OccupancyAggregateView):
+    """
+    API view returning the occupancy per locker size.
+
+    - **GET**: Returns the occupancy of each locker size over the range, for one
+      Bloq or the whole fleet.
+    """
+    group_by = ['size']
+
+    @swagger_auto_schema(manual_parameters=[BLOQ_PARAMETER, *RANGE_PARAMETERS])
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests to read the occupancy per locker size.
+
+        Returns:
+            - Response: One row per locker size.
+        """
+        logger.info("User '%s' requested the occupancy per size.", request.user.id)
+        rows = self.aggregate(self.filter_queryset(self.get_queryset()))
+        return Response([self.to_representation(row) for row in rows])
+
+
+class OccupancyByBloqView(OccupancyAggregateView):
+    """
+    API view returning the occupancy per Bloq.
+
+    - **GET**: Returns a paginated list of Bloqs with their occupancy over the
+      range, busiest first.
+    """
+    group_by = ['bloqId']
+    pagination_class = StandardResultsSetPagination
+
+    def aggregate(self, queryset: QuerySet) -> QuerySet:
+        return super().aggregate(queryset).order_by('-occupiedSeconds', 'bloqId')
+
+    @swagger_auto_schema(manual_parameters=RANGE_PARAMETERS)
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests to read the occupancy per Bloq.
+
+        Returns:
+            - Response: A paginated list with one row per Bloq.
+        """
+        logger.info("User '%s' requested the occupancy per Bloq.", request.user.id)
+        rows = self.paginate_queryset(self.aggregate(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response([self.to_representation(row) for row in rows])
@@ -0,0 +1,104 @@
+"""
+Benchmark for the occupancy dashboard queries.
+
+Seeds 30 days of hourly rollup rows for ``--bloqs`` Bloqs (plus the fleet rows
+written by ``rollup_occupancy``) inside a transaction that is rolled back at the
+end, then times the queries behind the analytics endpoints. The target is a
+30-day dashboard query under 50 ms.
+
+Usage:
+    python benchmarks/bench_analytics.py [--bloqs 200] [--repeat 5]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_bloq.settings')
+
+import django  # noqa: E402  pylint: disable=wrong-import-position
+
+django.setup()
+
+# pylint: disable=wrong-import-position
+from django.db import transaction  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from analytics.models import FLEET, OccupancyRollup  # noqa: E402
+from analytics.views import (  # noqa: E402
+    OccupancyByBloqView, OccupancyBySizeView, OccupancyView,
+)
+from locker.models import LockerSize  # noqa: E402
+
+SIZES = [choice.value for choice in LockerSize]
+DAYS = 30
+
+
+def seed(bloqs: int, end: datetime.datetime) -> int:
+    """
+    Insert DAYS days of hourly rollup rows for every Bloq and the fleet.
+    """
+    rows = []
+    for hour in range(DAYS * 24):
+        bucket = end - datetime.timedelta(hours=hour + 1)
+        for bloq_id in [FLEET] + [f'bench-{i}' for i in range(bloqs)]:
+            for size in SIZES:
+                rows.append(OccupancyRollup(
+                    bucket=bucket, bloqId=bloq_id, size=size, lockers=4, dropoffs=1,
+                    pickups=1, occupiedSeconds=float((hour * 37) % 14400),
+                ))
+    OccupancyRollup.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def timed(repeat: int, view_class, params: dict) -> float:
+    """
+    Return the fastest time, in ms, of the view's aggregate query.
+    """
+    view = view_class()
+    view.request = Request(RequestFactory().get('/', params))
+    view.format_kwarg = None
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(view.aggregate(view.filter_queryset(view.get_queryset())))
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    """
+    Seed the rollup table, run the dashboard queries and print their timings.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--bloqs', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    end = timezone.now().replace(minute=0, second=0, microsecond=0)
+    window = {
+        'start': (end - datetime.timedelta(days=DAYS)).isoformat(),
+        'end': end.isoformat(),
+    }
+    queries = [
+        ('fleet, hourly', OccupancyView, {**window, 'bucket': 'hour'}),
+        ('fleet, daily', OccupancyView, {**window, 'bucket': 'day'}),
+        ('one bloq, daily', OccupancyView, {**window, 'bucket': 'day', 'bloqId': 'bench-0'}),
+        ('fleet, by size', OccupancyBySizeView, window),
+        ('all bloqs, ranked', OccupancyByBloqView, window),
+    ]
+    with transaction.atomic():
+        print(f'seeded {seed(args.bloqs, end):,} rollup rows')
+        print(f'{"query":<24}{"ms":>10}')
+        for name, view_class, params in queries:
+            print(f'{name:<24}{timed(args.repeat, view_class, params):>10.1f}')
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
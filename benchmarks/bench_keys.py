@@ -0,0 +1,135 @@
+"""
+Benchmark for string versus integer surrogate keys (Postgres only).
+
+Builds two scratch copies of the Bloq -> Locker relation inside a transaction
+that is rolled back at the end: one keyed and joined by the string IDs (the old
+layout), one by ``bigint`` surrogate keys with the string ID as a unique column
+(the current layout). Prints the size of the primary key and foreign key
+indexes and the time of a full join and of the Lockers of a few Bloqs.
+
+Usage:
+    python benchmarks/bench_keys.py [--bloqs 20000] [--lockers 25] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_bloq.settings')
+
+import django  # noqa: E402  pylint: disable=wrong-import-position
+
+django.setup()
+
+# pylint: disable=wrong-import-position
+from django.db import connection, transaction  # noqa: E402
+
+# Client chosen IDs are typically UUIDs, so the string IDs are 36 characters long.
+LAYOUTS = {
+    'varchar': [
+        'CREATE TEMPORARY TABLE bench_bloq (id varchar(255) PRIMARY KEY)',
+        'CREATE TEMPORARY TABLE bench_locker ('
+        ' id varchar(255) PRIMARY KEY,'
+        ' bloq_id varchar(255) NOT NULL REFERENCES bench_bloq (id))',
+        'INSERT INTO bench_bloq'
+        ' SELECT md5(b::text)::uuid::text FROM generate_series(1, %(bloqs)s) b',
+        'INSERT INTO bench_locker'
+        ' SELECT md5((b * %(lockers)s + l)::text)::uuid::text, md5(b::text)::uuid::text'
+        ' FROM generate_series(1, %(bloqs)s) b, generate_series(1, %(lockers)s) l',
+        'CREATE INDEX bench_locker_bloq_idx ON bench_locker (bloq_id)',
+    ],
+    'bigint': [
+        'CREATE TEMPORARY TABLE bench_bloq ('
+        ' key bigint PRIMARY KEY, id varchar(255) NOT NULL UNIQUE)',
+        'CREATE TEMPORARY TABLE bench_locker ('
+        ' key bigint PRIMARY KEY, id varchar(255) NOT NULL UNIQUE,'
+        ' bloq_id bigint NOT NULL REFERENCES bench_bloq (key))',
+        'INSERT INTO bench_bloq'
+        ' SELECT b, md5(b::text)::uuid::text FROM generate_series(1, %(bloqs)s) b',
+        'INSERT INTO bench_locker'
+        ' SELECT b * %(lockers)s + l, md5((b * %(lockers)s + l)::text)::uuid::text, b'
+        ' FROM generate_series(1, %(bloqs)s) b, generate_series(1, %(lockers)s) l',
+        'CREATE INDEX bench_locker_bloq_idx ON bench_locker (bloq_id)',
+    ],
+}
+
+JOIN = {
+    'varchar': 'SELECT count(*) FROM bench_locker l JOIN bench_bloq b ON b.id = l.bloq_id',
+    'bigint': 'SELECT count(*) FROM bench_locker l JOIN bench_bloq b ON b.key = l.bloq_id',
+}
+
+# The Lockers of 100 Bloqs looked up by their public IDs, as the API does.
+LOOKUP = {
+    'varchar': 'SELECT count(*) FROM bench_locker l JOIN bench_bloq b ON b.id = l.bloq_id'
+               ' WHERE b.id IN (SELECT md5(b::text)::uuid::text FROM generate_series(1, 100) b)',
+    'bigint': 'SELECT count(*) FROM bench_locker l JOIN bench_bloq b ON b.key = l.bloq_id'
+              ' WHERE b.id IN (SELECT md5(b::text)::uuid::text FROM generate_series(1, 100) b)',
+}
+
+
+def timed(cursor, repeat: int, sql: str) -> float:
+    """
+    Return the fastest time, in ms, of a query.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def index_size(cursor, name: str) -> float:
+    """
+    Return the size of an index in MB.
+    """
+    cursor.execute('SELECT pg_relation_size(%s::regclass)', [name])
+    return cursor.fetchone()[0] / 2 ** 20
+
+
+def measure(layout: str, bloqs: int, lockers: int, repeat: int) -> dict:
+    """
+    Build the scratch tables of one layout and measure them.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in LAYOUTS[layout]:
+            cursor.execute(sql, {'bloqs': bloqs, 'lockers': lockers})
+        cursor.execute('ANALYZE bench_bloq')
+        cursor.execute('ANALYZE bench_locker')
+        results = {
+            'Locker PK index (MB)': index_size(cursor, 'bench_locker_pkey'),
+            'Locker FK index (MB)': index_size(cursor, 'bench_locker_bloq_idx'),
+            'full join (ms)': timed(cursor, repeat, JOIN[layout]),
+            'Lockers of 100 Bloqs (ms)': timed(cursor, repeat, LOOKUP[layout]),
+        }
+        transaction.set_rollback(True)
+    return results
+
+
+def main() -> None:
+    """
+    Measure both layouts and print them side by side.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--bloqs', type=int, default=20000)
+    parser.add_argument('--lockers', type=int, default=25, help='Lockers per Bloq.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        parser.error('this benchmark needs a Postgres database.')
+    results = {
+        layout: measure(layout, args.bloqs, args.lockers, args.repeat) for layout in LAYOUTS
+    }
+    print(f'{args.bloqs:,} Bloqs, {args.bloqs * args.lockers:,} Lockers')
+    print(f'{"":<28}{"varchar":>12}{"bigint":>12}')
+    for name in results['varchar']:
+        print(f'{name:<28}{results["varchar"][name]:>12.2f}{results["bigint"][name]:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
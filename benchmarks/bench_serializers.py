@@ -0,0 +1,110 @@
+"""
+Microbenchmark for the list serialization path.
+
+Compares the regular ModelSerializer output (``many=True`` over model instances)
+with the ValuesSerializer fast path (over ``values()`` rows) for the Locker, Rent
+and Bloq serializers. No database access is needed: rows are built in memory.
+
+Usage:
+    python benchmarks/bench_serializers.py [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_bloq.settings')
+
+import django  # noqa: E402  pylint: disable=wrong-import-position
+
+django.setup()
+
+# pylint: disable=wrong-import-position
+from bloq.models import Bloq  # noqa: E402
+from bloq.serializers import BloqSerializer  # noqa: E402
+from locker.models import Locker, LockerSize, LockerStatus  # noqa: E402
+from locker.serializers import LockerSerializer  # noqa: E402
+from rent.models import Rent, RentStatus  # noqa: E402
+from rent.serializers import RentSerializer  # noqa: E402
+from project_bloq.serializers import ValuesSerializer  # noqa: E402
+
+SIZES = [choice.value for choice in LockerSize]
+
+
+def build_rows(rows: int):
+    """
+    Build matching model instances and values() rows for each serializer.
+    """
+    bloqs = [
+        Bloq(id=f'b{i}', title=f'Bloq {i}', address=f'Street {i}',
+             latitude=38.7 + i % 100 / 1000, longitude=-9.1, geohash='eycs')
+        for i in range(rows)
+    ]
+    lockers = [
+        Locker(
+            id=f'l{i}', bloqId=bloqs[i % min(rows, 500)], status=LockerStatus.OPEN,
+            isOccupied=bool(i % 2), size=SIZES[i % len(SIZES)],
+        )
+        for i in range(rows)
+    ]
+    rents = [
+        Rent(
+            id=f'r{i}', lockerId=lockers[i], weight=float(i % 30),
+            size=SIZES[i % len(SIZES)], status=RentStatus.WAITING_PICKUP,
+        )
+        for i in range(rows)
+    ]
+    return [
+        (BloqSerializer, bloqs, [
+            {'id': b.id, 'title': b.title, 'address': b.address, 'latitude': b.latitude,
+             'longitude': b.longitude, 'geohash': b.geohash} for b in bloqs
+        ]),
+        (LockerSerializer, lockers, [
+            {'id': l.id, 'bloqId__id': l.bloqId.id, 'status': l.status,
+             'isOccupied': l.isOccupied, 'size': l.size} for l in lockers
+        ]),
+        (RentSerializer, rents, [
+            {'id': r.id, 'lockerId__id': r.lockerId.id, 'weight': r.weight,
+             'size': r.size, 'status': r.status} for r in rents
+        ]),
+    ]
+
+
+def best_of(repeat: int, func) -> float:
+    """
+    Return the fastest wall-clock time of ``repeat`` runs of ``func``.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    """
+    Run the benchmark and print rows/second for both paths.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"serializer":<18}{"model rows/s":>16}{"values rows/s":>16}{"speedup":>10}')
+    for serializer_class, instances, rows in build_rows(args.rows):
+        fast = ValuesSerializer.for_serializer(serializer_class)
+        assert fast.serialize(rows) == serializer_class(instances, many=True).data
+        slow_time = best_of(args.repeat, lambda: serializer_class(instances, many=True).data)
+        fast_time = best_of(args.repeat, lambda: fast.serialize(rows))
+        print(
+            f'{serializer_class.__name__:<18}{args.rows / slow_time:>16,.0f}'
+            f'{args.rows / fast_time:>16,.0f}{slow_time / fast_time:>9.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
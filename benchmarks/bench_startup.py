@@ -0,0 +1,95 @@
+"""
+Benchmark for worker startup time and memory per deployment profile.
+
+Starts a fresh interpreter per run that sets Django up, loads the root URLconf
+and resolves an API route, which is what a worker does before it can serve its
+first request, and reports the median time, the peak RSS and the number of
+imported modules, together with the stacks that were loaded.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--profiles full api]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+STACKS = {
+    'docs': 'drf_yasg.generators',
+    'admin': 'bloq.admin',
+    'auth': 'djoser.views',
+    'filters': 'django_filters',
+}
+
+
+def probe() -> None:
+    """
+    Start a worker in this process and print its measurements as JSON.
+    """
+    # pylint: disable=import-outside-toplevel
+    import resource
+    import time
+    start = time.perf_counter()
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_bloq.settings')
+    import django
+    django.setup()
+    from django.urls import resolve
+    resolve('/api/v1/rent/')
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'ms': elapsed * 1000,
+        'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'modules': len(sys.modules),
+        'stacks': sorted(name for name, module in STACKS.items() if module in sys.modules),
+    }))
+
+
+def measure(profile: str, runs: int) -> dict:
+    """
+    Start ``runs`` workers with a deployment profile and return the medians.
+    """
+    env = {**os.environ, 'DEPLOYMENT_PROFILE': profile}
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, '--probe'], env=env, cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'ms': statistics.median(sample['ms'] for sample in samples),
+        'rss': statistics.median(sample['rss'] for sample in samples),
+        'modules': samples[-1]['modules'],
+        'stacks': samples[-1]['stacks'],
+    }
+
+
+def main() -> None:
+    """
+    Measure the startup of every requested profile and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--profiles', nargs='+', default=['full', 'api'])
+    parser.add_argument('--probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.probe:
+        probe()
+        return
+
+    print(f'{"profile":<10}{"startup ms":>12}{"RSS MB":>10}{"modules":>10}  loaded stacks')
+    for profile in args.profiles:
+        result = measure(profile, args.runs)
+        print(f'{profile:<10}{result["ms"]:>12.1f}{result["rss"]:>10.1f}'
+              f'{result["modules"]:>10}  {", ".join(result["stacks"]) or "-"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Locker counts of Bloqs.
+
+The counts of a Bloq are its ``total``, ``available`` (not occupied),
+``occupied`` and ``closed`` Lockers, overall and per size. A single Bloq is
+counted by conditional aggregates of the Bloq query itself; a page of Bloqs by
+one grouped query over their Lockers per shard, which reads the
+(bloqId, size, state) index only.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+from django.db.models import Count, Q
+from locker.models import Locker, LockerSize, LockerState, LockerStatus
+from project_bloq import sharding
+from .models import Bloq
+
+# Each count with the Locker states it covers.
+LOCKER_COUNTS = {
+    'total': LockerState.values,
+    'available': LockerState.matching(is_occupied=False),
+    'occupied': LockerState.matching(is_occupied=True),
+    'closed': LockerState.matching(status=LockerStatus.CLOSED),
+}
+
+
+def _count_name(size: Optional[str], name: str) -> str:
+    """
+    Return the annotation holding one Locker count of a size, or of all sizes.
+    """
+    return f'lockers_{size or "all"}_{name}'
+
+
+def locker_count_annotations() -> Dict[str, Count]:
+    """
+    Return the conditional counts of a Bloq's Lockers, overall and per size.
+
+    Annotating a Bloq queryset with them counts everything in the Bloq query itself.
+    """
+    annotations = {}
+    for size in (None, *LockerSize.values):
+        for name, states in LOCKER_COUNTS.items():
+            condition = Q(locker__state__in=states)
+            if size is not None:
+                condition &= Q(locker__size=size)
+            annotations[_count_name(size, name)] = Count('locker', filter=condition)
+    return annotations
+
+
+def locker_counts(bloq: Bloq) -> Dict[str, Any]:
+    """
+    Read the counts of a Bloq annotated with ``locker_count_annotations()``.
+    """
+    counts: Dict[str, Any] = {
+        name: getattr(bloq, _count_name(None, name)) for name in LOCKER_COUNTS
+    }
+    counts['sizes'] = {
+        size: {name: getattr(bloq, _count_name(size, name)) for name in LOCKER_COUNTS}
+        for size in LockerSize.values
+    }
+    return counts
+
+
+def empty_counts() -> Dict[str, Any]:
+    """
+    Return the counts of a Bloq without Lockers.
+    """
+    counts: Dict[str, Any] = dict.fromkeys(LOCKER_COUNTS, 0)
+    counts['sizes'] = {size: dict.fromkeys(LOCKER_COUNTS, 0) for size in LockerSize.values}
+    return counts
+
+
+def grouped_locker_counts(bloq_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Count the Lockers of many Bloqs with one grouped query per shard.
+
+    Args:
+        bloq_ids (Iterable[str]): The IDs of the Bloqs, e.g. those of a page.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The counts of each Bloq, by Bloq ID.
+    """
+    counts = {bloq_id: empty_counts() for bloq_id in bloq_ids}
+    shards: Dict[str, List[str]] = defaultdict(list)
+    for bloq_id in counts:
+        shards[sharding.shard_for_bloq(bloq_id)].append(bloq_id)
+    covered = {state: [name for name, states in LOCKER_COUNTS.items() if state in states]
+               for state in LockerState.values}
+    for alias, ids in shards.items():
+        rows = (Locker.objects.using(alias).filter(bloqId__id__in=ids).order_by()
+                .values('bloqId__id', 'size', 'state').annotate(lockers=Count('key')))
+        for row in rows:
+            bloq = counts[row['bloqId__id']]
+            for name in covered[row['state']]:
+                bloq[name] += row['lockers']
+                if row['size'] is not None:
+                    bloq['sizes'][row['size']][name] += row['lockers']
+    return counts
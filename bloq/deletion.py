@@ -0,0 +1,154 @@
+"""
+Set-based deletion of Bloqs and Lockers with their dependents.
+
+Django's ``CASCADE`` collector loads every Locker and Rent below a Bloq into
+memory before deleting them in one long transaction. Here the dependents are
+removed bottom up with ``DELETE ... WHERE id IN (...)`` statements of at most
+``batch_size`` rows, each in its own short transaction: Rents first, then
+Lockers, then the Bloq itself. Archived Rents and the Rent event log reference
+Bloqs and Lockers by ID only and are kept.
+
+Rents and Lockers can be created while a deletion runs. Each Locker batch
+locks its Lockers and deletes their remaining Rents in the same transaction,
+and the Bloq is locked before its last Lockers are deleted with it, so a
+concurrent create either lands before the lock and is deleted too, or fails
+once its parent is gone.
+
+An interrupted deletion leaves a consistent, smaller Bloq behind and can simply
+be run again, so very large Bloqs can be deleted by a (retried) background job
+queued with ``delete_bloq_later``.
+"""
+
+import logging
+from typing import Any, Callable, Optional
+from django.conf import settings
+from django.contrib.auth.models import AbstractBaseUser
+from django.db import transaction
+from django.db.models import QuerySet
+from jobs.models import Job
+from jobs.queue import enqueue, task
+from locker.models import Locker
+from project_bloq import sharding
+from rent.models import Rent
+from .models import Bloq
+
+logger = logging.getLogger(__name__)
+
+
+def get_batch_size() -> int:
+    """
+    Return the number of rows deleted per statement.
+    """
+    return getattr(settings, 'CASCADE_DELETE_BATCH_SIZE', 1000)
+
+
+def delete_in_batches(queryset: QuerySet, batch_size: Optional[int] = None,
+                      progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Delete the rows of a queryset by primary key, ``batch_size`` rows per transaction.
+
+    Rows are removed with plain DELETE statements, without collecting
+    dependents or sending signals, so rows referencing them must be deleted
+    first. ``progress`` is called with the number of rows deleted so far after
+    every batch.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    batch_size = batch_size or get_batch_size()
+    keys = queryset.order_by().values_list('pk', flat=True)
+    rows = queryset.model.objects.using(queryset.db)
+    deleted = 0
+    while True:
+        with transaction.atomic(using=queryset.db):
+            batch = list(keys[:batch_size])
+            if batch:
+                # pylint: disable=protected-access
+                rows.filter(pk__in=batch)._raw_delete(queryset.db)
+        deleted += len(batch)
+        if progress is not None and batch:
+            progress(deleted)
+        if len(batch) < batch_size:
+            return deleted
+
+
+def delete_locker_batches(lockers: QuerySet, batch_size: Optional[int] = None,
+                          progress: Optional[Callable[[int], None]] = None,
+                          deleted_rents: int = 0) -> int:
+    """
+    Delete Lockers in batches, each together with the Rents still referencing it.
+
+    Once a batch is locked no Rent can be added to it, and Rents created since
+    they were last deleted are committed and deleted with the batch.
+
+    Returns:
+        int: The number of Lockers deleted.
+    """
+    # pylint: disable=protected-access
+    batch_size = batch_size or get_batch_size()
+    using = lockers.db
+    keys = lockers.order_by().values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(keys.select_for_update()[:batch_size])
+            if batch:
+                deleted_rents += (Rent.objects.using(using).filter(lockerId__in=batch)
+                                  ._raw_delete(using))
+                Locker.objects.using(using).filter(pk__in=batch)._raw_delete(using)
+        deleted += len(batch)
+        if progress is not None and batch:
+            progress(deleted_rents + deleted)
+        if len(batch) < batch_size:
+            return deleted
+
+
+def delete_lockers(lockers: QuerySet, batch_size: Optional[int] = None,
+                   progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Delete Lockers and their Rents in batches.
+
+    ``progress`` is called with the number of Rents and Lockers deleted so far.
+
+    Returns:
+        int: The number of Lockers deleted.
+    """
+    rents = delete_in_batches(
+        Rent.objects.using(lockers.db).filter(lockerId__in=lockers.values('pk')),
+        batch_size, progress,
+    )
+    return delete_locker_batches(lockers, batch_size, progress, rents)
+
+
+def delete_bloq(bloq_id: Any, batch_size: Optional[int] = None,
+                progress: Optional[Callable[[int], None]] = None) -> None:
+    """
+    Delete a Bloq, its Lockers and their Rents in batches.
+
+    ``progress`` is called with the number of rows deleted so far.
+    """
+    bloqs = sharding.for_bloq(Bloq.objects.filter(id=bloq_id), bloq_id)
+    lockers = Locker.objects.using(bloqs.db).filter(bloqId__in=bloqs.values('pk'))
+    count = delete_lockers(lockers, batch_size, progress)
+    with transaction.atomic(using=bloqs.db):
+        # Lock the Bloq so no Locker can be added, then delete the ones added
+        # since the Locker pass together with it.
+        if list(bloqs.select_for_update().values_list('pk', flat=True)):
+            count += delete_locker_batches(lockers, batch_size)
+            bloqs._raw_delete(bloqs.db)  # pylint: disable=protected-access
+    logger.info("Deleted Bloq '%s' with %d Lockers.", bloq_id, count)
+
+
+@task
+def delete_bloq_job(job: Job, bloq_id: Any) -> None:
+    """
+    Job task deleting a Bloq, reporting the number of rows deleted as progress.
+    """
+    delete_bloq(bloq_id, progress=job.report)
+
+
+def delete_bloq_later(bloq_id: Any, user: Optional[AbstractBaseUser] = None) -> Job:
+    """
+    Queue the deletion of a Bloq as a background job.
+    """
+    return enqueue(delete_bloq_job, user=user, bloq_id=bloq_id)
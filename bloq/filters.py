@@ -0,0 +1,53 @@
+"""
+Filter backends for the Bloq app.
+
+This module contains the text search used by support staff to look Bloqs up by
+fragments of their title or address.
+"""
+
+from typing import Any
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Greatest
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.request import Request
+
+SEARCH_QUERY_PARAM = 'search'
+MIN_SEARCH_LENGTH = 3
+
+
+class BloqSearchFilter(BaseFilterBackend):
+    """
+    Filter Bloqs whose title or address contains the ``search`` fragment.
+
+    On Postgres the ``icontains`` lookups are served by the trigram GIN indexes
+    on ``UPPER(title)`` and ``UPPER(address)`` (see migration 0003), and results
+    are ranked by trigram similarity to the fragment. Fragments shorter than
+    three characters have no trigrams to look up and are rejected.
+    """
+
+    def filter_queryset(self, request: Request, queryset: QuerySet, view: Any) -> QuerySet:
+        """
+        Filter and rank the queryset by the requested search fragment.
+
+        Raises:
+            ValidationError: If the fragment is shorter than MIN_SEARCH_LENGTH.
+        """
+        term = request.query_params.get(SEARCH_QUERY_PARAM, '').strip()
+        if not term:
+            return queryset
+        if len(term) < MIN_SEARCH_LENGTH:
+            raise ValidationError(
+                {SEARCH_QUERY_PARAM: f'Must be at least {MIN_SEARCH_LENGTH} characters.'}
+            )
+        queryset = queryset.filter(Q(title__icontains=term) | Q(address__icontains=term))
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset
+        # pylint: disable=import-outside-toplevel
+        from django.contrib.postgres.search import TrigramSimilarity
+        return queryset.annotate(
+            searchRank=Greatest(
+                TrigramSimilarity('title', term), TrigramSimilarity('address', term)
+            )
+        ).order_by('-searchRank', 'id')
@@ -0,0 +1,122 @@
+"""
+Geohash helpers for the Bloq spatial index.
+
+Bloqs store the geohash of their coordinates in an indexed column. Every prefix
+of a geohash is a grid cell containing it, so the Bloqs within a radius are
+found with a few ``geohash LIKE 'prefix%'`` index range scans over the 3x3 block
+of cells around a point, instead of scanning the fleet. No PostGIS needed.
+"""
+
+import math
+from typing import List, Tuple
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(latitude: float, longitude: float, precision: int = MAX_PRECISION) -> str:
+    """
+    Encode coordinates as a geohash.
+
+    Args:
+        latitude (float): The latitude in degrees.
+        longitude (float): The longitude in degrees.
+        precision (int): The number of characters of the geohash.
+
+    Returns:
+        str: The geohash.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """
+    Return the (latitude, longitude) span in degrees of a geohash cell.
+    """
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def precision_for_radius(radius_km: float, latitude: float) -> int:
+    """
+    Return the finest precision whose cells are at least ``radius_km`` wide.
+
+    With such cells, a circle of that radius around a point lies within the 3x3
+    block of cells around the point's cell.
+    """
+    shrink = max(math.cos(math.radians(min(abs(latitude), 89.0))), 1e-6)
+    for precision in range(MAX_PRECISION, 0, -1):
+        lat_span, lon_span = cell_size(precision)
+        if (lat_span * KM_PER_DEGREE >= radius_km
+                and lon_span * KM_PER_DEGREE * shrink >= radius_km):
+            return precision
+    return 1
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    """
+    Return the geohash cells covering a circle around a point.
+
+    Args:
+        latitude (float): The latitude of the center in degrees.
+        longitude (float): The longitude of the center in degrees.
+        radius_km (float): The radius of the circle in kilometers.
+
+    Returns:
+        List[str]: The distinct geohash prefixes of the 3x3 block of cells.
+    """
+    precision = precision_for_radius(radius_km, latitude)
+    lat_span, lon_span = cell_size(precision)
+    cells = set()
+    for d_lat in (-1, 0, 1):
+        for d_lon in (-1, 0, 1):
+            lat = min(max(latitude + d_lat * lat_span, -90.0), 90.0)
+            lon = (longitude + d_lon * lon_span + 180) % 360 - 180
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def bounding_box(latitude: float, longitude: float,
+                 radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) around a circle.
+
+    The longitude bounds may fall outside [-180, 180] near the antimeridian.
+    """
+    d_lat = radius_km / KM_PER_DEGREE
+    d_lon = d_lat / max(math.cos(math.radians(min(abs(latitude), 89.0))), 1e-6)
+    return latitude - d_lat, latitude + d_lat, longitude - d_lon, longitude + d_lon
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Return the great-circle distance between two points in kilometers.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,49 @@
+# Adds trigram indexes for the Bloq text search (Postgres only).
+
+from django.db import migrations
+
+INDEXES = [
+    ('bloq_bloq_title_trgm_idx', 'title'),
+    ('bloq_bloq_address_trgm_idx', 'address'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    '''
+    Create GIN trigram indexes matching the ``icontains`` lookups.
+
+    Django compiles ``icontains`` to ``UPPER(column::text) LIKE UPPER(...)``, so
+    the indexes are built on that expression.
+    '''
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "bloq_bloq" '
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    '''
+    Drop the trigram indexes.
+    '''
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('bloq', '0002_bloq_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
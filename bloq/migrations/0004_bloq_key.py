@@ -0,0 +1,43 @@
+# Moves Bloqs onto an integer surrogate key, keeping ``id`` as a unique column.
+
+from django.db import migrations, models
+from project_bloq import keys
+
+
+def convert(apps, schema_editor):
+    '''
+    Number the Bloqs and point the Lockers' foreign key at the new key.
+    '''
+    keys.convert(
+        schema_editor, apps.get_model('bloq', 'Bloq'), [(apps.get_model('locker', 'Locker'), 'bloqId')]
+    )
+
+
+class Migration(migrations.Migration):
+
+    # The conversion batches its updates and builds indexes concurrently on Postgres.
+    atomic = False
+
+    dependencies = [
+        ('bloq', '0003_bloq_trigram_indexes'),
+        ('locker', '0005_locker_bloq_size_free_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='bloq',
+                    name='key',
+                    field=models.BigAutoField(default=None, primary_key=True, serialize=False),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='bloq',
+                    name='id',
+                    field=models.CharField(max_length=255, unique=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(convert),
+    ]
@@ -1,18 +1,43 @@
 '''
 Models for the Bloq app
 '''
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from .geo import encode
 
 
 class Bloq(models.Model):
     '''
     Bloq model
     '''
-    id = models.CharField(max_length=255, primary_key=True)
+    # Internal key used by foreign keys and joins; ``id`` is the public identifier.
+    key = models.BigAutoField(primary_key=True)
+    id = models.CharField(max_length=255, unique=True)
     title = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    # Derived from the coordinates on save, indexed for prefix (grid cell) lookups.
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
 
     objects = models.Manager()  # Add this line to define the default manager
 
     def __str__(self):
         return str(self.title)
+
+    def save(self, *args, **kwargs):
+        '''
+        Keep the geohash in sync with the coordinates.
+        '''
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ''
+        else:
+            self.geohash = encode(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
@@ -6,27 +6,29 @@ and a list serializer for handling bulk operations.
 """
 
 from typing import List, Dict, Any
-from django.db import transaction
 from rest_framework import serializers
+from project_bloq import sharding
+from project_bloq.serializers import DynamicFieldsModelSerializer
 from .models import Bloq
 
 
-class BloqSerializer(serializers.ModelSerializer):
+class BloqSerializer(DynamicFieldsModelSerializer):
     """
     Serializer for the Bloq model.
 
     This serializer handles the serialization and deserialization of Bloq instances.
-    It includes all fields of the Bloq model.
+    It includes all public fields of the Bloq model.
     """
+    reserved_ids = frozenset({'export', 'nearest'})
 
     class Meta:
         """
         Meta class for BloqSerializer.
 
-        Specifies the model to serialize and the fields to include.
+        Specifies the model to serialize and the fields to exclude.
         """
         model = Bloq
-        fields = '__all__'
+        exclude = ['key']
 
 
 class BloqListSerializer(serializers.ListSerializer):
@@ -38,7 +40,7 @@ class BloqListSerializer(serializers.ListSerializer):
 
     child = BloqSerializer()
 
-    @transaction.atomic
+    @sharding.atomic()
     def create(self, validated_data: List[Dict[str, Any]]) -> List[Bloq]:
         """
         Create multiple Bloq instances.
@@ -58,7 +60,7 @@ class BloqListSerializer(serializers.ListSerializer):
             instances.append(instance)
         return instances
 
-    @transaction.atomic
+    @sharding.atomic()
     def update(self, instance: List[Bloq], validated_data: List[Dict[str, Any]]) -> List[Bloq]:
         """
         Update multiple Bloq instances.
@@ -1,9 +1,36 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import tempfile
+import json
+from concurrent.futures import ThreadPoolExecutor
+import brotli
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
 from rest_framework.test import APITestCase
-from django.urls import reverse
+from django.urls import include, path, reverse
+from django.urls.resolvers import RegexPattern, URLResolver
 from django.contrib.auth.models import User
+from jobs import queue
+from jobs.models import Job, JobStatus
 from rest_framework.authtoken.models import Token
-from locker.models import Locker, LockerStatus, LockerSize
+from locker.models import Locker, LockerState, LockerStatus, LockerSize
+from rent.models import Rent, RentStatus
+from project_bloq.events import bloq_channel, get_broker
+from project_bloq.lazyurls import LazyURLConf, lazy_include
+from project_bloq import schema
+from project_bloq.middleware import CompressionMiddleware, compression_bytes_saved
+from project_bloq.pagination import EstimatedCountPagination, estimate_count, table_rows
+from project_bloq.sharding import (
+    FanOutQuerySet, ShardMap, ShardRouter, instance_shard, shard_for_bloq
+)
+from project_bloq.sse import QUEUE_SIZE, EventStreamApp
+from project_bloq.throttling import RedisBucketStore, get_bucket_store, throttled_requests
+from . import deletion
 from .models import Bloq
 
 class BloqModelTest(TestCase):
@@ -63,6 +90,12 @@ class BloqAPITest(APITestCase):
         response = self.client.post(self.url, invalid_data, format='json')
         self.assertEqual(response.status_code, 400)  # Bad Request
 
+    def test_create_bloq_with_reserved_id(self)->None:
+        data = [{"id": "export", "title": "Bloq Export", "address": "Address"}]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Bloq.objects.exists())
+
     def test_get_bloq_detail(self)->None:
         Bloq.objects.create(id="1", title="Bloq A", address="Address A")
         response = self.client.get(f"/api/v1/bloq/1/", format='json')
@@ -127,4 +160,531 @@ class BloqAPITest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['count'], 0)
 
-    
\ No newline at end of file
+    def test_get_bloq_expanded(self)->None:
+        self.create_bloq_locker()
+        Locker.objects.create(id="3", bloqId=Bloq.objects.get(id="1"), status=LockerStatus.CLOSED,
+                              isOccupied=True, size=LockerSize.L)
+        response = self.client.get("/api/v1/bloq/1/", {'expand': 'lockers,counts'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Bloq A')
+        self.assertEqual([locker['id'] for locker in response.data['lockers']], ['1', '3'])
+        self.assertEqual(response.data['lockers'][1]['isOccupied'], True)
+        counts = response.data['counts']
+        self.assertEqual((counts['total'], counts['available'], counts['occupied'], counts['closed']),
+                         (2, 1, 1, 1))
+        self.assertEqual(counts['sizes']['M'],
+                         {'total': 1, 'available': 1, 'occupied': 0, 'closed': 0})
+        self.assertEqual(counts['sizes']['XL']['total'], 0)
+
+    def test_get_bloq_expanded_takes_fixed_queries(self)->None:
+        self.create_bloq_locker()
+        queries = []
+        for extra in range(2):
+            Locker.objects.create(id=f"1-{extra}", bloqId=Bloq.objects.get(id="1"),
+                                  status=LockerStatus.OPEN, isOccupied=False, size=LockerSize.S)
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get("/api/v1/bloq/1/", {'expand': 'lockers,counts'})
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_list_bloqs_with_counts(self)->None:
+        self.create_bloq_locker()
+        Bloq.objects.create(id="3", title="Bloq C", address="Address C")
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get("/api/v1/bloq/", {'counts': 'true', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        counts = {bloq['id']: bloq['counts'] for bloq in response.data['results']}
+        self.assertEqual(list(counts), ['1', '2'])
+        self.assertEqual((counts['1']['available'], counts['1']['occupied']), (1, 0))
+        self.assertEqual(counts['2']['sizes']['M'],
+                         {'total': 1, 'available': 0, 'occupied': 1, 'closed': 1})
+        grouped = [query for query in captured if 'GROUP BY' in query['sql']]
+        self.assertEqual(len(grouped), 1)
+
+        response = self.client.get("/api/v1/bloq/", {'counts': 'true', 'page': 2, 'page_size': 2})
+        self.assertEqual(response.data['results'][0]['counts']['total'], 0)
+        response = self.client.get("/api/v1/bloq/", {'counts': 'true', 'fields': 'title'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_bloq_unknown_expansion(self)->None:
+        Bloq.objects.create(id="1", title="Bloq A", address="Address A")
+        response = self.client.get("/api/v1/bloq/1/", {'expand': 'rents'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expand', response.data)
+
+    
+
+class CompressionMiddlewareTest(APITestCase):
+    def setUp(self)->None:
+        self.url = reverse('bloq-list-create', kwargs={'version': 'v1'})
+        Bloq.objects.bulk_create(
+            Bloq(id=str(i), title=f"Bloq {i}", address=f"Address {i}") for i in range(100)
+        )
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_large_list_is_gzipped(self)->None:
+        saved_before = compression_bytes_saved.value(encoding='gzip')
+        response = self.client.get(self.url, {'page_size': 100}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        payload = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(payload['results']), 100)
+        self.assertGreater(compression_bytes_saved.value(encoding='gzip'), saved_before)
+
+    def test_brotli_preferred_when_accepted(self)->None:
+        response = self.client.get(
+            self.url, {'page_size': 100}, HTTP_ACCEPT_ENCODING='gzip, br'
+        )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(brotli.decompress(response.content))['count'], 100)
+
+    def test_small_detail_is_not_compressed(self)->None:
+        response = self.client.get("/api/v1/bloq/1/", HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_response_is_compressed(self)->None:
+        chunks = [b'{"id": "%d"}\n' % i for i in range(500)]
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+        )
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = middleware(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+    def test_metrics_report_bytes_saved(self)->None:
+        self.client.get(self.url, {'page_size': 100}, HTTP_ACCEPT_ENCODING='gzip')
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_compression_bytes_saved_total{encoding="gzip"}', response.content)
+
+    def test_metrics_require_staff(self)->None:
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+
+class EventStreamTest(TestCase):
+    def setUp(self)->None:
+        self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Address A")
+        self.token = Token.objects.create(
+            user=User.objects.create_user(username='testuser', password='testpass')
+        )
+        self.app = EventStreamApp(self.not_streamed)
+
+    @staticmethod
+    async def not_streamed(scope, receive, send)->None:
+        raise AssertionError(f"{scope['path']} was not handled by the event stream")
+
+    def run_stream(self, path:str, query_string:bytes=b'', events=())->list:
+        """
+        Run the ASGI app once, publishing events after the stream opens.
+        """
+        sent = []
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            # Disconnect once the published events have been sent.
+            while len(sent) < 3 + len(events):
+                await asyncio.sleep(0.01)
+            return {'type': 'http.disconnect'}
+
+        async def send(message)->None:
+            sent.append(message)
+            if len(sent) == 2:
+                for event in events:
+                    get_broker().backend.publish(bloq_channel(self.bloq.id), json.dumps(event))
+
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': [],
+                 'query_string': query_string}
+        async_to_sync(self.app)(scope, receive, send)
+        return sent
+
+    def test_stream_requires_token(self)->None:
+        sent = self.run_stream('/api/v1/bloq/1/events/')
+        self.assertEqual(sent[0]['status'], 401)
+
+    def test_stream_unknown_bloq(self)->None:
+        sent = self.run_stream('/api/v1/bloq/2/events/', b'token=' + self.token.key.encode())
+        self.assertEqual(sent[0]['status'], 404)
+
+    def test_stream_pushes_locker_events(self)->None:
+        event = {'type': 'locker', 'id': '1', 'status': 'CLOSED', 'isOccupied': True, 'seq': 7}
+        sent = self.run_stream(
+            '/api/v1/bloq/1/events/', b'token=' + self.token.key.encode(), [event]
+        )
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        body = sent[2]['body'].decode()
+        self.assertIn('event: locker\nid: 7\n', body)
+        self.assertEqual(json.loads(body.split('data: ')[1]), event)
+
+    def test_slow_consumer_is_disconnected(self)->None:
+        events = [{'type': 'locker', 'id': '1', 'seq': seq} for seq in range(QUEUE_SIZE + 1)]
+        sent = self.run_stream(
+            '/api/v1/bloq/1/events/', b'token=' + self.token.key.encode(), events
+        )
+        self.assertEqual(sent[0]['status'], 200)
+        # The stream is closed right away instead of sending a partial backlog.
+        self.assertEqual(len(sent), 3)
+        self.assertEqual(sent[-1], {'type': 'http.response.body', 'body': b''})
+
+
+class BloqNearestTest(APITestCase):
+    def setUp(self)->None:
+        self.url = reverse('bloq-nearest', kwargs={'version': 'v1'})
+        places = [
+            ("baixa", 38.7107, -9.1366),     # ~1.3 km from the point
+            ("alvalade", 38.7530, -9.1440),  # ~3.4 km
+            ("belem", 38.6979, -9.2063),     # ~6.3 km
+            ("porto", 41.1579, -8.6291),     # ~274 km
+        ]
+        for bloq_id, latitude, longitude in places:
+            bloq = Bloq.objects.create(id=bloq_id, title=bloq_id, address="Address",
+                                       latitude=latitude, longitude=longitude)
+            Locker.objects.create(id=f"{bloq_id}-1", bloqId=bloq, status=LockerStatus.OPEN,
+                                  isOccupied=False, size=LockerSize.M)
+        Locker.objects.filter(id="alvalade-1").update(size=LockerSize.L)
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.point = {'lat': 38.7223, 'lon': -9.1393}
+
+    def test_geohash_follows_coordinates(self)->None:
+        bloq = Bloq.objects.get(id="baixa")
+        self.assertTrue(bloq.geohash.startswith("eycs"))
+        bloq.latitude = None
+        bloq.save(update_fields=['latitude'])
+        self.assertEqual(Bloq.objects.get(id="baixa").geohash, "")
+
+    def test_nearest_within_radius(self)->None:
+        response = self.client.get(self.url, {**self.point, 'radius': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([bloq['id'] for bloq in response.data], ["baixa", "alvalade"])
+        self.assertEqual(response.data[0]['freeLockers'], 1)
+        self.assertLess(response.data[0]['distanceKm'], response.data[1]['distanceKm'])
+
+    def test_nearest_by_size_and_k(self)->None:
+        response = self.client.get(self.url, {**self.point, 'radius': 10, 'size': 'M'})
+        self.assertEqual([bloq['id'] for bloq in response.data], ["baixa", "belem"])
+        response = self.client.get(self.url, {**self.point, 'radius': 10, 'k': 1})
+        self.assertEqual([bloq['id'] for bloq in response.data], ["baixa"])
+
+    def test_occupied_lockers_are_skipped(self)->None:
+        Locker.objects.filter(id="baixa-1").update(state=LockerState.OCCUPIED)
+        response = self.client.get(self.url, {**self.point, 'radius': 5})
+        self.assertEqual([bloq['id'] for bloq in response.data], ["alvalade"])
+
+    def test_invalid_parameters(self)->None:
+        self.assertEqual(self.client.get(self.url, {'lat': 38.7}).status_code, 400)
+        response = self.client.get(self.url, {**self.point, 'radius': 500})
+        self.assertEqual(response.status_code, 400)
+
+
+class BloqSearchTest(APITestCase):
+    def setUp(self)->None:
+        self.url = reverse('bloq-list-create', kwargs={'version': 'v1'})
+        Bloq.objects.create(id="1", title="Lisboa Baixa", address="Rua Augusta 10")
+        Bloq.objects.create(id="2", title="Porto Centro", address="Avenida dos Aliados 5")
+        Bloq.objects.create(id="3", title="Lisboa Belem", address="Rua de Belem 1")
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_search_title_and_address(self)->None:
+        response = self.client.get(self.url, {'search': 'lisboa'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(bloq['id'] for bloq in response.data['results']), ["1", "3"])
+        response = self.client.get(self.url, {'search': 'aliados'})
+        self.assertEqual([bloq['id'] for bloq in response.data['results']], ["2"])
+
+    def test_search_is_paginated_with_sparse_fields(self)->None:
+        response = self.client.get(self.url, {'search': 'rua', 'page_size': 1, 'fields': 'id'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(list(response.data['results'][0]), ['id'])
+
+    def test_search_too_short(self)->None:
+        response = self.client.get(self.url, {'search': 'ru'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SchemaViewTest(TestCase):
+    def setUp(self)->None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(OPENAPI_SCHEMA_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema.clear_cache()
+        self.addCleanup(schema.clear_cache)
+        self.directory = directory.name
+
+    def test_schema_is_generated_once_and_stored(self)->None:
+        response = self.client.get('/swagger/v1.json')
+        self.assertEqual(response.status_code, 200)
+        spec = json.loads(response.content)
+        self.assertIn('/bloq/', spec['paths'])
+        self.assertNotIn('host', spec)
+        stored = schema.schema_dir() / f'v1-{schema.source_fingerprint()}.json'
+        self.assertEqual(stored.read_bytes(), response.content)
+        response = self.client.get('/swagger/v1.yaml')
+        self.assertEqual(response['Content-Type'], 'application/yaml')
+
+    def test_etag_revalidation(self)->None:
+        response = self.client.get('/swagger/v1.json')
+        etag = response['ETag']
+        response = self.client.get('/swagger/v1.json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_ui_loads_schema_by_url(self)->None:
+        response = self.client.get('/swagger/v1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'/swagger/v1.json', response.content)
+
+
+class LazyURLConfTest(TestCase):
+    def setUp(self)->None:
+        self.resolver = URLResolver(RegexPattern(r'^/'), [
+            path('api/', include('bloq.urls')),
+            path('docs/', lazy_include('project_bloq.missing_urls')),
+        ])
+
+    def test_module_is_imported_on_first_use(self)->None:
+        self.assertEqual(self.resolver.resolve('/api/').url_name, 'bloq-list-create')
+        with self.assertRaises(ModuleNotFoundError):
+            self.resolver.resolve('/docs/')
+
+    def test_patterns_are_read_from_attribute(self)->None:
+        urlconf = LazyURLConf('project_bloq.docs_urls', 'redoc_urlpatterns')
+        self.assertEqual(urlconf.urlpatterns[0].name, 'schema-redoc')
+
+    def test_lazy_routes_resolve_and_reverse(self)->None:
+        self.assertEqual(reverse('admin:index'), '/admin/')
+        self.assertEqual(reverse('schema-redoc'), '/redoc/')
+        response = self.client.get('/admin/')
+        self.assertRedirects(response, '/admin/login/?next=/admin/')
+        response = self.client.post('/api/v1/auth/token/login/', {})
+        self.assertEqual(response.status_code, 400)
+
+
+class ClientRateThrottleTest(APITestCase):
+    def setUp(self)->None:
+        rates = {'read': '2/min', 'bulk_write': '1/hour'}
+        settings_override = override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = reverse('bloq-list-create', kwargs={'version': 'v1'})
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_reads_are_limited_per_user(self)->None:
+        throttled_before = throttled_requests.value(scope='read', client=f'user:{self.user.pk}')
+        for _ in range(2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 30)
+        self.assertEqual(
+            throttled_requests.value(scope='read', client=f'user:{self.user.pk}'),
+            throttled_before + 1
+        )
+        other = Token.objects.create(user=User.objects.create_user(username='other', password='pass'))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + other.key)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_scopes_have_separate_buckets(self)->None:
+        bloq_data = [{"id": "1", "title": "Bloq A", "address": "Address A"}]
+        self.assertEqual(self.client.post(self.url, bloq_data, format='json').status_code, 201)
+        bloq_data[0]['id'] = '2'
+        self.assertEqual(self.client.post(self.url, bloq_data, format='json').status_code, 429)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_concurrent_requests_take_distinct_tokens(self)->None:
+        store = get_bucket_store()
+        if not isinstance(store, RedisBucketStore):
+            self.skipTest("Only the Redis store takes tokens atomically.")
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            waits = list(executor.map(lambda _: store.take('read:race', 1.0, 10.0), range(40)))
+        self.assertEqual(sum(1 for wait in waits if wait == 0), 10)
+
+
+class ShardingTest(TestCase):
+    def test_shard_map_places_bloqs_deterministically(self)->None:
+        self.assertEqual(ShardMap(['default']).shard_for_bloq('any'), 'default')
+        shard_map = ShardMap(['default', 'shard1', 'shard2'])
+        placements = [shard_map.shard_for_bloq(f'bloq-{i}') for i in range(300)]
+        self.assertEqual(placements, [shard_map.shard_for_bloq(f'bloq-{i}') for i in range(300)])
+        self.assertEqual(set(placements), {'default', 'shard1', 'shard2'})
+
+    @override_settings(DATABASE_SHARDS=['default', 'other'])
+    def test_unsaved_instances_follow_their_bloq(self)->None:
+        bloq_id = next(f'b{i}' for i in range(100) if shard_for_bloq(f'b{i}') == 'other')
+        locker = Locker(id='l1', bloqId=Bloq(id=bloq_id), status=LockerStatus.OPEN,
+                        size=LockerSize.M, isOccupied=False)
+        rent = Rent(id='r1', lockerId=locker, weight=1.0, size=LockerSize.M)
+        router = ShardRouter()
+        self.assertEqual(instance_shard(Bloq(id=bloq_id)), 'other')
+        self.assertEqual(router.db_for_write(Locker, instance=locker), 'other')
+        self.assertEqual(router.db_for_write(Rent, instance=rent), 'other')
+        self.assertIsNone(router.db_for_write(User, instance=User(username='user')))
+        self.assertTrue(router.allow_migrate('other', 'rent'))
+        self.assertFalse(router.allow_migrate('other', 'auth'))
+        self.assertTrue(router.allow_migrate('default', 'auth'))
+
+    def test_fan_out_merges_rows_in_order(self)->None:
+        for i in range(6):
+            Bloq.objects.create(id=f'b{i}', title=f'Bloq {i}', address='Address')
+        queryset = Bloq.objects.order_by('id')
+        picked = ['b0', 'b3', 'b4']
+        shards = [queryset.filter(id__in=picked), queryset.exclude(id__in=picked)]
+        merged = FanOutQuerySet([shard.values('id') for shard in shards])
+        self.assertEqual(merged.count(), 6)
+        self.assertEqual([row['id'] for row in merged[2:5]], ['b2', 'b3', 'b4'])
+        self.assertEqual([row['id'] for row in merged], [f'b{i}' for i in range(6)])
+        descending = FanOutQuerySet([shard.order_by('-id').values('id') for shard in shards])
+        self.assertEqual([row['id'] for row in descending[:3]], ['b5', 'b4', 'b3'])
+
+
+class FixedEstimatePagination(EstimatedCountPagination):
+    page_size = 2
+
+    def table_rows(self, queryset):
+        return 500000
+
+    def estimate_count(self, queryset):
+        return 500000
+
+
+class EstimatedCountPaginationTest(APITestCase):
+    def setUp(self)->None:
+        for i in range(5):
+            Bloq.objects.create(id=f'b{i}', title=f'Bloq {i}', address='Address')
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(self.user)
+
+    def paginate(self, **params):
+        request = Request(RequestFactory().get('/api/v1/bloq/', params))
+        paginator = FixedEstimatePagination()
+        page = paginator.paginate_queryset(Bloq.objects.order_by('id'), request)
+        return paginator.get_paginated_response([bloq.id for bloq in page]).data
+
+    def test_counting_can_be_turned_off(self)->None:
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/v1/bloq/', {'count': 'false', 'page_size': 2})
+        self.assertEqual((response.data['count'], response.data['countEstimated']), (None, False))
+        self.assertIn('page=2', response.data['next'])
+        counts = [query for query in captured if query['sql'].startswith('SELECT COUNT(')]
+        self.assertFalse([query for query in counts if 'bloq' in query['sql']])
+        response = self.client.get('/api/v1/bloq/', {'count': 'false', 'page_size': 2, 'page': 3})
+        self.assertEqual(([bloq['id'] for bloq in response.data['results']], response.data['next']),
+                         (['b4'], None))
+        response = self.client.get('/api/v1/bloq/', {'count': 'false', 'page': 4, 'page_size': 2})
+        self.assertEqual(response.status_code, 404)
+
+    def test_small_tables_are_counted_exactly(self)->None:
+        response = self.client.get('/api/v1/bloq/')
+        self.assertEqual((response.data['count'], response.data['countEstimated']), (5, False))
+
+    @override_settings(PAGINATION_ESTIMATE_THRESHOLD=1000)
+    def test_large_tables_are_estimated(self)->None:
+        data = self.paginate(page=3)
+        self.assertEqual((data['count'], data['countEstimated']), (500000, True))
+        self.assertEqual((data['results'], data['next']), (['b4'], None))
+
+    @override_settings(PAGINATION_ESTIMATE_THRESHOLD=None)
+    def test_estimates_can_be_disabled(self)->None:
+        data = self.paginate()
+        self.assertEqual((data['count'], data['countEstimated']), (5, False))
+
+    def analyze(self)->None:
+        if connection.vendor != 'postgresql':
+            self.skipTest("Only Postgres keeps table statistics.")
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE bloq_bloq')
+
+    def test_postgres_estimates_rows(self)->None:
+        self.analyze()
+        self.assertEqual(table_rows(Bloq.objects.all()), 5)
+        self.assertEqual(estimate_count(Bloq.objects.all()), 5)
+        self.assertLessEqual(estimate_count(Bloq.objects.filter(id='b1')), 5)
+
+    def test_postgres_plans_only_large_tables(self)->None:
+        self.analyze()
+        for threshold, estimated in ((1000, False), (2, True)):
+            with self.settings(PAGINATION_ESTIMATE_THRESHOLD=threshold), \
+                    CaptureQueriesContext(connection) as captured:
+                response = self.client.get('/api/v1/bloq/')
+            explains = [query for query in captured if query['sql'].startswith('EXPLAIN')]
+            self.assertEqual(bool(explains), estimated)
+            self.assertEqual((response.data['count'], response.data['countEstimated']),
+                             (5, estimated))
+
+
+class CascadeDeleteTest(APITestCase):
+    def setUp(self)->None:
+        for bloq_id in ('1', '2'):
+            bloq = Bloq.objects.create(id=bloq_id, title=f'Bloq {bloq_id}', address='Address')
+            for i in range(3):
+                locker = Locker.objects.create(id=f'{bloq_id}-{i}', bloqId=bloq, size=LockerSize.M,
+                                               status=LockerStatus.OPEN, isOccupied=False)
+                for j in range(2):
+                    Rent.objects.create(id=f'{locker.id}-{j}', lockerId=locker, weight=1.0,
+                                        size=LockerSize.M, status=RentStatus.CREATED)
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_delete_bloq_removes_dependents_in_batches(self)->None:
+        with self.assertNumQueries(20):
+            deletion.delete_bloq('1', batch_size=4)
+        self.assertFalse(Bloq.objects.filter(id='1').exists())
+        self.assertFalse(Locker.objects.filter(bloqId__id='1').exists())
+        self.assertEqual(Rent.objects.count(), 6)
+        self.assertEqual(Locker.objects.count(), 3)
+
+    def test_rents_created_during_deletion_are_deleted(self)->None:
+        created = []
+
+        def create_rent(deleted: int)->None:
+            # Right after the Rent pass, before the Lockers are deleted.
+            if deleted == 6 and not created:
+                locker = Locker.objects.get(id='1-2')
+                created.append(Rent.objects.create(
+                    id='late', lockerId=locker, weight=1.0, size=LockerSize.M,
+                    status=RentStatus.CREATED
+                ))
+
+        deletion.delete_bloq('1', batch_size=4, progress=create_rent)
+        self.assertTrue(created)
+        self.assertFalse(Rent.objects.filter(id='late').exists())
+        self.assertFalse(Bloq.objects.filter(id='1').exists())
+
+    def test_delete_bloq_in_background(self)->None:
+        url = reverse('bloq-detail', kwargs={'version': 'v1', 'id': '1'})
+        response = self.client.delete(f'{url}?async=true')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(Bloq.objects.filter(id='1').exists())
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual(job.task, 'bloq.deletion.delete_bloq_job')
+        queue.run(queue.claim('test'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress), (JobStatus.SUCCEEDED, 9))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(Rent.objects.count(), 6)
+
+    def test_delete_locker_removes_its_rents(self)->None:
+        response = self.client.delete(reverse('locker-detail', kwargs={'version': 'v1', 'id': '2-0'}))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Rent.objects.filter(lockerId__id='2-0').exists())
+        self.assertEqual(Rent.objects.count(), 10)
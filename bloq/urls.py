@@ -2,10 +2,12 @@
 Bloq URL Configuration
 '''
 from django.urls import path
-from .views import BloqBulkCreateView, BloqDetailView, BloqLockerAvailableView, BloqLockerOccupiedView, BloqLockersListView
+from .views import BloqBulkCreateView, BloqDetailView, BloqLockerAvailableView, BloqLockerOccupiedView, BloqLockersListView, BloqExportView, BloqNearestView
 
 urlpatterns = [
     path('', BloqBulkCreateView.as_view(), name='bloq-list-create'),
+    path('export/', BloqExportView.as_view(), name='bloq-export'),
+    path('nearest/', BloqNearestView.as_view(), name='bloq-nearest'),
     path('<str:id>/', BloqDetailView.as_view(), name='bloq-detail'),
     path('<str:id>/lockers/', BloqLockersListView.as_view(), name='bloq-lockers'),
     path('<str:id>/lockers/available/', BloqLockerAvailableView.as_view(), name='bloq-locker-available'),
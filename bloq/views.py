@@ -3,24 +3,43 @@ Views module for managing Bloq entities and their associated Lockers.
 """
 
 import logging
-from typing import Any, Type
-from django.db.models import QuerySet
-from rest_framework import generics
+from functools import reduce
+from itertools import chain
+from operator import or_
+from typing import Any, Dict, List, Optional, Set, Type
+from django.db.models import Count, Prefetch, Q, QuerySet
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError, NotFound
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.fields import BooleanField
 from rest_framework.request import Request
 from rest_framework.response import Response
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from locker.models import Locker
+from jobs.mixins import DeferrableMixin
+from jobs.serializers import JobSerializer
+from jobs.views import accepted, wants_async
+from project_bloq.exports import ExportView
+from project_bloq import sharding
+from project_bloq.mixins import ShardedObjectMixin, SparseFieldsMixin, ValuesListMixin
+from project_bloq.pagination import EstimatedCountPagination
+from project_bloq.swagger import ASYNC_PARAMETER, FIELDS_PARAMETER, IDEMPOTENCY_KEY_PARAMETER
+from locker.models import Locker, LockerSize, LockerState
 from locker.serializers import LockerSerializer
+from . import deletion, geo
+from .counts import grouped_locker_counts, locker_count_annotations, locker_counts
+from .filters import SEARCH_QUERY_PARAM, BloqSearchFilter
 from .models import Bloq
 from .serializers import BloqSerializer, BloqListSerializer
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-class StandardResultsSetPagination(PageNumberPagination):
+EXPAND_QUERY_PARAM = 'expand'
+EXPANSIONS = ('lockers', 'counts')
+COUNTS_QUERY_PARAM = 'counts'
+
+class StandardResultsSetPagination(EstimatedCountPagination):
     """
     Standard pagination class for Bloq views.
 
@@ -32,16 +51,20 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param: str = 'page_size'
     max_page_size: int = 100
 
-class BloqBulkCreateView(generics.ListCreateAPIView):
+class BloqBulkCreateView(DeferrableMixin, ValuesListMixin, generics.ListCreateAPIView):
     """
     API view to list all Bloqs or create multiple Bloqs.
 
     - **GET**: Returns a paginated list of all Bloq instances.
     - **POST**: Allows bulk creation of multiple Bloq instances.
+      With ``?async=true`` the creation runs as a background job (202).
     """
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     queryset = Bloq.objects.all().order_by('id')
+    filter_backends = [BloqSearchFilter]
+    idempotent_methods = ['POST']
+    throttle_scope = 'bulk_write'
 
     def get_serializer_class(self) -> Type[BloqSerializer]:
         """
@@ -55,12 +78,59 @@ class BloqBulkCreateView(generics.ListCreateAPIView):
             return BloqListSerializer
         return BloqSerializer
 
+    def wants_counts(self) -> bool:
+        """
+        Check whether the listed Bloqs should carry their Locker counts.
+
+        Raises:
+            ValidationError: If the counts are requested without the ``id`` field.
+        """
+        raw = self.request.query_params.get(COUNTS_QUERY_PARAM, '')
+        if raw.lower() not in BooleanField.TRUE_VALUES:
+            return False
+        fields = self.get_requested_fields()
+        if fields is not None and 'id' not in fields:
+            raise ValidationError({COUNTS_QUERY_PARAM: "Requires the 'id' field."})
+        return True
+
+    def get_paginated_response(self, data: List[Dict[str, Any]]) -> Response:
+        """
+        Add the Locker counts of the page's Bloqs when requested.
+
+        The page is selected first, so the counts only cover its Bloqs and take
+        one grouped query per shard, however many Bloqs there are in total.
+        """
+        if self.request.method == 'GET' and self.wants_counts():
+            counts = grouped_locker_counts([row['id'] for row in data])
+            for row in data:
+                row['counts'] = counts[row['id']]
+        return super().get_paginated_response(data)
+
     @swagger_auto_schema(
-        responses={200: BloqSerializer(many=True)}
+        responses={200: BloqSerializer(many=True)},
+        manual_parameters=[
+            FIELDS_PARAMETER,
+            openapi.Parameter(
+                SEARCH_QUERY_PARAM,
+                openapi.IN_QUERY,
+                description="Only return Bloqs whose title or address contains this "
+                            "fragment (at least 3 characters), best matches first",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                COUNTS_QUERY_PARAM,
+                openapi.IN_QUERY,
+                description="Add the total, available, occupied and closed Lockers of "
+                            "each Bloq, overall and per size",
+                type=openapi.TYPE_BOOLEAN
+            ),
+        ]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
-        Handle GET requests to list all Bloqs.
+        Handle GET requests to list all Bloqs, optionally filtered by ``search``.
+
+        With ``?counts=true`` each Bloq carries its Locker counts.
 
         Returns:
             A paginated list of Bloq instances.
@@ -70,7 +140,8 @@ class BloqBulkCreateView(generics.ListCreateAPIView):
 
     @swagger_auto_schema(
         request_body=BloqListSerializer,
-        responses={201: BloqSerializer(many=True)}
+        responses={201: BloqSerializer(many=True), 202: JobSerializer},
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER, ASYNC_PARAMETER]
     )
     def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -83,15 +154,24 @@ class BloqBulkCreateView(generics.ListCreateAPIView):
             The created Bloq instances.
         """
         logger.info("User '%s' is creating multiple Bloqs.", request.user.id)
+        deferred = self.defer(request)
+        if deferred is not None:
+            logger.info(
+                "User '%s' queued the creation of Bloqs as Job '%s'.",
+                request.user.id, deferred.data['id']
+            )
+            return deferred
         response = super().post(request, *args, **kwargs)
         logger.info("User '%s' successfully created Bloqs.", request.user.id)
         return response
 
-class BloqDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BloqDetailView(ShardedObjectMixin, SparseFieldsMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a specific Bloq instance.
 
-    - **GET**: Retrieve a Bloq by its ID.
+    - **GET**: Retrieve a Bloq by its ID. ``?expand=lockers,counts`` embeds its
+      Lockers and their counts per size and state, in two queries.
     - **PUT**: Update a Bloq instance.
     - **DELETE**: Delete a Bloq instance.
     """
@@ -100,8 +180,66 @@ class BloqDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     lookup_field: str = 'id'
 
+    def get_expand(self) -> Set[str]:
+        """
+        Return the expansions requested with the ``expand`` query parameter.
+
+        Raises:
+            ValidationError: If an unknown expansion is requested.
+        """
+        raw = self.request.query_params.get(EXPAND_QUERY_PARAM, '')
+        expand = {name.strip() for name in raw.split(',') if name.strip()}
+        unknown = expand.difference(EXPANSIONS)
+        if unknown:
+            raise ValidationError({EXPAND_QUERY_PARAM: (
+                f"Unknown expansion(s): {', '.join(sorted(unknown))}. "
+                f"Expected {', '.join(EXPANSIONS)}."
+            )})
+        return expand
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Load the requested expansions along with the Bloq.
+
+        The Lockers are prefetched in one query and the counts are conditional
+        aggregates of the Bloq query.
+        """
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        expand = self.get_expand()
+        if 'lockers' in expand:
+            queryset = queryset.prefetch_related(
+                Prefetch('locker_set', queryset=Locker.objects.order_by('id'))
+            )
+        if 'counts' in expand:
+            queryset = queryset.annotate(**locker_count_annotations())
+        return queryset
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Serialize the Bloq with the requested expansions.
+        """
+        expand = self.get_expand()
+        bloq = self.get_object()
+        data = dict(self.get_serializer(bloq).data)
+        if 'lockers' in expand:
+            data['lockers'] = LockerSerializer(bloq.locker_set.all(), many=True).data
+        if 'counts' in expand:
+            data['counts'] = locker_counts(bloq)
+        return Response(data)
+
     @swagger_auto_schema(
-        responses={200: BloqSerializer}
+        responses={200: BloqSerializer},
+        manual_parameters=[
+            FIELDS_PARAMETER,
+            openapi.Parameter(
+                EXPAND_QUERY_PARAM,
+                openapi.IN_QUERY,
+                description="Comma separated expansions: 'lockers' and/or 'counts'",
+                type=openapi.TYPE_STRING
+            ),
+        ]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -135,22 +273,35 @@ class BloqDetailView(generics.RetrieveUpdateDestroyAPIView):
         return response
 
     @swagger_auto_schema(
-        responses={204: None}
+        responses={204: None, 202: JobSerializer},
+        manual_parameters=[ASYNC_PARAMETER]
     )
     def delete(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
-        Handle DELETE requests to delete a Bloq instance.
+        Handle DELETE requests to delete a Bloq instance with its Lockers and Rents.
+
+        The dependents are deleted in batches of set-based DELETEs. With
+        ``?async=true`` the deletion runs as a background job.
 
         Returns:
-            An empty response with HTTP status 204 (No Content).
+            An empty response with HTTP status 204 (No Content), or 202 (Accepted)
+            with the job deleting the Bloq.
         """
         bloq_id = kwargs.get('id')
         logger.info("User '%s' is deleting Bloq with ID '%s'.", request.user.id, bloq_id)
-        response = super().delete(request, *args, **kwargs)
+        bloq = self.get_object()
+        if wants_async(request):
+            job = deletion.delete_bloq_later(bloq.id, user=request.user)
+            logger.info(
+                "User '%s' queued the deletion of Bloq with ID '%s' as Job '%s'.",
+                request.user.id, bloq_id, job.id
+            )
+            return accepted(request, job)
+        deletion.delete_bloq(bloq.id)
         logger.info("User '%s' successfully deleted Bloq with ID '%s'.", request.user.id, bloq_id)
-        return response
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-class BloqLockersListView(generics.ListAPIView):
+class BloqLockersListView(ValuesListMixin, generics.ListAPIView):
     """
     API view to list all Lockers associated with a specific Bloq.
 
@@ -159,6 +310,7 @@ class BloqLockersListView(generics.ListAPIView):
     serializer_class = LockerSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    shard_key_url_kwarg = 'id'
 
     def get_queryset(self) -> QuerySet:
         """
@@ -177,16 +329,17 @@ class BloqLockersListView(generics.ListAPIView):
         if not bloq_id:
             logger.error("Bloq ID not provided in request by user '%s'.", self.request.user.id)
             raise ValidationError("Bloq ID is required.")
-        if not Bloq.objects.filter(id=bloq_id).exists():
+        if not sharding.for_bloq(Bloq.objects.filter(id=bloq_id), bloq_id).exists():
             logger.error(
                 "Bloq with ID '%s' not found for user '%s'.", bloq_id, self.request.user.id
                 )
             raise NotFound("Bloq not found.")
         logger.info("User '%s' requested Lockers for Bloq ID '%s'.", self.request.user.id, bloq_id)
-        return Locker.objects.filter(bloqId=bloq_id).order_by('id')
+        return Locker.objects.filter(bloqId__id=bloq_id).order_by('id')
 
     @swagger_auto_schema(
-        responses={200: LockerSerializer(many=True)}
+        responses={200: LockerSerializer(many=True)},
+        manual_parameters=[FIELDS_PARAMETER]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -197,7 +350,7 @@ class BloqLockersListView(generics.ListAPIView):
         """
         return super().get(request, *args, **kwargs)
 
-class BloqLockerAvailableView(generics.ListAPIView):
+class BloqLockerAvailableView(ValuesListMixin, generics.ListAPIView):
     """
     API view to list all available Lockers of a specific Bloq.
 
@@ -206,6 +359,7 @@ class BloqLockerAvailableView(generics.ListAPIView):
     serializer_class = LockerSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    shard_key_url_kwarg = 'id'
 
     def get_queryset(self) -> QuerySet:
         """
@@ -224,7 +378,7 @@ class BloqLockerAvailableView(generics.ListAPIView):
         if not bloq_id:
             logger.error("Bloq ID not provided in request by user '%s'.", self.request.user.id)
             raise ValidationError("Bloq ID is required.")
-        if not Bloq.objects.filter(id=bloq_id).exists():
+        if not sharding.for_bloq(Bloq.objects.filter(id=bloq_id), bloq_id).exists():
             logger.error(
                 "Bloq with ID '%s' not found for user '%s'.", bloq_id, self.request.user.id
                 )
@@ -232,10 +386,13 @@ class BloqLockerAvailableView(generics.ListAPIView):
         logger.info(
             "User '%s' requested available Lockers for Bloq ID '%s'.", self.request.user.id, bloq_id
             )
-        return Locker.objects.filter(bloqId=bloq_id, isOccupied=False).order_by('id')
+        return Locker.objects.filter(
+            bloqId__id=bloq_id, state__in=LockerState.matching(is_occupied=False)
+        ).order_by('id')
 
     @swagger_auto_schema(
-        responses={200: LockerSerializer(many=True)}
+        responses={200: LockerSerializer(many=True)},
+        manual_parameters=[FIELDS_PARAMETER]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -246,7 +403,7 @@ class BloqLockerAvailableView(generics.ListAPIView):
         """
         return super().get(request, *args, **kwargs)
 
-class BloqLockerOccupiedView(generics.ListAPIView):
+class BloqLockerOccupiedView(ValuesListMixin, generics.ListAPIView):
     """
     API view to list all occupied Lockers of a specific Bloq.
 
@@ -255,6 +412,7 @@ class BloqLockerOccupiedView(generics.ListAPIView):
     serializer_class = LockerSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    shard_key_url_kwarg = 'id'
 
     def get_queryset(self) -> QuerySet:
         """
@@ -273,7 +431,7 @@ class BloqLockerOccupiedView(generics.ListAPIView):
         if not bloq_id:
             logger.error("Bloq ID not provided in request by user '%s'.", self.request.user.id)
             raise ValidationError("Bloq ID is required.")
-        if not Bloq.objects.filter(id=bloq_id).exists():
+        if not sharding.for_bloq(Bloq.objects.filter(id=bloq_id), bloq_id).exists():
             logger.error(
                 "Bloq with ID '%s' not found for user '%s'.", bloq_id, self.request.user.id
                 )
@@ -281,10 +439,13 @@ class BloqLockerOccupiedView(generics.ListAPIView):
         logger.info(
             "User '%s' requested occupied Lockers for Bloq ID '%s'.", self.request.user.id, bloq_id
             )
-        return Locker.objects.filter(bloqId=bloq_id, isOccupied=True).order_by('id')
+        return Locker.objects.filter(
+            bloqId__id=bloq_id, state__in=LockerState.matching(is_occupied=True)
+        ).order_by('id')
 
     @swagger_auto_schema(
-        responses={200: LockerSerializer(many=True)}
+        responses={200: LockerSerializer(many=True)},
+        manual_parameters=[FIELDS_PARAMETER]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -294,3 +455,126 @@ class BloqLockerOccupiedView(generics.ListAPIView):
             A paginated list of occupied Locker instances.
         """
         return super().get(request, *args, **kwargs)
+
+class BloqNearestView(generics.GenericAPIView):
+    """
+    API view to find the nearest Bloqs with free Lockers.
+
+    - **GET**: Returns up to ``k`` Bloqs within ``radius`` km of a point that have
+      at least one free Locker (of ``size``, if given), nearest first.
+
+    Candidates are read from the geohash index (the 3x3 block of grid cells
+    around the point) with their free Locker count in a single query per shard;
+    only those candidates are ranked by distance.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = BloqSerializer
+    default_radius: float = 5.0
+    max_radius: float = 100.0
+    default_k: int = 10
+    max_k: int = 50
+
+    def get_float_param(self, name: str, default: Optional[float],
+                        minimum: float, maximum: float) -> float:
+        """
+        Read a float query parameter within [minimum, maximum].
+
+        Raises:
+            ValidationError: If the parameter is missing or out of range.
+        """
+        raw = self.request.query_params.get(name)
+        if raw is None:
+            if default is None:
+                raise ValidationError({name: 'This parameter is required.'})
+            return default
+        try:
+            value = float(raw)
+        except ValueError as exc:
+            raise ValidationError({name: 'Must be a number.'}) from exc
+        if not minimum <= value <= maximum:
+            raise ValidationError({name: f'Must be between {minimum:g} and {maximum:g}.'})
+        return value
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Get the candidate Bloqs around the requested point.
+
+        Returns:
+            QuerySet of Bloqs in the covering grid cells and bounding box, annotated
+            with their number of free Lockers.
+        """
+        latitude = self.get_float_param('lat', None, -90, 90)
+        longitude = self.get_float_param('lon', None, -180, 180)
+        radius = self.get_float_param('radius', self.default_radius, 0, self.max_radius)
+        size = self.request.query_params.get('size')
+        if size is not None and size not in LockerSize.values:
+            raise ValidationError({'size': f'Must be one of {", ".join(LockerSize.values)}.'})
+
+        cells = geo.covering_cells(latitude, longitude, radius)
+        min_lat, max_lat, min_lon, max_lon = geo.bounding_box(latitude, longitude, radius)
+        free = Q(locker__state__in=LockerState.matching(is_occupied=False))
+        if size is not None:
+            free &= Q(locker__size=size)
+        queryset = Bloq.objects.filter(
+            reduce(or_, (Q(geohash__startswith=cell) for cell in cells)),
+            latitude__range=(min_lat, max_lat),
+        )
+        if -180 <= min_lon and max_lon <= 180:
+            queryset = queryset.filter(longitude__range=(min_lon, max_lon))
+        return queryset.annotate(freeLockers=Count('locker', filter=free)).filter(freeLockers__gt=0)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('lat', openapi.IN_QUERY, description="Latitude of the point",
+                              type=openapi.TYPE_NUMBER, required=True),
+            openapi.Parameter('lon', openapi.IN_QUERY, description="Longitude of the point",
+                              type=openapi.TYPE_NUMBER, required=True),
+            openapi.Parameter('radius', openapi.IN_QUERY,
+                              description="Search radius in km (default 5, max 100)",
+                              type=openapi.TYPE_NUMBER),
+            openapi.Parameter('size', openapi.IN_QUERY,
+                              description="Only count free Lockers of this size",
+                              type=openapi.TYPE_STRING, enum=LockerSize.values),
+            openapi.Parameter('k', openapi.IN_QUERY,
+                              description="Maximum number of Bloqs (default 10, max 50)",
+                              type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests to find the nearest Bloqs with free Lockers.
+
+        Returns:
+            The nearest Bloqs, each with its distance in km and free Locker count.
+        """
+        k = int(self.get_float_param('k', self.default_k, 1, self.max_k))
+        latitude = self.get_float_param('lat', None, -90, 90)
+        longitude = self.get_float_param('lon', None, -180, 180)
+        radius = self.get_float_param('radius', self.default_radius, 0, self.max_radius)
+        logger.info(
+            "User '%s' requested the nearest Bloqs to (%s, %s).",
+            request.user.id, latitude, longitude
+        )
+        nearest = []
+        for bloq in chain.from_iterable(sharding.each_shard(self.get_queryset())):
+            distance = geo.distance_km(latitude, longitude, bloq.latitude, bloq.longitude)
+            if distance <= radius:
+                nearest.append((distance, bloq))
+        nearest.sort(key=lambda item: (item[0], item[1].id))
+        results = []
+        for distance, bloq in nearest[:k]:
+            data = self.get_serializer(bloq).data
+            data['distanceKm'] = round(distance, 3)
+            data['freeLockers'] = bloq.freeLockers
+            results.append(data)
+        return Response(results)
+
+class BloqExportView(ExportView):
+    """
+    API view to export all Bloqs.
+
+    - **GET**: Streams every Bloq as NDJSON (default) or CSV.
+    """
+    queryset = Bloq.objects.all().order_by('id')
+    serializer_class = BloqSerializer
+    export_name = 'bloqs'
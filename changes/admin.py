@@ -0,0 +1,6 @@
+'''
+Admin page for the changes app.
+'''
+
+
+# Register your models here.
@@ -0,0 +1,12 @@
+'''
+This file is used to configure the app name.
+'''
+from django.apps import AppConfig
+
+
+class ChangesConfig(AppConfig):
+    '''
+    Changes app configuration
+    '''
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'changes'
@@ -0,0 +1,48 @@
+# Stamps existing lockers and rents with distinct change sequence values.
+
+from django.db import migrations
+
+STAMPED_MODELS = [('locker', 'Locker'), ('rent', 'Rent')]
+
+
+def backfill(apps, schema_editor):
+    '''
+    Number existing rows in primary key order and seed the counter past them.
+    '''
+    connection = schema_editor.connection
+    last = 0
+    for app_label, model_name in STAMPED_MODELS:
+        model = apps.get_model(app_label, model_name)
+        table = connection.ops.quote_name(model._meta.db_table)
+        pk = connection.ops.quote_name(model._meta.pk.column)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET "changeSeq" = numbered.seq FROM ('
+                    f'  SELECT {pk} AS pk, %s + row_number() OVER (ORDER BY {pk}) AS seq'
+                    f'  FROM {table}'
+                    f') AS numbered WHERE {table}.{pk} = numbered.pk',
+                    [last],
+                )
+        else:
+            manager = model.objects.using(connection.alias)
+            for seq, pk_value in enumerate(
+                manager.order_by('pk').values_list('pk', flat=True).iterator(), start=last + 1
+            ):
+                manager.filter(pk=pk_value).update(changeSeq=seq)
+        last += model.objects.using(connection.alias).count()
+    counter = apps.get_model('changes', 'ChangeCounter')
+    counter.objects.using(connection.alias).update_or_create(pk=1, defaults={'value': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0001_initial'),
+        ('locker', '0004_locker_changeseq'),
+        ('rent', '0003_rent_changeseq'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
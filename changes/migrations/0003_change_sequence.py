@@ -0,0 +1,46 @@
+# Allocates change sequence values from a Postgres sequence instead of the counter row.
+
+from django.db import migrations
+
+SEQUENCE = 'changes_change_seq'
+
+
+def create_sequence(apps, schema_editor):
+    '''
+    Create the sequence, starting after the last value of the counter row.
+    '''
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    counter = apps.get_model('changes', 'ChangeCounter')
+    last = counter.objects.using(schema_editor.connection.alias).filter(pk=1).values_list(
+        'value', flat=True
+    ).first() or 0
+    schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{SEQUENCE}" AS bigint')
+    schema_editor.execute(f"SELECT setval('\"{SEQUENCE}\"', %s, false)", [last + 1])
+
+
+def drop_sequence(apps, schema_editor):
+    '''
+    Hand the last allocated value back to the counter row and drop the sequence.
+    '''
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT last_value FROM "{SEQUENCE}"')
+        last = cursor.fetchone()[0]
+    counter = apps.get_model('changes', 'ChangeCounter')
+    counter.objects.using(schema_editor.connection.alias).update_or_create(
+        pk=1, defaults={'value': last}
+    )
+    schema_editor.execute(f'DROP SEQUENCE "{SEQUENCE}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0002_backfill_change_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -0,0 +1,137 @@
+'''
+Models for the Changes app.
+
+Every write to a change-stamped model (Locker, Rent) is stamped with the ID of
+its transaction (``changeXid``) and the next value of a change sequence
+(``changeSeq``), and the feed reads rows in ``(changeXid, changeSeq)`` order.
+
+On Postgres the sequence is a database sequence, so writers never wait for each
+other. Transactions commit in any order, so the feed only reads rows written by
+transactions older than the oldest one still running (see ``visible_below``):
+no change can appear later below that watermark, so a reader resuming after the
+last position it read never skips a committed change.
+
+Other databases (SQLite in development and tests) run one write transaction at
+a time; there the sequence is a counter row and every transaction ID is 0.
+'''
+from typing import Optional, Tuple
+from django.db import connections, models, router, transaction
+from django.db.models import F
+
+# Postgres sequence allocating change sequence values, created by a migration.
+CHANGE_SEQUENCE = 'changes_change_seq'
+
+
+class ChangeCounter(models.Model):
+    '''
+    Single row holding the last allocated change sequence value.
+
+    Only used on databases without sequences; the row lock serializes writers.
+    '''
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    value = models.BigIntegerField(default=0)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"ChangeCounter {self.value}"
+
+    @classmethod
+    def allocate(cls, using=None):
+        '''
+        Allocate the next change sequence value.
+
+        Must run inside the transaction of the write it stamps, which keeps the
+        counter row locked until that write is committed.
+        '''
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            counter = cls.objects.using(using)
+            if not counter.filter(pk=1).update(value=F('value') + 1):
+                counter.get_or_create(pk=1)
+                counter.filter(pk=1).update(value=F('value') + 1)
+            return counter.values_list('value', flat=True).get(pk=1)
+
+
+def allocate(using: str) -> Tuple[int, int]:
+    '''
+    Allocate the next change position of a write on a database.
+
+    Returns:
+        Tuple[int, int]: The ID of the running transaction and the next change
+          sequence value.
+    '''
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return 0, ChangeCounter.allocate(using=using)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_current(), nextval(%s)', [CHANGE_SEQUENCE])
+        xid, seq = cursor.fetchone()
+    return xid, seq
+
+
+def visible_below(using: str) -> Optional[int]:
+    '''
+    Return the transaction ID below which no change can still be committed.
+
+    Rows stamped with a lower ``changeXid`` are final: their transaction has
+    committed, or is the current one. Read it before the rows, so they are read
+    with a later snapshot.
+
+    Returns:
+        Optional[int]: The oldest other running transaction ID (or the next
+          one to start), None if every visible change is final (databases with
+          a single writer).
+    '''
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT coalesce('
+            ' (SELECT min(xip) FROM txid_snapshot_xip(txid_current_snapshot()) AS xip),'
+            ' txid_snapshot_xmax(txid_current_snapshot()))'
+        )
+        return cursor.fetchone()[0]
+
+
+class ChangeStampedQuerySet(models.QuerySet):
+    '''
+    QuerySet that stamps rows changed by ``update()`` with a new change position.
+    '''
+
+    def update(self, **kwargs):
+        '''
+        Update the matching rows and stamp them with the next change position.
+        '''
+        with transaction.atomic(using=self.db):
+            if 'changeSeq' not in kwargs:
+                kwargs['changeXid'], kwargs['changeSeq'] = allocate(self.db)
+            return super().update(**kwargs)
+
+
+class ChangeStampedModel(models.Model):
+    '''
+    Abstract model stamping every save with the next change position.
+    '''
+    changeXid = models.BigIntegerField(default=0, editable=False)
+    changeSeq = models.BigIntegerField(default=0, editable=False)
+
+    objects = ChangeStampedQuerySet.as_manager()
+
+    class Meta:
+        '''
+        Meta class for ChangeStampedModel.
+        '''
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        '''
+        Save the instance, stamping it with the next change position.
+        '''
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self.changeXid, self.changeSeq = allocate(using)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'changeXid', 'changeSeq'}
+            super().save(*args, **kwargs)
@@ -0,0 +1,117 @@
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from bloq.models import Bloq
+from locker.models import Locker, LockerState, LockerStatus
+from rent.models import Rent, RentStatus
+from .views import parse_cursor
+
+
+def position(instance):
+    return instance.changeXid, instance.changeSeq
+
+
+def since(instance):
+    return f'{instance.changeXid}.{instance.changeSeq}'
+
+
+class ChangeSequenceTest(TestCase):
+    def setUp(self):
+        self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Address A")
+
+    def test_writes_are_stamped_in_order(self):
+        locker = Locker.objects.create(
+            id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False
+        )
+        rent = Rent.objects.create(
+            id="1", lockerId=locker, weight=1.0, size="M", status=RentStatus.CREATED
+        )
+        self.assertGreater(position(rent), position(locker))
+        first_position = position(locker)
+        locker.status = LockerStatus.CLOSED
+        locker.save()
+        self.assertGreater(position(locker), position(rent))
+        self.assertGreater(position(locker), first_position)
+        self.assertEqual(Locker.objects.get(id="1").changeSeq, locker.changeSeq)
+
+    def test_queryset_update_is_stamped(self):
+        locker = Locker.objects.create(
+            id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False
+        )
+        Locker.objects.filter(id="1").update(state=LockerState.OPEN_OCCUPIED)
+        self.assertGreater(position(Locker.objects.get(id="1")), position(locker))
+
+
+class ChangeFeedAPITest(APITestCase):
+    def setUp(self):
+        self.url = reverse('change-feed', kwargs={'version': 'v1'})
+        self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Address A")
+        self.locker = Locker.objects.create(
+            id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False
+        )
+        self.rent = Rent.objects.create(
+            id="1", lockerId=self.locker, weight=1.0, size="M", status=RentStatus.WAITING_DROPOFF
+        )
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_feed_returns_changes_in_order(self):
+        response = self.client.get(self.url, {'since': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['type'] for entry in response.data['results']], ['locker', 'rent'])
+        self.assertEqual(response.data['results'][1]['data']['id'], '1')
+        self.assertNotIn('changeSeq', response.data['results'][0]['data'])
+        self.assertEqual(response.data['lastSeq'], since(self.rent))
+        self.assertFalse(response.data['hasMore'])
+
+    def test_feed_only_returns_newer_changes(self):
+        url = reverse('rent-dropoff', kwargs={'version': 'v1', 'id': self.rent.id})
+        self.client.patch(url, {}, format='json')
+
+        response = self.client.get(self.url, {'since': since(self.rent)})
+        self.assertEqual([entry['type'] for entry in response.data['results']], ['locker', 'rent'])
+        self.assertTrue(response.data['results'][0]['data']['isOccupied'])
+        self.assertEqual(response.data['results'][1]['data']['status'], RentStatus.WAITING_PICKUP)
+
+    def test_feed_batches_keep_sequence_groups_together(self):
+        Locker.objects.create(id="2", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
+        last = Locker.objects.create(
+            id="3", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False
+        )
+        Locker.objects.update(state=LockerState.CLOSED_FREE)
+        self.rent.save()
+
+        response = self.client.get(self.url, {'since': since(last), 'limit': 1})
+        self.assertEqual(
+            [entry['data']['id'] for entry in response.data['results']], ['1', '2', '3']
+        )
+        self.assertTrue(response.data['hasMore'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([entry['type'] for entry in response.data['results']], ['rent'])
+        self.assertFalse(response.data['hasMore'])
+
+    def test_feed_rejects_invalid_since(self):
+        response = self.client.get(self.url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'since': '1.-2'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_feed_accepts_plain_sequence_values(self):
+        response = self.client.get(self.url, {'since': self.locker.changeSeq})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('rent', [entry['type'] for entry in response.data['results']])
+
+    def test_feed_rejects_cursor_of_other_shard_count(self):
+        response = self.client.get(self.url, {'since': '0.1,0.2'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FeedCursorTest(TestCase):
+    def test_cursor_has_a_position_per_shard(self):
+        self.assertEqual(parse_cursor('5.7,0.3', 2), ((5, 7), (0, 3)))
+        self.assertEqual(parse_cursor('4', 3), ((0, 4),) * 3)
+        with self.assertRaises(ValueError):
+            parse_cursor('1.1,2.2', 3)
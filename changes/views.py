@@ -0,0 +1,241 @@
+"""
+Views for the Changes app.
+
+This module contains the incremental change feed, which returns the Lockers and
+Rents written since a given change position, in order and in bounded batches,
+so partner systems can sync without re-reading whole lists.
+
+A position is the ``(changeXid, changeSeq)`` stamp of a write (see
+``changes.models``), written ``<changeXid>.<changeSeq>``. A plain sequence value
+is read as transaction 0, which is how rows written before transaction IDs
+were stamped are positioned.
+
+Every shard stamps its own positions, so the feed reads each shard after its
+own position: the cursor is the comma separated list of positions, one per
+shard in ``DATABASE_SHARDS`` order (a single position with one shard).
+"""
+
+import heapq
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from django.db.models import Q
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from locker.models import Locker
+from locker.serializers import LockerSerializer
+from rent.models import Rent
+from rent.serializers import RentSerializer
+from project_bloq.serializers import ValuesSerializer
+from project_bloq.sharding import get_shard_map
+from .models import visible_below
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+FEED_SOURCES = [
+    ('locker', Locker, LockerSerializer),
+    ('rent', Rent, RentSerializer),
+]
+
+Position = Tuple[int, int]
+Cursor = Tuple[Position, ...]
+
+
+def parse_position(raw: str) -> Position:
+    """
+    Parse a change position, ``<changeXid>.<changeSeq>`` or a sequence value.
+
+    Raises:
+        ValueError: If the value is not a position.
+    """
+    xid, _, seq = str(raw).rpartition('.')
+    position = (int(xid) if xid else 0, int(seq))
+    if min(position) < 0:
+        raise ValueError(raw)
+    return position
+
+
+def format_position(position: Position) -> str:
+    """
+    Write a change position as ``<changeXid>.<changeSeq>``.
+    """
+    return f'{position[0]}.{position[1]}'
+
+
+def parse_cursor(raw: str, shards: int) -> Cursor:
+    """
+    Parse a feed cursor holding one position per shard.
+
+    A single position applies to every shard, so ``0`` reads the whole feed.
+
+    Raises:
+        ValueError: If the value is not a cursor for this number of shards.
+    """
+    positions = tuple(parse_position(part) for part in str(raw).split(','))
+    if len(positions) == 1:
+        return positions * shards
+    if len(positions) != shards:
+        raise ValueError(raw)
+    return positions
+
+
+def format_cursor(cursor: Cursor) -> str:
+    """
+    Write a feed cursor as its comma separated positions.
+    """
+    return ','.join(format_position(position) for position in cursor)
+
+
+def after(position: Position, watermark: Optional[int] = None) -> Q:
+    """
+    Return the condition matching the final changes after a position.
+    """
+    xid, seq = position
+    condition = Q(changeXid__gt=xid) | Q(changeXid=xid, changeSeq__gt=seq)
+    if watermark is not None:
+        condition &= Q(changeXid__lt=watermark)
+    return condition
+
+
+class ChangeFeedView(generics.GenericAPIView):
+    """
+    API view returning Lockers and Rents changed since a sequence value.
+
+    - **GET**: Returns up to ``limit`` changes after the ``since`` cursor, in
+      position order on each shard. Rows stamped by the same bulk write share a
+      position and are always returned in the same batch.
+    """
+    permission_classes = [IsAuthenticated]
+    default_limit: int = 100
+    max_limit: int = 1000
+
+    def get_int_param(self, name: str, default: int, maximum: int = None) -> int:
+        """
+        Read a non-negative integer query parameter.
+
+        Raises:
+            ValidationError: If the parameter is not a non-negative integer.
+        """
+        raw = self.request.query_params.get(name, default)
+        try:
+            value = int(raw)
+        except (TypeError, ValueError) as exc:
+            raise ValidationError({name: 'Must be a non-negative integer.'}) from exc
+        if value < 0:
+            raise ValidationError({name: 'Must be a non-negative integer.'})
+        return min(value, maximum) if maximum is not None else value
+
+    def get_cursor_param(self, name: str, shards: int) -> Cursor:
+        """
+        Read a feed cursor query parameter.
+
+        Raises:
+            ValidationError: If the parameter is not a cursor.
+        """
+        raw = self.request.query_params.get(name, '0')
+        try:
+            return parse_cursor(raw, shards)
+        except ValueError as exc:
+            raise ValidationError(
+                {name: 'Must be a change position (<changeXid>.<changeSeq>) per shard.'}
+            ) from exc
+
+    @staticmethod
+    def fetch(source: Tuple[str, Any, Any], condition: Q, using: str,
+              limit: Optional[int] = None) -> List[Tuple[Position, Dict[str, Any]]]:
+        """
+        Fetch changed rows of one feed source on one shard as feed entries,
+        ordered by position.
+        """
+        kind, model, serializer_class = source
+        serializer = ValuesSerializer.for_serializer(serializer_class)
+        queryset = (model.objects.using(using).filter(condition)
+                    .order_by('changeXid', 'changeSeq', 'pk')
+                    .values('changeXid', 'changeSeq', *serializer.sources))
+        if limit is not None:
+            queryset = queryset[:limit]
+        entries = []
+        for row in queryset:
+            position = (row['changeXid'], row['changeSeq'])
+            entries.append((position, {
+                'seq': format_position(position),
+                'type': kind,
+                'data': serializer.to_representation(row),
+            }))
+        return entries
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'since',
+                openapi.IN_QUERY,
+                description="Return changes after this cursor (the lastSeq of the previous "
+                            "response)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'limit',
+                openapi.IN_QUERY,
+                description="Maximum number of changes to return",
+                type=openapi.TYPE_INTEGER
+            ),
+        ]
+    )
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests to read the change feed.
+
+        Returns:
+            - Response: The changes, the last position returned and the URL of
+              the next batch.
+        """
+        shards = list(get_shard_map())
+        since = self.get_cursor_param('since', len(shards))
+        limit = max(self.get_int_param('limit', self.default_limit, self.max_limit), 1)
+        logger.info(
+            "User '%s' requested changes since %s.", request.user.id, format_cursor(since)
+        )
+
+        batches = []
+        for index, alias in enumerate(shards):
+            condition = after(since[index], visible_below(alias))
+            for source in FEED_SOURCES:
+                batches.append([
+                    (position, index, entry) for position, entry
+                    in self.fetch(source, condition, alias, limit=limit + 1)
+                ])
+        merged = list(heapq.merge(*batches, key=lambda item: item[0]))
+        has_more = len(merged) > limit
+        results = merged[:limit]
+
+        cursor = list(since)
+        for position, index, _ in results:
+            cursor[index] = position
+        if has_more:
+            # Complete the last position group of each shard, so the next batch
+            # starts cleanly.
+            seen = {(index, entry['type'], entry['data']['id']) for _, index, entry in results}
+            for index in sorted({index for _, index, _ in results}):
+                group = Q(changeXid=cursor[index][0], changeSeq=cursor[index][1])
+                for source in FEED_SOURCES:
+                    results.extend(
+                        (position, index, entry) for position, entry
+                        in self.fetch(source, group, shards[index])
+                        if (index, entry['type'], entry['data']['id']) not in seen
+                    )
+
+        last_seq = format_cursor(tuple(cursor))
+        next_url = replace_query_param(request.build_absolute_uri(), 'since', last_seq)
+        results = [entry for _, _, entry in results]
+        return Response({
+            'lastSeq': last_seq,
+            'hasMore': has_more,
+            'next': next_url,
+            'results': results,
+        })
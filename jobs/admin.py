@@ -0,0 +1,6 @@
+'''
+Admin page for the jobs app.
+'''
+
+
+# Register your models here.
@@ -0,0 +1,71 @@
+"""
+Management command running a background job worker.
+
+Start as many as needed (e.g. one per container); they share the queue:
+
+    python manage.py run_jobs
+
+With ``--burst`` the worker exits once the queue is empty, e.g. for cron.
+"""
+
+import os
+import signal
+import socket
+import time
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import close_old_connections
+from jobs import queue
+
+
+class Command(BaseCommand):
+    """
+    Claim and run queued jobs until stopped.
+    """
+    help = 'Run a worker processing queued background jobs.'
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stopping = False
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--burst', action='store_true', help='Exit once no job is due.'
+        )
+        parser.add_argument(
+            '--max-jobs', type=int, default=None,
+            help='Exit after running this many jobs.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=None,
+            help='Seconds to sleep while the queue is empty.',
+        )
+
+    def stop(self, *args: Any) -> None:
+        """
+        Let the current job finish, then exit.
+        """
+        self.stopping = True
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        handlers = {
+            signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        poll_interval = options['poll_interval'] or queue.get_option('POLL_INTERVAL')
+        processed = 0
+        try:
+            while not self.stopping and processed != options['max_jobs']:
+                close_old_connections()
+                job = queue.claim(worker)
+                if job is None:
+                    if options['burst']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                queue.run(job)
+                processed += 1
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f'Processed {processed} jobs.')
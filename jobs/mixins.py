@@ -0,0 +1,44 @@
+"""
+View mixin running requests in the background on demand.
+"""
+
+from typing import Optional
+from rest_framework.request import Request
+from rest_framework.response import Response
+from .queue import enqueue
+from .tasks import replay_request
+from .views import accepted, wants_async
+
+
+class DeferrableMixin:
+    """
+    Lets clients run a (bulk) write request as a background job with ``?async=true``.
+
+    The view's handler calls ``defer`` first and returns its response when
+    there is one: the request is stored as a job, replayed through the same
+    view by a worker, and the client gets a 202 with the job to poll.
+    """
+
+    def defer(self, request: Request) -> Optional[Response]:
+        """
+        Queue the request as a job if the client asked for it.
+
+        Returns:
+            Optional[Response]: The 202 response, or None to handle the request now.
+        """
+        if not wants_async(request):
+            return None
+        view = type(self)
+        job = enqueue(
+            replay_request,
+            user=request.user,
+            total=len(request.data) if isinstance(request.data, list) else None,
+            view=f'{view.__module__}.{view.__qualname__}',
+            request={
+                'method': request.method,
+                'path': request.path,
+                'data': request.data,
+                'kwargs': self.kwargs,
+            },
+        )
+        return accepted(request, job)
@@ -0,0 +1,85 @@
+'''
+Models for the Jobs app.
+
+Long running operations (bulk creates, cascading deletes) are stored as Job
+rows and executed by ``manage.py run_jobs`` workers instead of inside the
+request. Workers claim queued jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+so any number of them can share the table without a message broker.
+'''
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class JobStatus(models.TextChoices):
+    '''
+    Enum for Job status
+    '''
+    QUEUED = 'QUEUED', 'Queued'
+    RUNNING = 'RUNNING', 'Running'
+    SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+    FAILED = 'FAILED', 'Failed'
+
+
+class Job(models.Model):
+    '''
+    A unit of background work: a task function and its keyword arguments.
+
+    ``progress`` and ``total`` are reported by the task while it runs, and
+    ``heartbeatAt`` with them; a RUNNING job whose heartbeat is older than the
+    lease was abandoned by its worker and is claimed again.
+    '''
+    id = models.BigAutoField(primary_key=True)
+    task = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    userId = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    maxAttempts = models.PositiveSmallIntegerField(default=3)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    runAt = models.DateTimeField(default=timezone.now)
+    createdAt = models.DateTimeField(default=timezone.now)
+    startedAt = models.DateTimeField(null=True, blank=True)
+    heartbeatAt = models.DateTimeField(null=True, blank=True)
+    finishedAt = models.DateTimeField(null=True, blank=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        '''
+        Meta class for Job.
+        '''
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'runAt'], name='jobs_job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} - {self.task} {self.status}"
+
+    def claimed(self):
+        '''
+        Return a queryset of this job's row while this attempt still holds it.
+
+        Once the job was claimed again by another worker (or attempt), writes
+        through it match no row, so a late attempt cannot overwrite the new one.
+        '''
+        return Job.objects.filter(pk=self.pk, worker=self.worker, attempts=self.attempts)
+
+    def report(self, progress, total=None):
+        '''
+        Record the progress of the running job and renew its lease.
+        '''
+        self.progress = progress
+        if total is not None:
+            self.total = total
+        self.heartbeatAt = timezone.now()
+        self.claimed().update(
+            progress=self.progress, total=self.total, heartbeatAt=self.heartbeatAt
+        )
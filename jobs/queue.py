@@ -0,0 +1,225 @@
+"""
+Database backed job queue.
+
+- ``task`` marks a function as runnable by the workers; it is called with the
+  Job and the job's payload as keyword arguments, and may call
+  ``job.report(progress, total)`` as it goes.
+- ``enqueue`` stores a job for a task, to be picked up by a worker.
+- ``claim`` and ``run`` are the two halves of a worker iteration (see
+  ``manage.py run_jobs``).
+
+A task raising ``JobFailed`` fails its job at once; any other exception is
+retried with an exponential backoff until ``maxAttempts`` is reached. Since a
+job may run more than once, tasks must be safe to repeat (e.g. run in a single
+transaction).
+
+While a task runs, a heartbeat thread renews the job's lease, so long tasks are
+not claimed again. Heartbeats, progress and the outcome are only written while
+the attempt still holds the job (see ``Job.claimed``).
+
+Settings come from the ``JOBS`` dict:
+
+- ``LEASE``: Seconds without a heartbeat after which a running job is
+  considered abandoned and claimed again (300).
+- ``HEARTBEAT``: Seconds between two heartbeats of a running job (60).
+- ``MAX_ATTEMPTS``: Default number of attempts of a job (3).
+- ``RETRY_DELAY``: Seconds before the first retry, doubled for each further one (10).
+- ``POLL_INTERVAL``: Seconds a worker sleeps when the queue is empty (1.0).
+"""
+
+import datetime
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+from django.conf import settings
+from django.contrib.auth.models import AbstractBaseUser
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from project_bloq.metrics import Counter
+from .models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JOBS_DEFAULTS: Dict[str, Any] = {
+    'LEASE': 300,
+    'HEARTBEAT': 60,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    'POLL_INTERVAL': 1.0,
+}
+
+jobs_processed = Counter(
+    'jobs_processed_total', 'Job attempts run by the workers.', ('task', 'outcome')
+)
+
+
+class JobFailed(Exception):
+    """
+    Raised by a task to fail its job without retrying it.
+    """
+
+    def __init__(self, message: str, result: Any = None) -> None:
+        super().__init__(message)
+        self.result = result
+
+
+def get_option(name: str) -> Any:
+    """
+    Return a job queue setting.
+    """
+    return {**JOBS_DEFAULTS, **getattr(settings, 'JOBS', {})}[name]
+
+
+def task(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Mark a function as a job task.
+    """
+    func.job_task = True
+    return func
+
+
+def task_name(func: Callable[..., Any]) -> str:
+    """
+    Return the dotted path a task is stored and imported by.
+    """
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func: Callable[..., Any], user: Optional[AbstractBaseUser] = None,
+            total: Optional[int] = None, **payload: Any) -> Job:
+    """
+    Queue a job running ``func(job, **payload)``.
+
+    The payload must be JSON serializable.
+    """
+    if not getattr(func, 'job_task', False):
+        raise ValueError(f'{task_name(func)} is not a job task.')
+    job = Job.objects.create(
+        task=task_name(func),
+        payload=payload,
+        userId=user if user is not None and user.is_authenticated else None,
+        maxAttempts=get_option('MAX_ATTEMPTS'),
+        total=total,
+    )
+    logger.info("Queued job %s (%s).", job.id, job.task)
+    return job
+
+
+def claim(worker: str) -> Optional[Job]:
+    """
+    Take the next due job, or an abandoned running one, and mark it as running.
+
+    Rows locked by other workers are skipped, so concurrent workers never
+    claim the same job.
+    """
+    now = timezone.now()
+    abandoned = now - datetime.timedelta(seconds=get_option('LEASE'))
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=JobStatus.QUEUED, runAt__lte=now)
+                    | Q(status=JobStatus.RUNNING, heartbeatAt__lt=abandoned))
+            .order_by('runAt', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.worker = worker
+        job.startedAt = job.heartbeatAt = now
+        job.save(update_fields=['status', 'attempts', 'worker', 'startedAt', 'heartbeatAt'])
+    return job
+
+
+class Heartbeat:
+    """
+    Context manager renewing the lease of a running job from a thread.
+    """
+
+    def __init__(self, job: Job, interval: Optional[float] = None) -> None:
+        self.job = job
+        self.interval = interval or get_option('HEARTBEAT')
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name=f'job-heartbeat-{job.id}', daemon=True
+        )
+
+    def __enter__(self) -> 'Heartbeat':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def beat(self) -> bool:
+        """
+        Renew the lease once.
+
+        Returns:
+            bool: Whether the attempt still holds the job.
+        """
+        return bool(self.job.claimed().update(heartbeatAt=timezone.now()))
+
+    def _run(self) -> None:
+        """
+        Beat every ``interval`` seconds until stopped.
+        """
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if not self.beat():
+                        logger.warning("Job %s (%s) was claimed again by another worker.",
+                                       self.job.id, self.job.task)
+                        return
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Heartbeat of job %s failed.", self.job.id)
+        finally:
+            connection.close()
+
+
+def finish(job: Job, status: str, **fields: Any) -> None:
+    """
+    Store the outcome of a job attempt, unless the job was claimed again since.
+    """
+    job.status = status
+    for name, value in fields.items():
+        setattr(job, name, value)
+    if not job.claimed().update(status=status, **fields):
+        logger.warning("Job %s (%s) was claimed again; dropping the outcome of attempt %d.",
+                       job.id, job.task, job.attempts)
+        return
+    jobs_processed.inc(task=job.task, outcome=status.lower())
+
+
+def run(job: Job) -> None:
+    """
+    Run a claimed job and record its result, its failure or its next retry.
+    """
+    try:
+        func = import_string(job.task)
+        if not getattr(func, 'job_task', False):
+            raise JobFailed(f'{job.task} is not a job task.')
+        with Heartbeat(job):
+            result = func(job, **job.payload)
+    except JobFailed as exc:
+        logger.warning("Job %s (%s) failed: %s", job.id, job.task, exc)
+        finish(job, JobStatus.FAILED, result=exc.result, error=str(exc),
+               finishedAt=timezone.now())
+    except Exception as exc:  # pylint: disable=broad-except
+        now = timezone.now()
+        if job.attempts < job.maxAttempts:
+            delay = get_option('RETRY_DELAY') * 2 ** (job.attempts - 1)
+            logger.exception("Job %s (%s) failed, retrying in %ss.", job.id, job.task, delay)
+            finish(job, JobStatus.QUEUED, error=repr(exc),
+                   runAt=now + datetime.timedelta(seconds=delay))
+        else:
+            logger.exception("Job %s (%s) failed after %d attempts.",
+                             job.id, job.task, job.attempts)
+            finish(job, JobStatus.FAILED, error=repr(exc), finishedAt=now)
+    else:
+        logger.info("Job %s (%s) succeeded.", job.id, job.task)
+        finish(job, JobStatus.SUCCEEDED, result=result, error='', finishedAt=timezone.now())
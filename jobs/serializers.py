@@ -0,0 +1,23 @@
+"""
+Serializers for the Job model.
+"""
+
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer exposing the state and outcome of a Job.
+    """
+
+    class Meta:
+        """
+        Meta class for JobSerializer.
+        """
+        model = Job
+        fields = [
+            'id', 'task', 'status', 'progress', 'total', 'attempts', 'result', 'error',
+            'createdAt', 'startedAt', 'finishedAt',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,41 @@
+"""
+Generic job tasks.
+"""
+
+import json
+from typing import Any, Dict
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import force_authenticate
+from .models import Job
+from .queue import JobFailed, task
+
+
+@task
+def replay_request(job: Job, view: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a deferred API request through its view, as the user who made it.
+
+    ``request`` holds the method, path, JSON data and URL keyword arguments of
+    the original request. The view's throttles do not apply again. A response
+    with an error status fails the job, with the response as its result. The
+    worker's heartbeat keeps the job's lease while the view runs.
+
+    Returns:
+        Dict[str, Any]: The status code and data of the response.
+    """
+    replayed = RequestFactory().generic(
+        request['method'], request['path'], json.dumps(request['data']),
+        content_type='application/json',
+    )
+    force_authenticate(replayed, user=job.userId)
+    response = import_string(view).as_view(throttle_classes=[])(replayed, **request['kwargs'])
+    result = {
+        'status': response.status_code,
+        'data': json.loads(JSONRenderer().render(response.data) or 'null'),
+    }
+    if response.status_code >= 400:
+        raise JobFailed(f'The request failed with status {response.status_code}.', result)
+    job.report(job.total or 0)
+    return result
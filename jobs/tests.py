@@ -0,0 +1,169 @@
+import datetime
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from bloq.models import Bloq
+from rent.models import RentEvent
+from . import queue
+from .models import Job, JobStatus
+
+calls = []
+
+
+@queue.task
+def record_call(job, value):
+    calls.append((job.id, value))
+    job.report(1, 1)
+    return {'value': value}
+
+
+@queue.task
+def flaky(job):
+    if job.attempts < 2:
+        raise RuntimeError('temporary failure')
+    return 'done'
+
+
+@queue.task
+def rejected(job):
+    raise queue.JobFailed('bad input', result={'reason': 'invalid'})
+
+
+def not_a_task(job):
+    return None
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_jobs_are_claimed_once_in_order(self):
+        first = queue.enqueue(record_call, value='a')
+        second = queue.enqueue(record_call, value='b')
+        self.assertEqual(queue.claim('worker-1').id, first.id)
+        self.assertEqual(queue.claim('worker-2').id, second.id)
+        self.assertIsNone(queue.claim('worker-3'))
+
+    def test_successful_job_stores_result_and_progress(self):
+        job = queue.enqueue(record_call, value='a')
+        queue.run(queue.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual(calls, [(job.id, 'a')])
+        self.assertEqual((job.status, job.result, job.progress, job.total),
+                         (JobStatus.SUCCEEDED, {'value': 'a'}, 1, 1))
+        self.assertIsNotNone(job.finishedAt)
+
+    @override_settings(JOBS={'RETRY_DELAY': 0})
+    def test_failed_attempts_are_retried(self):
+        job = queue.enqueue(flaky)
+        queue.run(queue.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatus.QUEUED, 1))
+        self.assertIn('temporary failure', job.error)
+        queue.run(queue.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.error), (JobStatus.SUCCEEDED, 'done', ''))
+
+    @override_settings(JOBS={'RETRY_DELAY': 0, 'MAX_ATTEMPTS': 1})
+    def test_attempts_are_bounded(self):
+        job = queue.enqueue(flaky)
+        queue.run(queue.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.FAILED)
+
+    def test_job_failed_is_not_retried(self):
+        job = queue.enqueue(rejected)
+        queue.run(queue.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.error),
+                         (JobStatus.FAILED, {'reason': 'invalid'}, 'bad input'))
+
+    def test_retries_wait_for_their_time(self):
+        job = queue.enqueue(record_call, value='a')
+        Job.objects.filter(pk=job.pk).update(runAt=timezone.now() + datetime.timedelta(minutes=1))
+        self.assertIsNone(queue.claim('worker'))
+
+    def test_abandoned_jobs_are_claimed_again(self):
+        job = queue.enqueue(record_call, value='a')
+        queue.claim('lost-worker')
+        self.assertIsNone(queue.claim('worker'))
+        Job.objects.filter(pk=job.pk).update(
+            heartbeatAt=timezone.now() - datetime.timedelta(hours=1)
+        )
+        claimed = queue.claim('worker')
+        self.assertEqual((claimed.id, claimed.attempts, claimed.worker), (job.id, 2, 'worker'))
+
+    def test_reclaimed_jobs_keep_the_new_attempt(self):
+        job = queue.enqueue(record_call, value='a')
+        lost = queue.claim('lost-worker')
+        Job.objects.filter(pk=job.pk).update(
+            heartbeatAt=timezone.now() - datetime.timedelta(hours=1)
+        )
+        claimed = queue.claim('worker')
+        self.assertFalse(queue.Heartbeat(lost).beat())
+        self.assertTrue(queue.Heartbeat(claimed).beat())
+        queue.run(lost)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.progress), (JobStatus.RUNNING, 'worker', 0))
+        queue.run(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.SUCCEEDED)
+
+    def test_only_tasks_can_be_queued(self):
+        with self.assertRaises(ValueError):
+            queue.enqueue(not_a_task)
+
+    def test_worker_command_drains_the_queue(self):
+        queue.enqueue(record_call, value='a')
+        queue.enqueue(record_call, value='b')
+        out = StringIO()
+        call_command('run_jobs', burst=True, stdout=out)
+        self.assertIn('Processed 2 jobs', out.getvalue())
+        self.assertEqual([value for _, value in calls], ['a', 'b'])
+
+
+class AsyncBulkCreateTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('bloq-list-create', kwargs={'version': 'v1'})
+
+    def test_bulk_create_runs_as_job(self):
+        bloq_data = [{"id": "1", "title": "Bloq A", "address": "Address A"},
+                     {"id": "2", "title": "Bloq B", "address": "Address B"}]
+        response = self.client.post(f'{self.url}?async=true', bloq_data, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data['status'], response.data['total']), (JobStatus.QUEUED, 2))
+        self.assertFalse(Bloq.objects.exists())
+
+        queue.run(queue.claim('worker'))
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], JobStatus.SUCCEEDED)
+        self.assertEqual(response.data['progress'], 2)
+        self.assertEqual(response.data['result']['status'], 201)
+        self.assertEqual([bloq['id'] for bloq in response.data['result']['data']], ['1', '2'])
+        self.assertEqual(Bloq.objects.count(), 2)
+
+    def test_invalid_bulk_create_fails_job(self):
+        url = reverse('rent-list-create', kwargs={'version': 'v1'})
+        rent_data = [{"id": "1", "lockerId": "missing", "weight": 1.0, "size": "M",
+                      "status": "CREATED"}]
+        response = self.client.post(f'{url}?async=true', rent_data, format='json')
+        queue.run(queue.claim('worker'))
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual((job.status, job.attempts), (JobStatus.FAILED, 1))
+        self.assertEqual(job.result['status'], 400)
+        self.assertFalse(RentEvent.objects.exists())
+
+    def test_jobs_are_visible_to_their_owner_only(self):
+        response = self.client.post(f'{self.url}?async=true', [], format='json')
+        other = Token.objects.create(user=User.objects.create_user(username='other', password='x'))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + other.key)
+        self.assertEqual(self.client.get(response['Location']).status_code, 404)
@@ -0,0 +1,75 @@
+"""
+Views for the Jobs app.
+
+This module contains the endpoint clients poll for the outcome of requests run
+in the background (``?async=true``), and the helpers the deferring views use.
+"""
+
+import logging
+from typing import Any
+from django.db.models import QuerySet
+from django.urls import reverse
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import generics, status
+from rest_framework.fields import BooleanField
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from .models import Job
+from .serializers import JobSerializer
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+ASYNC_QUERY_PARAM = 'async'
+
+
+def wants_async(request: Request) -> bool:
+    """
+    Check whether a request asked to run in the background.
+    """
+    return request.query_params.get(ASYNC_QUERY_PARAM, '').lower() in BooleanField.TRUE_VALUES
+
+
+def accepted(request: Request, job: Job) -> Response:
+    """
+    Return the 202 response pointing the client at a queued job.
+    """
+    version = request.parser_context['kwargs'].get('version', 'v1')
+    location = request.build_absolute_uri(
+        reverse('job-detail', kwargs={'version': version, 'id': job.id})
+    )
+    return Response(
+        JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={'Location': location}
+    )
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """
+    API view to poll a background job.
+
+    - **GET**: Returns the status, progress and, once finished, the result or
+      error of a job queued by the requesting user.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field: str = 'id'
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Get the jobs visible to the user: their own, or all for staff.
+        """
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(userId=self.request.user)
+
+    @swagger_auto_schema(responses={200: JobSerializer})
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests to fetch a job.
+
+        Returns:
+            - Response: The job.
+        """
+        logger.info("User '%s' requested Job with ID '%s'.", request.user.id, kwargs.get('id'))
+        return super().get(request, *args, **kwargs)
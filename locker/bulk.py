@@ -0,0 +1,64 @@
+"""
+Set-based status changes of many Lockers.
+
+Servicing a Bloq closes all of its Lockers, and reopens them afterwards. Here
+the matching Lockers of a shard are changed with a single UPDATE instead of one
+request per Locker. Lockers with an active Rent are excluded by a ``NOT EXISTS``
+in the statements themselves, so they are never checked one by one and a Rent
+created in between cannot be missed.
+"""
+
+import logging
+from typing import List
+from django.db import transaction
+from django.db.models import Case, Exists, OuterRef, QuerySet, Value, When
+from project_bloq.fields import EnumField
+from rent.models import Rent, RentStatus
+from .models import LockerState, STATUS_OF
+
+logger = logging.getLogger(__name__)
+
+# Every Rent that is not delivered still needs its Locker.
+ACTIVE_RENT_STATUSES = [status for status in RentStatus.values if status != RentStatus.DELIVERED]
+
+
+def has_active_rent() -> Exists:
+    """
+    Return the condition matching Lockers with a Rent that is not delivered yet.
+    """
+    return Exists(
+        Rent.objects.filter(lockerId=OuterRef('pk'), status__in=ACTIVE_RENT_STATUSES)
+    )
+
+
+def set_status(lockers: QuerySet, status: str) -> List[str]:
+    """
+    Set the status of the matching Lockers of one shard, keeping their occupancy.
+
+    Lockers with an active Rent and Lockers already in that status are left
+    alone. The changed rows are locked and read before the UPDATE, in the same
+    transaction, to return their IDs.
+
+    Args:
+        lockers (QuerySet): The Lockers to change, bound to one shard.
+        status (str): The new status, a LockerStatus value.
+
+    Returns:
+        List[str]: The IDs of the changed Lockers.
+    """
+    lockers = lockers.filter(~has_active_rent()).exclude(
+        state__in=LockerState.matching(status=status)
+    )
+    state_field = EnumField(choices=LockerState.choices)
+    new_state = Case(*[
+        When(state=state, then=Value(LockerState.of(status, occupied), output_field=state_field))
+        for state, (_, occupied) in STATUS_OF.items()
+    ], output_field=state_field)
+    with transaction.atomic(using=lockers.db):
+        rows = dict(
+            lockers.select_for_update(of=('self',)).order_by('id').values_list('pk', 'id')
+        )
+        if rows:
+            lockers.filter(pk__in=rows).update(state=new_state)
+    logger.info("Set the status of %d Lockers to %s.", len(rows), status)
+    return list(rows.values())
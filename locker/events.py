@@ -0,0 +1,48 @@
+"""
+Locker state change events.
+
+This module publishes a compact event on the Bloq's channel whenever a view
+changes the state of a Locker, so kiosk screens can be updated without polling.
+"""
+
+from typing import Any, Dict, Iterable
+from project_bloq.events import bloq_channel, get_broker
+from project_bloq.sharding import instance_shard
+from .models import Locker
+
+
+def locker_event(locker: Locker) -> Dict[str, Any]:
+    """
+    Build the compact event describing the current state of a Locker.
+
+    Args:
+        locker (Locker): The changed Locker.
+
+    Returns:
+        Dict[str, Any]: The event payload.
+    """
+    return {
+        'type': 'locker',
+        'id': locker.id,
+        'status': locker.status,
+        'isOccupied': locker.isOccupied,
+        'size': locker.size,
+        'seq': locker.changeSeq,
+    }
+
+
+def publish_locker_changes(lockers: Iterable[Locker]) -> None:
+    """
+    Publish the state of each Locker on its Bloq's channel after commit.
+
+    The events wait for the transaction on the Locker's shard. Load the Bloqs
+    along (``select_related('bloqId')``) when publishing many Lockers.
+
+    Args:
+        lockers (Iterable[Locker]): The changed Lockers.
+    """
+    broker = get_broker()
+    for locker in lockers:
+        broker.publish(
+            bloq_channel(locker.bloqId.id), locker_event(locker), using=instance_shard(locker)
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locker', '0003_locker_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locker',
+            name='changeSeq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locker', '0004_locker_changeseq'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='locker',
+            index=models.Index(fields=['bloqId', 'size', 'isOccupied'], name='locker_bloq_size_free_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Moves Lockers onto an integer surrogate key, keeping ``id`` as a unique column.
+
+from django.db import migrations, models
+from project_bloq import keys
+
+
+def convert(apps, schema_editor):
+    '''
+    Number the Lockers and point the Rents' foreign key at the new key.
+    '''
+    keys.convert(
+        schema_editor, apps.get_model('locker', 'Locker'), [(apps.get_model('rent', 'Rent'), 'lockerId')]
+    )
+
+
+class Migration(migrations.Migration):
+
+    # The conversion batches its updates and builds indexes concurrently on Postgres.
+    atomic = False
+
+    dependencies = [
+        ('locker', '0005_locker_bloq_size_free_idx'),
+        ('bloq', '0004_bloq_key'),
+        ('rent', '0005_archivedrent'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='locker',
+                    name='key',
+                    field=models.BigAutoField(default=None, primary_key=True, serialize=False),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='locker',
+                    name='id',
+                    field=models.CharField(max_length=255, unique=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(convert),
+    ]
@@ -0,0 +1,184 @@
+# Stores the Locker status and occupancy as one small-integer state, and the size as a small integer.
+#
+# Expands the table online on Postgres; the old columns are dropped by
+# 0009_locker_drop_old_columns once no running code reads them. The new columns
+# (state, size_code) are added next to the old ones, which become nullable, and
+# a trigger keeps both sets in sync with whichever the running application
+# writes. The new columns are then backfilled in batches, NOT NULL is set after
+# validating a check and the new indexes are built concurrently.
+
+from django.db import migrations, models, transaction
+import project_bloq.fields
+from project_bloq import operations
+
+# The values as of this migration: the state of each (status, isOccupied) pair, and the sizes.
+STATES = {
+    ('OPEN', False): 'AVAILABLE',
+    ('OPEN', True): 'OPEN_OCCUPIED',
+    ('CLOSED', False): 'CLOSED_FREE',
+    ('CLOSED', True): 'OCCUPIED',
+}
+SIZES = ['XS', 'S', 'M', 'L', 'XL']
+
+# Fills the columns the writer left out from the ones it wrote: code written
+# before this migration writes status, isOccupied and size, code written after
+# it state and size_code. The codes are the 1-based positions of STATES and
+# SIZES.
+CREATE_SYNC = '''
+CREATE OR REPLACE FUNCTION locker_state_sync() RETURNS trigger AS $$
+DECLARE
+    sizes varchar[] := ARRAY['XS', 'S', 'M', 'L', 'XL'];
+    wrote_status boolean;
+    wrote_state boolean;
+    wrote_size boolean;
+    wrote_code boolean;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        wrote_status := NEW."status" IS NOT NULL;
+        wrote_state := NOT wrote_status;
+        wrote_size := NEW."size" IS NOT NULL;
+        wrote_code := NOT wrote_size;
+    ELSE
+        wrote_status := (NEW."status", NEW."isOccupied")
+            IS DISTINCT FROM (OLD."status", OLD."isOccupied");
+        wrote_state := NEW."state" IS DISTINCT FROM OLD."state";
+        wrote_size := NEW."size" IS DISTINCT FROM OLD."size";
+        wrote_code := NEW."size_code" IS DISTINCT FROM OLD."size_code";
+    END IF;
+    IF wrote_status THEN
+        NEW."state" := CASE WHEN NEW."status" = 'OPEN'
+            THEN CASE WHEN NEW."isOccupied" THEN 2 ELSE 1 END
+            ELSE CASE WHEN NEW."isOccupied" THEN 4 ELSE 3 END END;
+    ELSIF wrote_state THEN
+        NEW."status" := CASE WHEN NEW."state" IN (1, 2) THEN 'OPEN'
+            WHEN NEW."state" IN (3, 4) THEN 'CLOSED' END;
+        NEW."isOccupied" := NEW."state" IN (2, 4);
+    END IF;
+    IF wrote_size THEN
+        NEW."size_code" := array_position(sizes, NEW."size");
+    ELSIF wrote_code THEN
+        NEW."size" := sizes[NEW."size_code"];
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS locker_state_sync ON locker_locker;
+CREATE TRIGGER locker_state_sync BEFORE INSERT OR UPDATE ON locker_locker
+    FOR EACH ROW EXECUTE PROCEDURE locker_state_sync();
+'''
+DROP_SYNC = '''
+DROP TRIGGER IF EXISTS locker_state_sync ON locker_locker;
+DROP FUNCTION IF EXISTS locker_state_sync();
+'''
+
+
+def create_sync(apps, schema_editor):
+    '''
+    Keep the old and the new columns in sync with writes of the running application.
+    '''
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SYNC)
+
+
+def drop_sync(apps, schema_editor):
+    '''
+    Drop the sync trigger.
+    '''
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SYNC)
+
+
+def forwards(apps, schema_editor):
+    '''
+    Fill the state and the small-integer size from the old columns, in batches.
+    '''
+    Locker = apps.get_model('locker', 'Locker')
+    alias = schema_editor.connection.alias
+    for lockers in operations.batches(Locker.objects.using(alias)):
+        with transaction.atomic(using=alias):
+            for (status, occupied), state in STATES.items():
+                lockers.filter(status=status, isOccupied=occupied).update(state=state)
+            for size in SIZES:
+                lockers.filter(sizeName=size).update(size=size)
+
+
+def backwards(apps, schema_editor):
+    '''
+    Fill the old columns from the state and the small-integer size, in batches.
+    '''
+    Locker = apps.get_model('locker', 'Locker')
+    alias = schema_editor.connection.alias
+    for lockers in operations.batches(Locker.objects.using(alias)):
+        with transaction.atomic(using=alias):
+            for (status, occupied), state in STATES.items():
+                lockers.filter(state=state).update(status=status, isOccupied=occupied)
+            for size in SIZES:
+                lockers.filter(size=size).update(sizeName=size)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('locker', '0006_locker_key'),
+    ]
+
+    operations = [
+        # Rows inserted by the new code leave the old columns to the trigger.
+        migrations.AlterField(
+            model_name='locker',
+            name='isOccupied',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='locker',
+            name='status',
+            field=models.CharField(choices=[('OPEN', 'Open'), ('CLOSED', 'Closed')], max_length=10, null=True),
+        ),
+        # The old size column keeps its name; its field is renamed so the new
+        # one can take the name. The old index stays in the database for the
+        # code still running until 0009_locker_drop_old_columns.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='locker',
+                    name='locker_bloq_size_free_idx',
+                ),
+                migrations.RenameField(
+                    model_name='locker',
+                    old_name='size',
+                    new_name='sizeName',
+                ),
+                migrations.AlterField(
+                    model_name='locker',
+                    name='sizeName',
+                    field=models.CharField(blank=True, choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], db_column='size', max_length=2, null=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='locker',
+            name='state',
+            field=project_bloq.fields.EnumField(choices=[('AVAILABLE', 'Open and free'), ('OPEN_OCCUPIED', 'Open and occupied'), ('CLOSED_FREE', 'Closed and free'), ('OCCUPIED', 'Closed and occupied')], null=True),
+        ),
+        migrations.AddField(
+            model_name='locker',
+            name='size',
+            field=project_bloq.fields.EnumField(blank=True, choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], db_column='size_code', null=True),
+        ),
+        migrations.RunPython(create_sync, drop_sync),
+        migrations.RunPython(forwards, backwards),
+        operations.AlterFieldNotNull(
+            model_name='locker',
+            name='state',
+            field=project_bloq.fields.EnumField(choices=[('AVAILABLE', 'Open and free'), ('OPEN_OCCUPIED', 'Open and occupied'), ('CLOSED_FREE', 'Closed and free'), ('OCCUPIED', 'Closed and occupied')]),
+        ),
+        operations.AddIndexConcurrently(
+            model_name='locker',
+            index=models.Index(fields=['bloqId', 'size', 'state'], name='locker_bloq_size_state_idx'),
+        ),
+        operations.AddIndexConcurrently(
+            model_name='locker',
+            index=models.Index(condition=models.Q(('state', 'AVAILABLE')), fields=['bloqId', 'size'], name='locker_available_idx'),
+        ),
+    ]
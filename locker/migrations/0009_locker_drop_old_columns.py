@@ -0,0 +1,62 @@
+# Drops the Locker status, occupancy and size columns replaced by 0007_locker_state.
+#
+# Apply it only once every web server and worker runs code that reads the new
+# columns (see "Compact Enum Columns" in the README): code from before
+# 0007_locker_state still reads these columns.
+
+from importlib import import_module
+from django.db import migrations
+
+expand = import_module('locker.migrations.0007_locker_state')
+
+# The index of the old columns, left in place by 0007_locker_state.
+OLD_INDEX = 'locker_bloq_size_free_idx'
+
+
+def drop_old_index(apps, schema_editor):
+    '''
+    Drop the index of the old columns, without blocking writes on Postgres.
+    '''
+    concurrently = ' CONCURRENTLY' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute(f'DROP INDEX{concurrently} IF EXISTS {schema_editor.quote_name(OLD_INDEX)}')
+
+
+def create_old_index(apps, schema_editor):
+    '''
+    Rebuild the index of the old columns.
+    '''
+    concurrently = ' CONCURRENTLY' if schema_editor.connection.vendor == 'postgresql' else ''
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f'CREATE INDEX{concurrently} IF NOT EXISTS {quote(OLD_INDEX)} ON {quote("locker_locker")} '
+        f'({quote("bloqId_id")}, {quote("size")}, {quote("isOccupied")})'
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('locker', '0008_locker_change_position'),
+    ]
+
+    operations = [
+        # Reversed, the columns are restored, the trigger syncs them again and
+        # they are backfilled from the new columns.
+        migrations.RunPython(migrations.RunPython.noop, expand.backwards),
+        migrations.RunPython(expand.drop_sync, expand.create_sync),
+        migrations.RunPython(drop_old_index, create_old_index),
+        migrations.RemoveField(
+            model_name='locker',
+            name='sizeName',
+        ),
+        migrations.RemoveField(
+            model_name='locker',
+            name='isOccupied',
+        ),
+        migrations.RemoveField(
+            model_name='locker',
+            name='status',
+        ),
+    ]
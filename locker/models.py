@@ -4,6 +4,8 @@ models.py
 from django.db import models
 
 from bloq.models import Bloq
+from changes.models import ChangeStampedModel, ChangeStampedQuerySet
+from project_bloq.fields import EnumField
 
 class LockerStatus(models.TextChoices):
     '''
@@ -22,18 +24,92 @@ class LockerSize(models.TextChoices):
     L = 'L', 'Large'
     XL = 'XL', 'Extra Large'
 
+class LockerState(models.TextChoices):
+    '''
+    Locker state choices, one per combination of status and occupancy.
+
+    The API exposes ``status`` and ``isOccupied``; the database stores this
+    single state, so free Lockers are found with one equality on one column.
+    '''
+    AVAILABLE = 'AVAILABLE', 'Open and free'
+    OPEN_OCCUPIED = 'OPEN_OCCUPIED', 'Open and occupied'
+    CLOSED_FREE = 'CLOSED_FREE', 'Closed and free'
+    OCCUPIED = 'OCCUPIED', 'Closed and occupied'
+
+    @classmethod
+    def of(cls, status, is_occupied):
+        '''
+        Return the state of a status and occupancy, None for an unknown status.
+        '''
+        return STATE_OF.get((status, bool(is_occupied)))
+
+    @classmethod
+    def matching(cls, status=None, is_occupied=None):
+        '''
+        Return the states with the given status and/or occupancy, for ``state__in``.
+        '''
+        return [
+            state for state, (state_status, occupied) in STATUS_OF.items()
+            if status in (None, state_status) and is_occupied in (None, occupied)
+        ]
+
+STATE_OF = {
+    (LockerStatus.OPEN, False): LockerState.AVAILABLE,
+    (LockerStatus.OPEN, True): LockerState.OPEN_OCCUPIED,
+    (LockerStatus.CLOSED, False): LockerState.CLOSED_FREE,
+    (LockerStatus.CLOSED, True): LockerState.OCCUPIED,
+}
+STATUS_OF = {state: key for key, state in STATE_OF.items()}
 
-class Locker(models.Model):
+
+class Locker(ChangeStampedModel):
     '''
     Locker model
     '''
-    id = models.CharField(max_length=255, primary_key=True)
+    key = models.BigAutoField(primary_key=True)
+    id = models.CharField(max_length=255, unique=True)
     bloqId = models.ForeignKey(Bloq, on_delete=models.CASCADE)
-    status = models.CharField(max_length=10, choices=LockerStatus.choices)
-    isOccupied = models.BooleanField()
-    size = models.CharField(max_length=2, choices=LockerSize.choices, null=True, blank=True)
+    # Status and occupancy, stored together as a small integer (see LockerState).
+    state = EnumField(choices=LockerState.choices)
+    size = EnumField(choices=LockerSize.choices, null=True, blank=True, db_column='size_code')
+
+    objects = ChangeStampedQuerySet.as_manager()
+
+    class Meta:
+        '''
+        Meta class for Locker.
+        '''
+        indexes = [
+            # Free lockers of a size in a Bloq (nearest Bloq search, availability).
+            models.Index(fields=['bloqId', 'size', 'state'], name='locker_bloq_size_state_idx'),
+            # Only the available Lockers, the ones searched for on every Rent.
+            models.Index(fields=['bloqId', 'size'], name='locker_available_idx',
+                         condition=models.Q(state=LockerState.AVAILABLE)),
+            # Change feed order.
+            models.Index(fields=['changeXid', 'changeSeq'], name='locker_change_idx'),
+        ]
+
+    @property
+    def status(self):
+        '''
+        OPEN or CLOSED, derived from the state.
+        '''
+        return STATUS_OF[self.state][0] if self.state else None
+
+    @status.setter
+    def status(self, value):
+        self.state = LockerState.of(value, self.isOccupied)
+
+    @property
+    def isOccupied(self):  # pylint: disable=invalid-name
+        '''
+        Whether the Locker holds a parcel, derived from the state.
+        '''
+        return STATUS_OF[self.state][1] if self.state else None
 
-    objects = models.Manager()
+    @isOccupied.setter
+    def isOccupied(self, value):  # pylint: disable=invalid-name
+        self.state = LockerState.of(self.status or LockerStatus.OPEN, value)
 
     def __str__(self):
         return f"Locker {self.id} - {self.status}"
@@ -6,18 +6,54 @@ and a list serializer for handling bulk operations.
 """
 
 from typing import List, Dict, Any
-from django.db import transaction
 from rest_framework import serializers
-from .models import Locker
+from project_bloq import sharding
+from project_bloq.serializers import DynamicFieldsModelSerializer
+from .models import Locker, LockerSize, LockerStatus, STATUS_OF
 
 
-class LockerSerializer(serializers.ModelSerializer):
+class LockerStatusField(serializers.ChoiceField):
+    """
+    The Locker status, read from and written to the Locker state.
+    """
+    values_source = 'state'
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(LockerStatus.choices, **kwargs)
+
+    @staticmethod
+    def from_values(state: str) -> str:
+        """
+        Return the status of a state read with ``values()``.
+        """
+        return STATUS_OF[state][0]
+
+
+class LockerOccupiedField(serializers.BooleanField):
+    """
+    Whether the Locker is occupied, read from and written to the Locker state.
+    """
+    values_source = 'state'
+
+    @staticmethod
+    def from_values(state: str) -> bool:
+        """
+        Return the occupancy of a state read with ``values()``.
+        """
+        return STATUS_OF[state][1]
+
+
+class LockerSerializer(DynamicFieldsModelSerializer):
     """
     Serializer for the Locker model.
 
     This serializer handles the serialization and deserialization of Locker instances.
-    It includes all fields of the Locker model.
+    It includes all public fields of the Locker model; ``status`` and ``isOccupied``
+    are both stored in the Locker state.
     """
+    status = LockerStatusField()
+    isOccupied = LockerOccupiedField()
+    reserved_ids = frozenset({'export', 'available', 'status'})
 
     class Meta:
         """
@@ -26,7 +62,42 @@ class LockerSerializer(serializers.ModelSerializer):
         Specifies the model to serialize and the fields to include.
         """
         model = Locker
-        fields = '__all__'
+        fields = ['id', 'status', 'isOccupied', 'size', 'bloqId']
+
+
+class LockerFilterSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """
+    Selects Lockers by Bloq, size and current status and occupancy.
+    """
+    bloqId = serializers.CharField(required=False)
+    size = serializers.ChoiceField(LockerSize.choices, required=False)
+    status = serializers.ChoiceField(LockerStatus.choices, required=False)
+    isOccupied = serializers.BooleanField(required=False)
+
+
+class LockerStatusUpdateSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """
+    Request body of a bulk Locker status change: the new status and the Lockers to change.
+
+    The filter must name a Bloq, unless ``all`` explicitly asks for Lockers of
+    the whole fleet, so a missing filter never changes every Locker.
+    """
+    status = serializers.ChoiceField(LockerStatus.choices)
+    filter = LockerFilterSerializer(required=False, default=dict)
+    all = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Require a Bloq ID in the filter, or ``all``.
+
+        Raises:
+            ValidationError: If neither is given.
+        """
+        if not attrs['all'] and 'bloqId' not in attrs['filter']:
+            raise serializers.ValidationError(
+                {'filter': 'Must include bloqId, or set "all": true to change every Bloq.'}
+            )
+        return attrs
 
 
 class LockerListSerializer(serializers.ListSerializer):
@@ -38,7 +109,7 @@ class LockerListSerializer(serializers.ListSerializer):
 
     child = LockerSerializer()
 
-    @transaction.atomic
+    @sharding.atomic()
     def create(self, validated_data: List[Dict[str, Any]]) -> List[Locker]:
         """
         Create multiple Locker instances.
@@ -58,7 +129,7 @@ class LockerListSerializer(serializers.ListSerializer):
             instances.append(instance)
         return instances
 
-    @transaction.atomic
+    @sharding.atomic()
     def update(self, instances: List[Locker], validated_data: List[Dict[str, Any]]) -> List[Locker]:
         """
         Update multiple Locker instances.
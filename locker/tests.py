@@ -1,12 +1,19 @@
+import json
+import msgpack
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from .models import Locker, LockerStatus
 from rest_framework.test import APITestCase
 from django.urls import reverse
 from bloq.models import Bloq
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
-from .models import Locker, LockerStatus, LockerSize
+from .models import Locker, LockerState, LockerStatus, LockerSize
+from rent.models import Rent, RentStatus
+from .serializers import LockerSerializer
 
 class LockerModelTest(TestCase):
     def setUp(self):
@@ -28,6 +35,19 @@ class LockerModelTest(TestCase):
         self.assertFalse(self.locker.isOccupied)
         self.assertEqual(str(self.locker), "Locker 1 - OPEN")
 
+    def test_status_and_occupancy_are_stored_as_one_state(self):
+        self.assertEqual(self.locker.state, LockerState.AVAILABLE)
+        self.locker.status = LockerStatus.CLOSED
+        self.locker.isOccupied = True
+        self.locker.size = LockerSize.XL
+        self.locker.save()
+        locker = Locker.objects.get(state=LockerState.OCCUPIED)
+        self.assertEqual((locker.status, locker.isOccupied, locker.size),
+                         (LockerStatus.CLOSED, True, LockerSize.XL))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT state, size_code FROM locker_locker')
+            self.assertEqual(cursor.fetchone(), (4, 5))
+
 class LockerAPITest(APITestCase):
     def setUp(self):
         self.url = reverse('locker-list-create', kwargs={'version': 'v1'})
@@ -56,6 +76,34 @@ class LockerAPITest(APITestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(len(response.data), 2)
 
+    def test_create_locker_with_reserved_id(self):
+        for reserved in ('export', 'status'):
+            self.locker_data[0]['id'] = reserved
+            response = self.client.post(self.url, self.locker_data, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Locker.objects.exists())
+
+    def test_create_multiple_lockers_msgpack(self):
+        response = self.client.post(self.url, self.locker_data, format='msgpack')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Locker.objects.count(), 2)
+
+    def test_get_locker_list_msgpack(self):
+        Locker.objects.create(id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
+
+        response = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        payload = msgpack.unpackb(response.content, raw=False)
+        self.assertEqual(payload['count'], 1)
+        self.assertEqual(payload['results'][0]['bloqId'], self.bloq.id)
+
+    def test_get_locker_list_json_matches_stdlib_renderer(self):
+        Locker.objects.create(id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
     def test_get_locker_list(self):
         Locker.objects.create(id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
         Locker.objects.create(id="2", bloqId=self.bloq, status=LockerStatus.CLOSED, isOccupied=True)
@@ -64,6 +112,35 @@ class LockerAPITest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['count'], 2)
 
+    def test_locker_list_matches_model_serializer(self):
+        Locker.objects.create(id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
+        Locker.objects.create(
+            id="2", bloqId=self.bloq, status=LockerStatus.CLOSED, isOccupied=True, size=LockerSize.XL
+        )
+
+        response = self.client.get(self.url, format='json')
+        expected = LockerSerializer(Locker.objects.order_by('id'), many=True).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+        self.assertEqual(list(response.data['results'][0]), list(expected[0]))
+
+    def test_locker_list_sparse_fields(self):
+        Locker.objects.create(id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'isOccupied,id,status'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['results'], [{'id': '1', 'status': 'OPEN', 'isOccupied': False}]
+        )
+        page_query = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"size_code"', page_query)
+        self.assertNotIn('"bloqId_id"', page_query)
+
+    def test_locker_list_unknown_field(self):
+        response = self.client.get(self.url, {'fields': 'id,colour'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
 class AvailableLockerAPITest(APITestCase):
     def setUp(self):
         self.url = reverse('locker-available-list', kwargs={'version': 'v1'})
@@ -103,6 +180,11 @@ class AvailableLockerAPITest(APITestCase):
         self.assertEqual(response.data['count'], 1)
         self.assertEqual(response.data['results'][0]['id'], '1')
 
+    def test_filter_by_unknown_size(self):
+        response = self.client.get(self.url, {'size': 'XXL'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('size', response.data)
+
 class LockerDetailAPITest(APITestCase):
     def setUp(self):
         self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Address A")
@@ -122,7 +204,129 @@ class LockerDetailAPITest(APITestCase):
         self.assertEqual(response.data['status'], LockerStatus.OPEN)
         self.assertEqual(response.data['isOccupied'], False)
 
+    def test_get_locker_detail_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'id,isOccupied'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.locker.id, 'isOccupied': False})
+
+    def test_bloq_is_referenced_by_internal_key(self):
+        bloq = Bloq.objects.create(id="2", title="Bloq B", address="Address B")
+        data = {'id': '1', 'bloqId': '2', 'status': LockerStatus.OPEN, 'isOccupied': False}
+        response = self.client.put(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['bloqId'], '2')
+        self.assertNotIn('key', response.data)
+        self.assertEqual(Locker.objects.values_list('bloqId', flat=True).get(id='1'), bloq.key)
+        response = self.client.put(self.url, {**data, 'bloqId': '9'}, format='json')
+        self.assertEqual(response.data['bloqId'], ['Invalid pk "9" - object does not exist.'])
+
     def test_locker_not_found(self):
         url = reverse('locker-detail', kwargs={'version': 'v1', 'id': '999'})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class LockerExportAPITest(APITestCase):
+    def setUp(self):
+        self.url = reverse('locker-export', kwargs={'version': 'v1'})
+        self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Address A")
+        self.other_bloq = Bloq.objects.create(id="2", title="Bloq B", address="Address B")
+        Locker.objects.create(
+            id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False, size=LockerSize.M
+        )
+        Locker.objects.create(
+            id="2", bloqId=self.bloq, status=LockerStatus.CLOSED, isOccupied=True, size=LockerSize.S
+        )
+        Locker.objects.create(id="3", bloqId=self.other_bloq, status=LockerStatus.OPEN, isOccupied=False)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        expected = LockerSerializer(Locker.objects.order_by('id'), many=True).data
+        self.assertEqual(rows, json.loads(json.dumps(expected)))
+
+    def test_export_csv_filtered(self):
+        response = self.client.get(self.url, {'format': 'csv', 'bloqId': '1', 'status': 'OPEN'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['id,status,isOccupied,size,bloqId', '1,OPEN,False,M,1'])
+
+    def test_export_rejects_unknown_status(self):
+        response = self.client.get(self.url, {'format': 'csv', 'status': 'open'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json())
+
+    def test_export_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'id', 'bloqId': '2'})
+        self.assertEqual(b''.join(response.streaming_content), b'{"id":"3"}\n')
+
+
+class LockerStatusUpdateAPITest(APITestCase):
+    def setUp(self):
+        self.url = reverse('locker-status-update', kwargs={'version': 'v1'})
+        self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Address A")
+        other_bloq = Bloq.objects.create(id="2", title="Bloq B", address="Address B")
+        for locker_id, size in (("1", LockerSize.M), ("2", LockerSize.M), ("3", LockerSize.L)):
+            Locker.objects.create(id=locker_id, bloqId=self.bloq, status=LockerStatus.OPEN,
+                                  isOccupied=False, size=size)
+        Locker.objects.create(id="4", bloqId=self.bloq, status=LockerStatus.CLOSED,
+                              isOccupied=True, size=LockerSize.M)
+        Locker.objects.create(id="5", bloqId=other_bloq, status=LockerStatus.OPEN,
+                              isOccupied=False, size=LockerSize.M)
+        Rent.objects.create(id="r1", lockerId=Locker.objects.get(id="2"), weight=1.0,
+                            size=LockerSize.M, status=RentStatus.WAITING_DROPOFF)
+        Rent.objects.create(id="r2", lockerId=Locker.objects.get(id="3"), weight=1.0,
+                            size=LockerSize.L, status=RentStatus.DELIVERED)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_close_lockers_of_bloq(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                self.url, {'status': 'CLOSED', 'filter': {'bloqId': '1'}}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Locker 2 has an active Rent and Locker 4 is closed already.
+        self.assertEqual(response.data, {'status': 'CLOSED', 'updated': ['1', '3']})
+        states = dict(Locker.objects.values_list('id', 'state'))
+        self.assertEqual(states, {
+            '1': LockerState.CLOSED_FREE, '2': LockerState.AVAILABLE,
+            '3': LockerState.CLOSED_FREE, '4': LockerState.OCCUPIED, '5': LockerState.AVAILABLE,
+        })
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "locker')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('NOT EXISTS', updates[0])
+
+    def test_filter_by_size_and_current_state(self):
+        response = self.client.patch(self.url, {
+            'status': 'OPEN', 'filter': {'size': 'M', 'status': 'CLOSED', 'isOccupied': True},
+            'all': True,
+        }, format='json')
+        self.assertEqual(response.data['updated'], ['4'])
+        locker = Locker.objects.get(id="4")
+        self.assertEqual((locker.status, locker.isOccupied), (LockerStatus.OPEN, True))
+
+    def test_invalid_request(self):
+        response = self.client.patch(
+            self.url, {'status': 'BROKEN', 'filter': {'size': 'XXL'}}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+        self.assertIn('size', response.data['filter'])
+
+    def test_filter_must_name_a_bloq(self):
+        for body in ({'status': 'CLOSED'}, {'status': 'CLOSED', 'filter': {'size': 'M'}}):
+            response = self.client.patch(self.url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('filter', response.data)
+        self.assertFalse(Locker.objects.filter(state=LockerState.CLOSED_FREE).exists())
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import LockerBulkCreateView, LockerDetailView, AvailableLockerListView
+from .views import LockerBulkCreateView, LockerDetailView, AvailableLockerListView, LockerExportView, LockerStatusUpdateView
 
 urlpatterns = [
     path('', LockerBulkCreateView.as_view(), name='locker-list-create'),
+    path('export/', LockerExportView.as_view(), name='locker-export'),
     path('available/', AvailableLockerListView.as_view(), name='locker-available-list'),
+    path('status/', LockerStatusUpdateView.as_view(), name='locker-status-update'),
     path('<str:id>/', LockerDetailView.as_view(), name='locker-detail'),
 
     #implement the following endpoints with Admin permissions
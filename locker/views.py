@@ -7,26 +7,37 @@ as well as listing available lockers with optional filtering.
 """
 
 import logging
-from typing import Any, Type
+from typing import Any, Dict, List, Optional, Type
 from django.db.models import QuerySet
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 from rest_framework.filters import OrderingFilter
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
-from .serializers import LockerSerializer, LockerListSerializer
-from .models import Locker, LockerStatus
+from bloq.deletion import delete_lockers
+from jobs.mixins import DeferrableMixin
+from jobs.serializers import JobSerializer
+from project_bloq import sharding
+from project_bloq.exports import ExportView
+from project_bloq.mixins import ShardedObjectMixin, SparseFieldsMixin, ValuesListMixin
+from project_bloq.pagination import EstimatedCountPagination
+from project_bloq.sharding import instance_shard
+from project_bloq.swagger import ASYNC_PARAMETER, FIELDS_PARAMETER, IDEMPOTENCY_KEY_PARAMETER
+from .bulk import set_status
+from .events import publish_locker_changes
+from .serializers import LockerSerializer, LockerListSerializer, LockerStatusUpdateSerializer
+from .models import Locker, LockerSize, LockerState, LockerStatus
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 
-class StandardResultsSetPagination(PageNumberPagination):
+class StandardResultsSetPagination(EstimatedCountPagination):
     """
     Standard pagination class for Locker views.
 
@@ -40,16 +51,19 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size: int = 100
 
 
-class LockerBulkCreateView(generics.ListCreateAPIView):
+class LockerBulkCreateView(DeferrableMixin, ValuesListMixin, generics.ListCreateAPIView):
     """
     API view to list all Lockers or create multiple Lockers at once.
 
     - **GET**: Returns a paginated list of all Locker instances.
     - **POST**: Allows bulk creation of multiple Locker instances.
+      With ``?async=true`` the creation runs as a background job (202).
     """
     queryset = Locker.objects.all().order_by('id')
     pagination_class = StandardResultsSetPagination
     permission_classes = [IsAuthenticated]
+    idempotent_methods = ['POST']
+    throttle_scope = 'bulk_write'
 
     def get_serializer_class(self) -> Type[Serializer]:
         """
@@ -64,7 +78,8 @@ class LockerBulkCreateView(generics.ListCreateAPIView):
         return LockerSerializer
 
     @swagger_auto_schema(
-        responses={200: LockerSerializer(many=True)}
+        responses={200: LockerSerializer(many=True)},
+        manual_parameters=[FIELDS_PARAMETER]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -78,7 +93,8 @@ class LockerBulkCreateView(generics.ListCreateAPIView):
 
     @swagger_auto_schema(
         request_body=LockerListSerializer,
-        responses={201: LockerSerializer(many=True)}
+        responses={201: LockerSerializer(many=True), 202: JobSerializer},
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER, ASYNC_PARAMETER]
     )
     def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -88,12 +104,20 @@ class LockerBulkCreateView(generics.ListCreateAPIView):
             - Response: The created Locker instances.
         """
         logger.info("User '%s' is creating multiple Lockers.", request.user.id)
+        deferred = self.defer(request)
+        if deferred is not None:
+            logger.info(
+                "User '%s' queued the creation of Lockers as Job '%s'.",
+                request.user.id, deferred.data['id']
+            )
+            return deferred
         response = super().post(request, *args, **kwargs)
         logger.info("User '%s' successfully created Lockers.", request.user.id)
         return response
 
 
-class LockerDetailView(generics.RetrieveUpdateDestroyAPIView):
+class LockerDetailView(ShardedObjectMixin, SparseFieldsMixin,
+                       generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a specific Locker instance.
 
@@ -101,13 +125,15 @@ class LockerDetailView(generics.RetrieveUpdateDestroyAPIView):
     - **PUT**: Update a Locker instance.
     - **DELETE**: Delete a Locker instance.
     """
-    queryset = Locker.objects.all()
+    queryset = Locker.objects.select_related('bloqId')
     serializer_class = LockerSerializer
     permission_classes = [IsAuthenticated]
     lookup_field: str = 'id'
+    throttle_scope = 'transition'
 
     @swagger_auto_schema(
-        responses={200: LockerSerializer}
+        responses={200: LockerSerializer},
+        manual_parameters=[FIELDS_PARAMETER]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -139,6 +165,18 @@ class LockerDetailView(generics.RetrieveUpdateDestroyAPIView):
             )
         return response
 
+    def perform_update(self, serializer: Serializer) -> None:
+        """
+        Save the Locker and publish its new state to the Bloq's event stream.
+        """
+        publish_locker_changes([serializer.save()])
+
+    def perform_destroy(self, instance: Locker) -> None:
+        """
+        Delete the Locker and its Rents in batches of set-based DELETEs.
+        """
+        delete_lockers(Locker.objects.using(instance_shard(instance)).filter(pk=instance.pk))
+
     @swagger_auto_schema(
         responses={204: None}
     )
@@ -158,7 +196,80 @@ class LockerDetailView(generics.RetrieveUpdateDestroyAPIView):
         return response
 
 
-class AvailableLockerListView(generics.ListAPIView):
+class LockerStatusUpdateView(generics.GenericAPIView):
+    """
+    API view to change the status of many Lockers at once, e.g. to service a Bloq.
+
+    - **PATCH**: Sets ``status`` on every Locker matching ``filter`` (Bloq ID, size,
+      current status and occupancy) with one UPDATE per shard. Lockers with an
+      active Rent are skipped. Returns the IDs of the changed Lockers.
+    """
+    queryset = Locker.objects.all()
+    serializer_class = LockerStatusUpdateSerializer
+    permission_classes = [IsAuthenticated]
+    idempotent_methods = ['PATCH']
+    throttle_scope = 'bulk_write'
+
+    def get_filtered_shards(self, lookup: Dict[str, Any]) -> List[QuerySet]:
+        """
+        Return the Lockers matching the filter, bound to each shard they can be on.
+        """
+        queryset = self.get_queryset()
+        bloq_id = lookup.get('bloqId')
+        if 'size' in lookup:
+            queryset = queryset.filter(size=lookup['size'])
+        if 'status' in lookup or 'isOccupied' in lookup:
+            queryset = queryset.filter(state__in=LockerState.matching(
+                status=lookup.get('status'), is_occupied=lookup.get('isOccupied')
+            ))
+        if bloq_id is None:
+            return sharding.each_shard(queryset)
+        return [sharding.for_bloq(queryset.filter(bloqId__id=bloq_id), bloq_id)]
+
+    @swagger_auto_schema(
+        request_body=LockerStatusUpdateSerializer,
+        responses={200: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'status': openapi.Schema(type=openapi.TYPE_STRING),
+                'updated': openapi.Schema(
+                    type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)
+                ),
+            },
+        )},
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER]
+    )
+    def patch(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle PATCH requests to change the status of the matching Lockers.
+
+        Returns:
+            - Response: The new status and the sorted IDs of the changed Lockers.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data['status']
+        lookup = serializer.validated_data['filter']
+        logger.info(
+            "User '%s' is setting the status of Lockers matching %s to %s.",
+            request.user.id, lookup, new_status
+        )
+        updated = []
+        for queryset in self.get_filtered_shards(lookup):
+            ids = set_status(queryset, new_status)
+            if ids:
+                publish_locker_changes(
+                    Locker.objects.using(queryset.db).filter(id__in=ids).select_related('bloqId')
+                )
+            updated.extend(ids)
+        logger.info(
+            "User '%s' set the status of %d Lockers to %s.",
+            request.user.id, len(updated), new_status
+        )
+        return Response({'status': new_status, 'updated': sorted(updated)})
+
+
+class AvailableLockerListView(ValuesListMixin, generics.ListAPIView):
     """
     API view to retrieve a list of available Lockers.
 
@@ -172,9 +283,15 @@ class AvailableLockerListView(generics.ListAPIView):
     pagination_class = StandardResultsSetPagination
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['bloqId', 'size']
+    filterset_fields = ['size']
     ordering_fields = ['id']
 
+    def get_shard_key(self) -> Optional[str]:
+        """
+        Read from the shard of the Bloq when filtering by Bloq ID.
+        """
+        return self.request.query_params.get('bloqId') or None
+
     def get_queryset(self) -> QuerySet:
         """
         Get the queryset of available Lockers.
@@ -186,13 +303,15 @@ class AvailableLockerListView(generics.ListAPIView):
             - QuerySet: Filtered queryset of available Lockers.
         """
         queryset = super().get_queryset()
-        queryset = queryset.filter(isOccupied=False, status=LockerStatus.OPEN).order_by('id')
+        queryset = queryset.filter(state=LockerState.AVAILABLE).order_by('id')
 
         bloq_id = self.request.query_params.get('bloqId', None)
         size = self.request.query_params.get('size', None)
+        if size and size not in LockerSize.values:
+            raise ValidationError({'size': f"Must be one of {', '.join(LockerSize.values)}."})
 
         if bloq_id:
-            queryset = queryset.filter(bloqId=bloq_id)
+            queryset = queryset.filter(bloqId__id=bloq_id)
             logger.info(
                 "User '%s' filtered Lockers by Bloq ID '%s'.", self.request.user.id, bloq_id
                 )
@@ -218,6 +337,7 @@ class AvailableLockerListView(generics.ListAPIView):
                 description="Filter by locker size",
                 type=openapi.TYPE_STRING
             ),
+            FIELDS_PARAMETER,
         ]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
@@ -228,3 +348,33 @@ class AvailableLockerListView(generics.ListAPIView):
             - Response: A paginated list of available Locker instances.
         """
         return super().get(request, *args, **kwargs)
+
+
+class LockerExportView(ExportView):
+    """
+    API view to export all Lockers.
+
+    - **GET**: Streams every Locker as NDJSON (default) or CSV, optionally filtered
+      by Bloq ID ('bloqId') and status ('status').
+    """
+    queryset = Locker.objects.all().order_by('id')
+    serializer_class = LockerSerializer
+    export_name = 'lockers'
+    export_filters = {'bloqId': 'bloqId__id'}
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        """
+        Also filter by status, which is stored as part of the Locker state.
+
+        Raises:
+            ValidationError: If the status is not a Locker status.
+        """
+        queryset = super().filter_queryset(queryset)
+        status = self.request.query_params.get('status')
+        if status:
+            if status not in LockerStatus.values:
+                raise ValidationError(
+                    {'status': f"Must be one of {', '.join(LockerStatus.values)}."}
+                )
+            queryset = queryset.filter(state__in=LockerState.matching(status=status))
+        return queryset
@@ -0,0 +1,12 @@
+"""
+URL patterns of the admin site, mounted lazily by the root URLconf.
+
+The API-only deployment profile installs the admin without autodiscovery, so the
+``admin`` modules of the apps are imported here, on the first admin request.
+"""
+
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns, app_name, _ = admin.site.urls
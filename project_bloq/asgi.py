@@ -11,6 +11,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloq.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_bloq.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up. Serves the Bloq event streams (SSE), which
+# need an async response that Django 3.2 cannot produce.
+from project_bloq.sse import EventStreamApp  # noqa: E402 pylint: disable=wrong-import-position
+
+application = EventStreamApp(django_application)
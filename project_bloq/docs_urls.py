@@ -0,0 +1,18 @@
+"""
+URL patterns of the API documentation, mounted lazily by the root URLconf.
+"""
+
+from django.urls import path, re_path
+from .schema import SchemaView, schema_view
+
+# The schema itself is precomputed (see project_bloq/schema.py); the UI pages load it by URL.
+swagger_urlpatterns = [
+    re_path(r'^v1(?P<format>\.json|\.yaml)$', SchemaView.as_view(), {'version': 'v1'},
+            name='schema-json-v1'),
+    path('v1/', schema_view.with_ui('swagger', cache_timeout=0), {'version': 'v1'},
+         name='schema-swagger-ui-v1'),
+]
+
+redoc_urlpatterns = [
+    path('', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+]
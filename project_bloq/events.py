@@ -0,0 +1,228 @@
+"""
+Event broker for pushing locker state changes to connected clients.
+
+Views publish compact events to a channel (one per Bloq). Publishing is deferred
+until the surrounding transaction commits and then handed to a pluggable
+backend, which delivers the payload to every subscriber of that channel:
+
+- ``InProcessBackend`` (default) fans out to subscribers of the same process.
+- ``PostgresNotifyBackend`` sends the payload with ``pg_notify`` and runs one
+  ``LISTEN`` thread per process, so events reach subscribers on every worker.
+
+The backend is chosen with the ``EVENT_BROKER`` setting.
+"""
+
+import json
+import logging
+import select
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[str], None]
+
+
+class Subscription:
+    """
+    A subscriber callback registered on one channel.
+    """
+
+    def __init__(self, broker: 'Broker', channel: str, callback: Callback) -> None:
+        self.broker = broker
+        self.channel = channel
+        self.callback = callback
+
+    def close(self) -> None:
+        """
+        Stop receiving events.
+        """
+        self.broker.unsubscribe(self)
+
+
+class InProcessBackend:
+    """
+    Backend delivering events to subscribers in the publishing process only.
+    """
+
+    def __init__(self, broker: 'Broker', **options: Any) -> None:
+        self.broker = broker
+        self.options = options
+
+    def publish(self, channel: str, payload: str) -> None:
+        """
+        Deliver the payload directly to the local subscribers.
+        """
+        self.broker.dispatch(channel, payload)
+
+    def start(self) -> None:
+        """
+        Nothing to start for the in-process backend.
+        """
+
+
+class PostgresNotifyBackend:
+    """
+    Backend delivering events to every worker through Postgres LISTEN/NOTIFY.
+
+    Options:
+        DATABASE: The database alias used for NOTIFY and LISTEN (``default``).
+        CHANNEL: The Postgres notification channel (``bloq_events``).
+    """
+
+    def __init__(self, broker: 'Broker', **options: Any) -> None:
+        self.broker = broker
+        self.alias = options.get('DATABASE', 'default')
+        self.channel = options.get('CHANNEL', 'bloq_events')
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, payload: str) -> None:
+        """
+        Send the payload to all listening workers.
+        """
+        message = json.dumps({'channel': channel, 'payload': payload}, separators=(',', ':'))
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, message])
+
+    def start(self) -> None:
+        """
+        Start the LISTEN thread of this process, if it is not running yet.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._listen_forever, name='event-broker-listen', daemon=True
+                )
+                self._thread.start()
+
+    def _listen_forever(self) -> None:
+        """
+        Keep a LISTEN connection open, reconnecting after failures.
+        """
+        while True:
+            try:
+                self._listen()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Event listener connection failed, reconnecting.")
+                time.sleep(1)
+
+    def _listen(self) -> None:
+        """
+        Dispatch every notification received on the channel.
+        """
+        import psycopg2  # pylint: disable=import-outside-toplevel
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT  # pylint: disable=import-outside-toplevel
+
+        params = connections[self.alias].get_connection_params()
+        conn = psycopg2.connect(**params)
+        try:
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    message = json.loads(notify.payload)
+                    self.broker.dispatch(message['channel'], message['payload'])
+        finally:
+            conn.close()
+
+
+class Broker:
+    """
+    Fan-out of published events to the subscribers of a channel.
+    """
+
+    def __init__(self, backend: str = 'project_bloq.events.InProcessBackend',
+                 options: Optional[Dict[str, Any]] = None) -> None:
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.backend = import_string(backend)(self, **(options or {}))
+
+    def subscribe(self, channel: str, callback: Callback) -> Subscription:
+        """
+        Register a callback for a channel.
+
+        The callback is invoked with the JSON payload of every event, possibly from
+        another thread, and must not block.
+        """
+        self.backend.start()
+        subscription = Subscription(self, channel, callback)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove a subscription.
+        """
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel: str, event: Dict[str, Any], using: Optional[str] = None) -> None:
+        """
+        Publish an event once the current transaction commits.
+
+        Args:
+            channel (str): The channel to publish to.
+            event (Dict[str, Any]): A JSON serializable event.
+            using (Optional[str]): The database alias of the surrounding transaction.
+        """
+        payload = json.dumps(event, separators=(',', ':'))
+        transaction.on_commit(lambda: self._send(channel, payload), using=using)
+
+    def _send(self, channel: str, payload: str) -> None:
+        """
+        Hand a committed event to the backend, never failing the request.
+        """
+        try:
+            self.backend.publish(channel, payload)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Failed to publish event on channel '%s'.", channel)
+
+    def dispatch(self, channel: str, payload: str) -> None:
+        """
+        Deliver a payload to the local subscribers of a channel.
+        """
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.callback(payload)
+
+
+_broker: Optional[Broker] = None  # pylint: disable=invalid-name
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> Broker:
+    """
+    Return the process wide broker configured by the ``EVENT_BROKER`` setting.
+    """
+    global _broker  # pylint: disable=global-statement
+    with _broker_lock:
+        if _broker is None:
+            config = getattr(settings, 'EVENT_BROKER', {})
+            _broker = Broker(
+                config.get('BACKEND', 'project_bloq.events.InProcessBackend'),
+                config.get('OPTIONS'),
+            )
+        return _broker
+
+
+def bloq_channel(bloq_id: str) -> str:
+    """
+    Return the channel name carrying the events of a Bloq.
+    """
+    return f'bloq:{bloq_id}'
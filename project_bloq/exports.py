@@ -0,0 +1,170 @@
+"""
+Streaming full-table exports for the Bloq.it API.
+
+This module contains the renderers and the base view used by the export
+endpoints. Rows are read with a server-side cursor (``QuerySet.iterator()``) and
+streamed as NDJSON or CSV, so memory per worker stays constant regardless of
+the table size. With several shards, the rows of all shards are merged in order.
+"""
+
+import csv
+import io
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional
+import orjson
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework import generics, renderers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from . import sharding
+from .mixins import SparseFieldsMixin
+from .renderers import ORJSON_OPTIONS, ORJSONRenderer
+from .serializers import ValuesSerializer
+
+logger = logging.getLogger(__name__)
+
+# Rows are grouped into writes of roughly this many bytes.
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class StreamingRenderer(renderers.BaseRenderer, ABC):
+    """
+    Base class for renderers that can stream an iterable of rows.
+    """
+
+    @abstractmethod
+    def stream(self, rows: Iterable[Dict[str, Any]], fieldnames: List[str]) -> Iterator[bytes]:
+        """
+        Encode rows, yielding buffers of about STREAM_BUFFER_SIZE bytes.
+        """
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None,
+               renderer_context: Optional[Mapping[str, Any]] = None) -> bytes:
+        """
+        Render a list of rows (or a single row) in one go.
+        """
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        fieldnames = list(rows[0]) if rows else []
+        return b''.join(self.stream(rows, fieldnames))
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """
+    Renderer which serializes rows to newline delimited JSON.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def stream(self, rows: Iterable[Dict[str, Any]], fieldnames: List[str]) -> Iterator[bytes]:
+        """
+        Encode one JSON document per line.
+        """
+        buffer = bytearray()
+        for row in rows:
+            buffer += orjson.dumps(row, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+            if len(buffer) >= STREAM_BUFFER_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+
+class CSVRenderer(StreamingRenderer):
+    """
+    Renderer which serializes rows to CSV with a header line.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def stream(self, rows: Iterable[Dict[str, Any]], fieldnames: List[str]) -> Iterator[bytes]:
+        """
+        Encode a header line followed by one line per row.
+        """
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= STREAM_BUFFER_SIZE:
+                yield buffer.getvalue().encode(self.charset)
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode(self.charset)
+
+
+class ExportView(SparseFieldsMixin, generics.GenericAPIView):
+    """
+    Base API view streaming a whole table as NDJSON or CSV.
+
+    The format is negotiated from the ``Accept`` header or the ``format`` query
+    parameter (``ndjson`` by default, or ``csv``). Subclasses set ``queryset``,
+    ``serializer_class``, ``export_name`` and ``export_filters``, a mapping of
+    query parameter names to queryset lookups.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    export_name: str = 'export'
+    export_filters: Dict[str, str] = {}
+    chunk_size: int = 2000
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        """
+        Apply the optional export filters given in the query string.
+        """
+        queryset = super().filter_queryset(queryset)
+        for param, lookup in self.export_filters.items():
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                queryset = queryset.filter(**{lookup: value})
+            except (TypeError, ValueError) as exc:
+                raise ValidationError({param: f"Invalid value '{value}'."}) from exc
+        return queryset
+
+    def handle_exception(self, exc: Exception) -> Response:
+        """
+        Render errors as JSON instead of the negotiated export format.
+        """
+        self.request.accepted_renderer = ORJSONRenderer()
+        self.request.accepted_media_type = ORJSONRenderer.media_type
+        return super().handle_exception(exc)
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> StreamingHttpResponse:
+        """
+        Handle GET requests to stream the table.
+
+        Returns:
+            - StreamingHttpResponse: The rows in the negotiated format.
+        """
+        serializer = ValuesSerializer.for_serializer(
+            self.get_serializer_class(), self.get_requested_fields()
+        )
+        queryset = sharding.fan_out(self.filter_queryset(self.get_queryset()), *serializer.sources)
+        renderer = request.accepted_renderer
+        logger.info(
+            "User '%s' is exporting %s as %s.", request.user.id, self.export_name, renderer.format
+        )
+
+        rows = (serializer.to_representation(row)
+                for row in queryset.iterator(chunk_size=self.chunk_size))
+        fieldnames = [name for name, _, _ in serializer.columns]
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(rows, fieldnames), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.export_name}.{renderer.format}"'
+        )
+        return response
@@ -0,0 +1,70 @@
+"""
+Model fields shared by the Bloq.it apps.
+"""
+
+from typing import Any, Dict, List, Optional
+from django.core import exceptions
+from django.db import models
+from django.utils.functional import cached_property
+
+
+class EnumField(models.PositiveSmallIntegerField):
+    """
+    Stores the values of a ``TextChoices`` enum as small integers.
+
+    Model instances, queries, ``values()`` and the API see the string values;
+    the column holds the 1-based position of each value in ``choices``, so
+    new values must be appended to the enum, never inserted or reordered.
+    """
+    description = 'Enum value stored as a small integer'
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if not self.choices:
+            raise ValueError('EnumField requires choices.')
+        self.codes: Dict[str, int] = {
+            value: code for code, (value, _) in enumerate(self.choices, start=1)
+        }
+        self.values: Dict[int, str] = {code: value for value, code in self.codes.items()}
+
+    @cached_property
+    def validators(self) -> List[Any]:
+        """
+        Drop the integer range validators, the values are strings.
+        """
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value: Optional[int], expression: Any,
+                      connection: Any) -> Optional[str]:
+        """
+        Turn a stored code into its string value.
+        """
+        return None if value is None else self.values[value]
+
+    def to_python(self, value: Any) -> Optional[str]:
+        """
+        Accept a string value, or a stored code.
+        """
+        if value is None or value in self.codes:
+            return value
+        if isinstance(value, int) and value in self.values:
+            return self.values[value]
+        raise exceptions.ValidationError(
+            self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+        )
+
+    def get_prep_value(self, value: Any) -> Optional[int]:
+        """
+        Turn a string value into its code.
+
+        Raises:
+            ValueError: If the value is not one of the choices.
+        """
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        try:
+            return self.codes[value]
+        except KeyError as exc:
+            raise ValueError(f"Field '{self.name}' expected one of {list(self.codes)} "
+                             f"but got {value!r}.") from exc
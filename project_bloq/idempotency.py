@@ -0,0 +1,257 @@
+"""
+Stores of the idempotency keys of the Bloq.it API.
+
+``IdempotencyMiddleware`` reserves a key while its first request runs and then
+stores the response for replays, in the store of the ``IDEMPOTENCY_STORE``
+setting so retries reach it from any worker. Entries expire by age only: no
+store drops a live entry to make room for another.
+
+Stores:
+
+- ``RedisIdempotencyStore`` (default): reserves a key with ``SET NX PX`` and
+  keeps each entry under its own expiry.
+- ``CacheIdempotencyStore``: a Django cache, for development and tests without
+  Redis. Its reservations are not atomic, and caches with a size limit cull
+  live entries.
+
+A reservation expires after ``LOCK_TIMEOUT`` seconds unless renewed, so a key
+reserved by a worker that died can be used again; ``KeepAlive`` renews it while
+the request runs.
+"""
+
+import logging
+import threading
+from typing import Any, Optional
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Renews a reservation: KEYS[1] is the key, ARGV[1] the reservation and
+# ARGV[2] its timeout in milliseconds. Returns 1 if the key is still reserved.
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Releases a reservation: KEYS[1] is the key, ARGV[1] the reservation.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisIdempotencyStore:
+    """
+    Idempotency keys kept in Redis.
+
+    Requests are let through unchecked while Redis cannot be reached, so an
+    outage of the store does not take the API down with it.
+
+    Options:
+        URL: The Redis server (``redis://localhost:6379/0``).
+        KEY_PREFIX: Prefix of the keys (``idempotency:``).
+        TIMEOUT: Socket timeout in seconds (``0.5``).
+    """
+
+    def __init__(self, **options: Any) -> None:
+        import redis  # pylint: disable=import-outside-toplevel
+
+        self.error = redis.RedisError
+        self.prefix = options.get('KEY_PREFIX', 'idempotency:')
+        timeout = options.get('TIMEOUT', 0.5)
+        self.client = redis.Redis.from_url(
+            options.get('URL', 'redis://localhost:6379/0'),
+            socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        self.renew_script = self.client.register_script(RENEW_SCRIPT)
+        self.release_script = self.client.register_script(RELEASE_SCRIPT)
+
+    def reserve(self, key: str, reservation: bytes, timeout: float) -> bool:
+        """
+        Reserve a key that holds no entry yet.
+
+        Returns:
+            bool: Whether the key was reserved (or Redis is unreachable).
+        """
+        try:
+            return bool(self.client.set(
+                self.prefix + key, reservation, nx=True, px=round(timeout * 1000)
+            ))
+        except self.error:
+            logger.warning("Idempotency store unavailable, running the request.", exc_info=True)
+            return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return the entry of a key, None if it has none.
+        """
+        try:
+            return self.client.get(self.prefix + key)
+        except self.error:
+            logger.warning("Idempotency store unavailable.", exc_info=True)
+            return None
+
+    def renew(self, key: str, reservation: bytes, timeout: float) -> bool:
+        """
+        Extend a reservation to ``timeout`` seconds from now.
+
+        Returns:
+            bool: Whether the key is still reserved by it.
+        """
+        try:
+            return bool(self.renew_script(
+                keys=[self.prefix + key], args=[reservation, round(timeout * 1000)]
+            ))
+        except self.error:
+            logger.warning("Idempotency store unavailable.", exc_info=True)
+            return True
+
+    def store(self, key: str, entry: bytes, ttl: float) -> None:
+        """
+        Store the entry of a key for ``ttl`` seconds.
+        """
+        try:
+            self.client.set(self.prefix + key, entry, px=round(ttl * 1000))
+        except self.error:
+            logger.warning("Idempotency store unavailable, response not stored.", exc_info=True)
+
+    def release(self, key: str, reservation: bytes) -> None:
+        """
+        Drop a reservation, so the key can be used again.
+        """
+        try:
+            self.release_script(keys=[self.prefix + key], args=[reservation])
+        except self.error:
+            logger.warning("Idempotency store unavailable.", exc_info=True)
+
+    def clear(self) -> None:
+        """
+        Drop every key.
+        """
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class CacheIdempotencyStore:
+    """
+    Idempotency keys kept in a Django cache.
+
+    Options:
+        CACHE: The cache alias (``default``).
+        KEY_PREFIX: Prefix of the keys (``idempotency:``).
+    """
+
+    def __init__(self, **options: Any) -> None:
+        self.cache = caches[options.get('CACHE', 'default')]
+        self.prefix = options.get('KEY_PREFIX', 'idempotency:')
+
+    def reserve(self, key: str, reservation: bytes, timeout: float) -> bool:
+        """
+        Reserve a key that holds no entry yet.
+        """
+        return self.cache.add(self.prefix + key, reservation, timeout)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return the entry of a key, None if it has none.
+        """
+        return self.cache.get(self.prefix + key)
+
+    def renew(self, key: str, reservation: bytes, timeout: float) -> bool:
+        """
+        Extend a reservation to ``timeout`` seconds from now.
+        """
+        return self.get(key) == reservation and self.cache.touch(self.prefix + key, timeout)
+
+    def store(self, key: str, entry: bytes, ttl: float) -> None:
+        """
+        Store the entry of a key for ``ttl`` seconds.
+        """
+        self.cache.set(self.prefix + key, entry, ttl)
+
+    def release(self, key: str, reservation: bytes) -> None:
+        """
+        Drop a reservation, so the key can be used again.
+        """
+        if self.get(key) == reservation:
+            self.cache.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        """
+        Drop every key.
+        """
+        self.cache.clear()
+
+
+class KeepAlive:
+    """
+    Thread renewing a reservation until the request holding it finishes.
+    """
+
+    def __init__(self, store: Any, key: str, reservation: bytes, timeout: float) -> None:
+        self.store = store
+        self.key = key
+        self.reservation = reservation
+        self.timeout = timeout
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='idempotency-keepalive', daemon=True)
+
+    def start(self) -> None:
+        """
+        Start renewing the reservation.
+        """
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop renewing the reservation.
+        """
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self) -> None:
+        """
+        Renew the reservation every third of its timeout until stopped.
+        """
+        while not self.stopped.wait(self.timeout / 3):
+            if not self.store.renew(self.key, self.reservation, self.timeout):
+                logger.warning("Idempotency key %s was reserved again.", self.key)
+                return
+
+
+_store: Any = None  # pylint: disable=invalid-name
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> Any:
+    """
+    Return the process wide idempotency store configured by ``IDEMPOTENCY_STORE``.
+    """
+    global _store  # pylint: disable=global-statement
+    with _store_lock:
+        if _store is None:
+            config = getattr(settings, 'IDEMPOTENCY_STORE', {})
+            backend = config.get('BACKEND', 'project_bloq.idempotency.CacheIdempotencyStore')
+            _store = import_string(backend)(**(config.get('OPTIONS') or {}))
+        return _store
+
+
+def _reset_store(setting: str, **kwargs: Any) -> None:
+    """
+    Drop the idempotency store when ``IDEMPOTENCY_STORE`` is overridden.
+    """
+    global _store  # pylint: disable=global-statement
+    if setting == 'IDEMPOTENCY_STORE':
+        with _store_lock:
+            _store = None
+
+
+setting_changed.connect(_reset_store)
@@ -0,0 +1,342 @@
+"""
+Conversion of string primary keys to integer surrogate keys.
+
+Bloqs, Lockers and Rents are identified by client chosen strings. They used to
+be the primary keys, so every foreign key, index and join carried a varchar.
+``convert`` gives a table an internal ``bigint`` primary key (``key``), keeps
+the string ``id`` as a unique column and points the foreign keys to the table
+at the new key. It is called by a migration per table, after the migration
+has moved the model state to the new layout.
+
+On Postgres the conversion runs online, next to the running application:
+
+1. The key column is added (a metadata change), filled for new rows by a
+   sequence default and backfilled in batches of ``batch_size`` rows, each
+   in its own short transaction.
+2. Each referencing table gets a shadow column kept in sync by a trigger, also
+   backfilled in batches, with its indexes built concurrently.
+3. The unique indexes and NOT NULL checks are built and validated without
+   blocking writes.
+4. A single short transaction drops the old foreign key columns, renames the
+   shadow columns into place and swaps the primary key onto the prebuilt
+   index. It gives up after ``LOCK_TIMEOUT`` instead of queueing writes behind
+   a long running query; every step before it can simply be run again.
+5. The new foreign keys, created ``NOT VALID``, are validated afterwards.
+
+SQLite (development and tests) has no online schema changes: the tables are
+numbered and rebuilt in one transaction.
+"""
+
+from typing import Iterator, List, Optional, Sequence, Tuple, Type
+from django.db import NotSupportedError, transaction
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.backends.utils import CursorWrapper, truncate_name
+from django.db.models import Model
+
+BATCH_SIZE = 10000
+LOCK_TIMEOUT = '5s'
+
+Reference = Tuple[Type[Model], str]
+
+
+class _Names:  # pylint: disable=too-many-instance-attributes
+    """
+    Quoted names of the objects the conversion of one table works with.
+    """
+
+    def __init__(self, schema_editor: BaseDatabaseSchemaEditor, model: Type[Model]) -> None:
+        self.connection = schema_editor.connection
+        table = model._meta.db_table
+        key = model._meta.pk.column
+        self.table_name = table
+        self.table = self.quote(table)
+        self.key = self.quote(key)
+        self.public = self.quote(model._meta.get_field('id').column)
+        self.sequence = self.quote(self.name(f'{table}_{key}_seq'))
+        self.key_index = self.quote(self.name(f'{table}_{key}_uniq'))
+        self.public_index = self.quote(self.name(f'{table}_id_uniq'))
+        self.key_check = self.quote(self.name(f'{table}_{key}_notnull'))
+        self.primary_key = self.quote(self.name(f'{table}_pkey'))
+        self.unique = self.quote(self.name(f'{table}_id_key'))
+
+    def name(self, name: str) -> str:
+        """
+        Truncate a generated name to the database's limit.
+        """
+        return truncate_name(name, self.connection.ops.max_name_length())
+
+    def quote(self, name: str) -> str:
+        """
+        Quote a name.
+        """
+        return self.connection.ops.quote_name(name)
+
+
+class _ReferenceNames(_Names):  # pylint: disable=too-many-instance-attributes
+    """
+    Quoted names for converting one foreign key to the table.
+    """
+
+    def __init__(self, schema_editor: BaseDatabaseSchemaEditor, model: Type[Model],
+                 reference: Reference) -> None:
+        super().__init__(schema_editor, model)
+        ref_model, field_name = reference
+        ref_table = ref_model._meta.db_table
+        column = ref_model._meta.get_field(field_name).column
+        self.ref_table_name = ref_table
+        self.column_name = column
+        self.ref_table = self.quote(ref_table)
+        self.ref_public = self.quote(ref_model._meta.get_field('id').column)
+        self.column = self.quote(column)
+        self.shadow = self.quote(f'{column}__new')
+        self.function = self.quote(self.name(f'{ref_table}_{column}_sync'))
+        self.check = self.quote(self.name(f'{ref_table}_{column}_notnull'))
+        self.foreign_key = self.quote(
+            self.name(f'{ref_table}_{column}_fk_{model._meta.db_table}_{model._meta.pk.column}')
+        )
+
+    def index_names(self, cursor: CursorWrapper) -> List[Tuple[str, List[str]]]:
+        """
+        Return the plain indexes on the foreign key column with their columns.
+
+        ``varchar_pattern_ops`` (``_like``) indexes are not needed on an integer.
+        """
+        constraints = self.connection.introspection.get_constraints(cursor, self.ref_table_name)
+        return [
+            (name, info['columns'])
+            for name, info in constraints.items()
+            if info['index'] and not info['primary_key'] and not info['unique']
+            and self.column_name in info['columns'] and not name.endswith('_like')
+        ]
+
+    def foreign_keys(self, cursor: CursorWrapper) -> List[str]:
+        """
+        Return the foreign key constraints on the old column.
+        """
+        constraints = self.connection.introspection.get_constraints(cursor, self.ref_table_name)
+        return [
+            name for name, info in constraints.items()
+            if info['foreign_key'] and info['columns'] == [self.column_name]
+        ]
+
+
+def _ranges(cursor: CursorWrapper, table: str, column: str,
+            batch_size: int) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Split a table into batches along a unique column.
+
+    Yields:
+        The condition selecting the rows of a batch and its parameters.
+    """
+    after: Optional[str] = None
+    while True:
+        lower, params = ('', []) if after is None else (f'{table}.{column} > %s', [after])
+        cursor.execute(
+            f'SELECT max({column}) FROM ('
+            f' SELECT {column} FROM {table} {"WHERE " + lower if lower else ""}'
+            f' ORDER BY {column} LIMIT %s'
+            f') AS batch',
+            params + [batch_size],
+        )
+        upto = cursor.fetchone()[0]
+        if upto is None:
+            return
+        upper = f'{table}.{column} <= %s'
+        yield (f'{upper} AND {lower}' if lower else upper), [upto] + params
+        after = upto
+
+
+def _add_not_null_check(cursor: CursorWrapper, table: str, column: str, check: str) -> None:
+    """
+    Add and validate a ``CHECK (column IS NOT NULL)`` without blocking writes.
+
+    ``SET NOT NULL`` uses the validated check instead of scanning the table.
+    """
+    cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}')
+    cursor.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID'
+    )
+    cursor.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {check}')
+
+
+def _prepare_key(cursor: CursorWrapper, names: _Names, batch_size: int) -> None:
+    """
+    Add, number and index the key column of a table.
+    """
+    cursor.execute(f'ALTER TABLE {names.table} ADD COLUMN IF NOT EXISTS {names.key} bigint')
+    cursor.execute(
+        f'CREATE SEQUENCE IF NOT EXISTS {names.sequence} OWNED BY {names.table}.{names.key}'
+    )
+    cursor.execute(
+        f'ALTER TABLE {names.table} ALTER COLUMN {names.key} '
+        f"SET DEFAULT nextval('{names.sequence}')"
+    )
+    for condition, params in _ranges(cursor, names.table, names.public, batch_size):
+        cursor.execute(
+            f"UPDATE {names.table} SET {names.key} = nextval('{names.sequence}') "
+            f'WHERE {names.key} IS NULL AND {condition}',
+            params,
+        )
+    cursor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {names.key_index} '
+        f'ON {names.table} ({names.key})'
+    )
+    cursor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {names.public_index} '
+        f'ON {names.table} ({names.public})'
+    )
+    _add_not_null_check(cursor, names.table, names.key, names.key_check)
+
+
+def _prepare_reference(cursor: CursorWrapper, names: _ReferenceNames, batch_size: int) -> None:
+    """
+    Add and fill the shadow key column of a foreign key, and index it.
+    """
+    cursor.execute(
+        f'ALTER TABLE {names.ref_table} ADD COLUMN IF NOT EXISTS {names.shadow} bigint'
+    )
+    cursor.execute(
+        f'CREATE OR REPLACE FUNCTION {names.function}() RETURNS trigger AS $$ BEGIN'
+        f' NEW.{names.shadow} := (SELECT {names.key} FROM {names.table}'
+        f' WHERE {names.public} = NEW.{names.column});'
+        f' RETURN NEW; END $$ LANGUAGE plpgsql'
+    )
+    cursor.execute(f'DROP TRIGGER IF EXISTS {names.function} ON {names.ref_table}')
+    cursor.execute(
+        f'CREATE TRIGGER {names.function} BEFORE INSERT OR UPDATE OF {names.column} '
+        f'ON {names.ref_table} FOR EACH ROW EXECUTE PROCEDURE {names.function}()'
+    )
+    for condition, params in _ranges(cursor, names.ref_table, names.ref_public, batch_size):
+        cursor.execute(
+            f'UPDATE {names.ref_table} SET {names.shadow} = {names.table}.{names.key} '
+            f'FROM {names.table} WHERE {names.table}.{names.public} = '
+            f'{names.ref_table}.{names.column} AND {condition}',
+            params,
+        )
+    for name, columns in names.index_names(cursor):
+        cursor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {names.quote(names.name(name + "__new"))} '
+            f'ON {names.ref_table} ('
+            + ', '.join(
+                names.shadow if column == names.column_name else names.quote(column)
+                for column in columns
+            )
+            + ')'
+        )
+    _add_not_null_check(cursor, names.ref_table, names.shadow, names.check)
+
+
+def _swap_reference(cursor: CursorWrapper, names: _ReferenceNames) -> None:
+    """
+    Replace the old foreign key column by its shadow column.
+    """
+    indexes = [name for name, _ in names.index_names(cursor)]
+    for name in names.foreign_keys(cursor):
+        cursor.execute(f'ALTER TABLE {names.ref_table} DROP CONSTRAINT {names.quote(name)}')
+    cursor.execute(f'DROP TRIGGER {names.function} ON {names.ref_table}')
+    cursor.execute(f'ALTER TABLE {names.ref_table} DROP COLUMN {names.column}')
+    cursor.execute(
+        f'ALTER TABLE {names.ref_table} RENAME COLUMN {names.shadow} TO {names.column}'
+    )
+    cursor.execute(f'ALTER TABLE {names.ref_table} ALTER COLUMN {names.column} SET NOT NULL')
+    cursor.execute(f'ALTER TABLE {names.ref_table} DROP CONSTRAINT {names.check}')
+    for name in indexes:
+        cursor.execute(
+            f'ALTER INDEX {names.quote(names.name(name + "__new"))} RENAME TO {names.quote(name)}'
+        )
+
+
+def _swap_key(cursor: CursorWrapper, names: _Names) -> None:
+    """
+    Move the primary key of a table onto the key column.
+    """
+    constraints = names.connection.introspection.get_constraints(cursor, names.table_name)
+    cursor.execute(f'ALTER TABLE {names.table} ALTER COLUMN {names.key} SET NOT NULL')
+    cursor.execute(f'ALTER TABLE {names.table} DROP CONSTRAINT {names.key_check}')
+    for name, info in constraints.items():
+        if info['primary_key']:
+            cursor.execute(f'ALTER TABLE {names.table} DROP CONSTRAINT {names.quote(name)}')
+    cursor.execute(
+        f'ALTER TABLE {names.table} ADD CONSTRAINT {names.primary_key} '
+        f'PRIMARY KEY USING INDEX {names.key_index}'
+    )
+    cursor.execute(
+        f'ALTER TABLE {names.table} ADD CONSTRAINT {names.unique} '
+        f'UNIQUE USING INDEX {names.public_index}'
+    )
+
+
+def _convert_online(schema_editor: BaseDatabaseSchemaEditor, model: Type[Model],
+                    references: Sequence[Reference], batch_size: int) -> None:
+    """
+    Convert a table on Postgres without blocking reads and writes for long.
+    """
+    connection = schema_editor.connection
+    names = _Names(schema_editor, model)
+    ref_names = [_ReferenceNames(schema_editor, model, reference) for reference in references]
+    with connection.cursor() as cursor:
+        _prepare_key(cursor, names, batch_size)
+        for ref in ref_names:
+            _prepare_reference(cursor, ref, batch_size)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        for ref in ref_names:
+            _swap_reference(cursor, ref)
+        _swap_key(cursor, names)
+        for ref in ref_names:
+            cursor.execute(
+                f'ALTER TABLE {ref.ref_table} ADD CONSTRAINT {ref.foreign_key} '
+                f'FOREIGN KEY ({ref.column}) REFERENCES {names.table} ({names.key}) '
+                f'DEFERRABLE INITIALLY DEFERRED NOT VALID'
+            )
+    with connection.cursor() as cursor:
+        for ref in ref_names:
+            cursor.execute(f'ALTER TABLE {ref.ref_table} VALIDATE CONSTRAINT {ref.foreign_key}')
+            cursor.execute(f'DROP FUNCTION {ref.function}()')
+
+
+def _rebuild(schema_editor: BaseDatabaseSchemaEditor, model: Type[Model],
+             references: Sequence[Reference]) -> None:
+    """
+    Convert a table on SQLite by numbering its rows and rebuilding the tables.
+    """
+    connection = schema_editor.connection
+    names = _Names(schema_editor, model)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {names.table} ADD COLUMN {names.key} bigint')
+        cursor.execute(f'SELECT {names.public} FROM {names.table} ORDER BY {names.public}')
+        cursor.executemany(
+            f'UPDATE {names.table} SET {names.key} = %s WHERE {names.public} = %s',
+            [(key, public) for key, (public,) in enumerate(cursor.fetchall(), start=1)],
+        )
+        for reference in references:
+            ref = _ReferenceNames(schema_editor, model, reference)
+            cursor.execute(
+                f'UPDATE {ref.ref_table} SET {ref.column} = (SELECT {names.key} '
+                f'FROM {names.table} WHERE {names.public} = {ref.ref_table}.{ref.column})'
+            )
+        # pylint: disable=protected-access
+        schema_editor._remake_table(model)
+        for ref_model, _ in references:
+            schema_editor._remake_table(ref_model)
+
+
+def convert(schema_editor: BaseDatabaseSchemaEditor, model: Type[Model],
+            references: Sequence[Reference] = (), batch_size: int = BATCH_SIZE) -> None:
+    """
+    Move a table onto its integer key and point foreign keys to it at the key.
+
+    Args:
+        schema_editor: The schema editor of the running migration, which must
+          not be atomic on Postgres.
+        model: The model in its new state, with ``key`` as primary key.
+        references: The ``(model, field name)`` of each foreign key to the table.
+        batch_size: The number of rows updated per transaction on Postgres.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _convert_online(schema_editor, model, references, batch_size)
+    elif vendor == 'sqlite':
+        _rebuild(schema_editor, model, references)
+    else:
+        raise NotSupportedError(f'Converting primary keys is not supported on {vendor}.')
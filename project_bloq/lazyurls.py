@@ -0,0 +1,50 @@
+"""
+URLconfs imported on first use.
+
+``include()`` imports a URLconf, and with it every view it routes to, as soon as
+the root URLconf is loaded. Routes that most workers never serve (the docs, the
+admin, the auth endpoints) are mounted with ``lazy_include`` instead: their
+module is imported the first time a request path falls under their prefix or a
+URL is reversed.
+"""
+
+from importlib import import_module
+from typing import Optional, Tuple
+from django.utils.functional import cached_property
+
+
+class LazyURLConf:
+    """
+    A URLconf whose patterns are imported on first access.
+
+    Args:
+        module (str): The dotted path of the module defining the patterns.
+        attribute (str): The name of the pattern list in that module.
+    """
+
+    def __init__(self, module: str, attribute: str = 'urlpatterns') -> None:
+        self.module = module
+        self.attribute = attribute
+
+    def __repr__(self) -> str:
+        return f'<LazyURLConf {self.module}.{self.attribute}>'
+
+    @cached_property
+    def urlpatterns(self) -> list:
+        """
+        Import the module and return its patterns.
+        """
+        return getattr(import_module(self.module), self.attribute)
+
+
+def lazy_include(
+        module: str, attribute: str = 'urlpatterns', app_name: Optional[str] = None,
+        namespace: Optional[str] = None,
+) -> Tuple[LazyURLConf, Optional[str], Optional[str]]:
+    """
+    Like ``include()``, without importing the URLconf.
+
+    The application namespace is not read from the module, so pass ``app_name``
+    when the module defines one.
+    """
+    return LazyURLConf(module, attribute), app_name, namespace or app_name
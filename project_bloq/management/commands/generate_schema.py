@@ -0,0 +1,29 @@
+"""
+Management command precomputing the OpenAPI schema.
+
+Run it at build time, so workers never introspect the API on a request:
+
+    python manage.py generate_schema
+"""
+
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from project_bloq.schema import write_schema
+
+
+class Command(BaseCommand):
+    """
+    Generate the OpenAPI schema of every API version and store it on disk.
+    """
+    help = 'Generate the OpenAPI schema (JSON and YAML) into OPENAPI_SCHEMA_DIR.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--api-version', dest='versions', action='append',
+            help='API version to generate (repeatable, default v1).',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        for version in options['versions'] or ['v1']:
+            for path in write_schema(version).values():
+                self.stdout.write(f'Wrote {path}.')
@@ -0,0 +1,92 @@
+"""
+In-process metrics for the Bloq.it API.
+
+This module contains a minimal, thread-safe counter registry that is rendered in
+the Prometheus text exposition format by the ``/metrics/`` endpoint. Counters are
+kept per worker process; the scraper aggregates them across workers.
+"""
+
+import threading
+from typing import Dict, List, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """
+    A monotonically increasing counter with optional labels.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> None:
+        """
+        Create a counter and register it in the global registry.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text exposed with the metric.
+            labelnames (Tuple[str, ...]): Names of the labels of the counter.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increment the counter for the given label values.
+
+        Args:
+            amount (float): The amount to add.
+            **labels (str): A value for every label name of the counter.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        """
+        Return the current value for the given label values.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        """
+        Return a snapshot of all label values and their counts.
+        """
+        with self._lock:
+            return sorted(self._values.items())
+
+
+REGISTRY: List[Counter] = []
+
+
+def _escape(value: str) -> str:
+    """
+    Escape a label value for the Prometheus text format.
+    """
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render_prometheus() -> str:
+    """
+    Render every registered counter in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines: List[str] = []
+    for counter in REGISTRY:
+        lines.append(f'# HELP {counter.name} {counter.documentation}')
+        lines.append(f'# TYPE {counter.name} counter')
+        for label_values, value in counter.samples():
+            labels = ','.join(
+                f'{name}="{_escape(label)}"'
+                for name, label in zip(counter.labelnames, label_values)
+            )
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{counter.name}{suffix} {value:g}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,366 @@
+"""
+Middleware for the Bloq.it API.
+
+This module contains the response compression middleware. It compresses API
+responses with brotli or gzip, depending on what the client accepts, skips
+payloads below a configurable size threshold and supports streaming responses.
+Bytes saved are reported through the metrics registry.
+
+It also contains the idempotency middleware, which stores the responses of
+requests sent with an ``Idempotency-Key`` header and replays them when a client
+retries the request.
+"""
+
+import gzip
+import hashlib
+import io
+import pickle
+import re
+import uuid
+from typing import Callable, Iterable, Iterator, Optional
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.http.response import HttpResponseBase
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from .idempotency import KeepAlive, get_idempotency_store
+from .metrics import Counter
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+DEFAULTS = {
+    'MIN_SIZE': 1024,
+    'ALGORITHMS': ['br', 'gzip'],
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    'CONTENT_TYPES': [
+        'application/json',
+        'application/msgpack',
+        'application/openapi',
+        'application/x-ndjson',
+        'application/yaml',
+        'text/',
+    ],
+}
+
+IDEMPOTENCY_DEFAULTS = {
+    'TTL': 24 * 60 * 60,
+    'LOCK_TIMEOUT': 60,
+    'MAX_KEY_LENGTH': 255,
+}
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+re_accept_encoding = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+
+compressed_responses = Counter(
+    'http_compressed_responses_total', 'Responses compressed by the API.', ('encoding',)
+)
+compression_bytes_in = Counter(
+    'http_compression_bytes_in_total', 'Response bytes before compression.', ('encoding',)
+)
+compression_bytes_out = Counter(
+    'http_compression_bytes_out_total', 'Response bytes after compression.', ('encoding',)
+)
+compression_bytes_saved = Counter(
+    'http_compression_bytes_saved_total', 'Response bytes saved by compression.', ('encoding',)
+)
+compression_skipped = Counter(
+    'http_compression_skipped_total', 'Responses sent uncompressed.', ('reason',)
+)
+
+idempotent_requests = Counter(
+    'http_idempotent_requests_total', 'Requests sent with an Idempotency-Key.', ('outcome',)
+)
+
+
+def accepted_encodings(header: str) -> dict:
+    """
+    Parse an ``Accept-Encoding`` header into a mapping of coding to quality.
+    """
+    accepted = {}
+    for coding, quality in re_accept_encoding.findall(header):
+        try:
+            accepted[coding.lower()] = float(quality) if quality else 1.0
+        except ValueError:
+            continue
+    return accepted
+
+
+class _Compressor:
+    """
+    Incremental compressor for a single content coding.
+    """
+
+    def __init__(self, encoding: str, options: dict) -> None:
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=options['BROTLI_QUALITY'])
+        else:
+            self._buffer = io.BytesIO()
+            self._gzip = gzip.GzipFile(
+                mode='wb', compresslevel=options['GZIP_LEVEL'], fileobj=self._buffer, mtime=0
+            )
+
+    def _drain(self) -> bytes:
+        """
+        Return and clear the bytes written to the gzip buffer so far.
+        """
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress a chunk and flush it, so it can be sent immediately.
+        """
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.flush()
+        self._gzip.write(data)
+        self._gzip.flush()
+        return self._drain()
+
+    def finish(self) -> bytes:
+        """
+        Return the trailing bytes of the compressed stream.
+        """
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        self._gzip.close()
+        return self._drain()
+
+    def compress_all(self, data: bytes) -> bytes:
+        """
+        Compress a complete body in one go.
+        """
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.finish()
+        self._gzip.write(data)
+        return self.finish()
+
+
+def _record(encoding: str, size_in: int, size_out: int) -> None:
+    """
+    Report the result of compressing one response.
+    """
+    compressed_responses.inc(encoding=encoding)
+    compression_bytes_in.inc(size_in, encoding=encoding)
+    compression_bytes_out.inc(size_out, encoding=encoding)
+    compression_bytes_saved.inc(max(size_in - size_out, 0), encoding=encoding)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress API responses with brotli or gzip.
+
+    Configured through the ``API_COMPRESSION`` setting:
+
+    - ``MIN_SIZE``: responses smaller than this many bytes are sent as is.
+    - ``ALGORITHMS``: content codings in order of preference (``br``, ``gzip``).
+    - ``GZIP_LEVEL`` / ``BROTLI_QUALITY``: compression levels.
+    - ``CONTENT_TYPES``: content type prefixes eligible for compression.
+    """
+
+    def __init__(self, get_response=None) -> None:
+        super().__init__(get_response)
+        self.options = {**DEFAULTS, **getattr(settings, 'API_COMPRESSION', {})}
+        self.algorithms = [
+            name for name in self.options['ALGORITHMS']
+            if name == 'gzip' or (name == 'br' and brotli is not None)
+        ]
+
+    def select_encoding(self, request: HttpRequest) -> Optional[str]:
+        """
+        Pick the preferred content coding accepted by the client.
+        """
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        wildcard = accepted.get('*', 0)
+        candidates = [
+            name for name in self.algorithms if accepted.get(name, wildcard) > 0
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda name: accepted.get(name, wildcard))
+
+    def is_compressible(self, response: HttpResponseBase) -> bool:
+        """
+        Check the response content type against the configured prefixes.
+        """
+        content_type = response.get('Content-Type', '').lower()
+        return any(content_type.startswith(prefix) for prefix in self.options['CONTENT_TYPES'])
+
+    def process_response(self, request: HttpRequest,
+                         response: HttpResponseBase) -> HttpResponseBase:
+        """
+        Compress the response if it is eligible and large enough.
+        """
+        if response.has_header('Content-Encoding') or not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.select_encoding(request)
+        if encoding is None:
+            compression_skipped.inc(reason='not_accepted')
+            return response
+
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length and length.isdigit() and int(length) < self.options['MIN_SIZE']:
+                compression_skipped.inc(reason='too_small')
+                return response
+            response.streaming_content = self.compress_stream(
+                response.streaming_content, _Compressor(encoding, self.options)
+            )
+            del response['Content-Length']
+        else:
+            content = response.content
+            if len(content) < self.options['MIN_SIZE']:
+                compression_skipped.inc(reason='too_small')
+                return response
+            compressed = _Compressor(encoding, self.options).compress_all(content)
+            if len(compressed) >= len(content):
+                compression_skipped.inc(reason='not_smaller')
+                return response
+            _record(encoding, len(content), len(compressed))
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def compress_stream(chunks: Iterable[bytes], compressor: _Compressor) -> Iterator[bytes]:
+        """
+        Compress a streaming body chunk by chunk and report the totals at the end.
+        """
+        size_in = size_out = 0
+        for chunk in chunks:
+            size_in += len(chunk)
+            data = compressor.compress(chunk)
+            if data:
+                size_out += len(data)
+                yield data
+        data = compressor.finish()
+        size_out += len(data)
+        yield data
+        _record(compressor.encoding, size_in, size_out)
+
+
+class IdempotencyMiddleware(MiddlewareMixin):
+    """
+    Replay the stored response of requests retried with the same Idempotency-Key.
+
+    Only applies to the methods a view lists in its ``idempotent_methods``
+    attribute. The first request with a key runs normally and its response is
+    stored; a retry with the same key, credentials, method, path and body gets
+    the stored response back, flagged with an ``Idempotent-Replayed`` header,
+    without running the view. Keys are scoped to the ``Authorization`` header,
+    so replays need no database access at all. Keys and responses are kept in
+    the store of the ``IDEMPOTENCY_STORE`` setting (see project_bloq.idempotency).
+
+    Configured through the ``IDEMPOTENCY`` setting:
+
+    - ``TTL``: seconds a response is kept for replays.
+    - ``LOCK_TIMEOUT``: seconds a key stays reserved by a request in progress
+      that stopped renewing it (its worker died).
+    - ``MAX_KEY_LENGTH``: the longest accepted key.
+
+    Server errors and 409/429 responses are not stored, so those requests can be
+    retried with the same key.
+    """
+
+    def __init__(self, get_response=None) -> None:
+        super().__init__(get_response)
+        self.options = {**IDEMPOTENCY_DEFAULTS, **getattr(settings, 'IDEMPOTENCY', {})}
+
+    @staticmethod
+    def fingerprint(request: HttpRequest) -> str:
+        """
+        Hash the method, path and body of a request.
+        """
+        digest = hashlib.sha256()
+        for part in (request.method.encode(), request.get_full_path().encode(), request.body):
+            digest.update(part)
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def store_key(request: HttpRequest, key: str) -> str:
+        """
+        Return the store key of an Idempotency-Key, scoped to the request credentials.
+        """
+        scope = hashlib.sha256(request.META.get('HTTP_AUTHORIZATION', '').encode()).hexdigest()
+        return f'{scope[:32]}:{hashlib.sha256(key.encode()).hexdigest()[:32]}'
+
+    def process_view(self, request: HttpRequest, view_func: Callable, view_args: tuple,
+                     view_kwargs: dict) -> Optional[HttpResponse]:
+        """
+        Reserve a new key, or answer a retry from the stored response.
+        """
+        methods = getattr(getattr(view_func, 'cls', None), 'idempotent_methods', ())
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or request.method not in methods:
+            return None
+        if len(key) > self.options['MAX_KEY_LENGTH']:
+            return JsonResponse(
+                {'detail': f'{IDEMPOTENCY_HEADER} cannot exceed '
+                           f'{self.options["MAX_KEY_LENGTH"]} characters.'},
+                status=400,
+            )
+
+        store = get_idempotency_store()
+        store_key = self.store_key(request, key)
+        fingerprint = self.fingerprint(request)
+        reservation = pickle.dumps((fingerprint, None, uuid.uuid4().hex))
+        timeout = self.options['LOCK_TIMEOUT']
+        if store.reserve(store_key, reservation, timeout):
+            keep_alive = KeepAlive(store, store_key, reservation, timeout)
+            keep_alive.start()
+            request.idempotency = (store_key, fingerprint, reservation, keep_alive)
+            idempotent_requests.inc(outcome='stored')
+            return None
+
+        entry = store.get(store_key)
+        stored_fingerprint, stored = pickle.loads(entry)[:2] if entry else (fingerprint, None)
+        if stored_fingerprint != fingerprint:
+            idempotent_requests.inc(outcome='mismatch')
+            return JsonResponse(
+                {'detail': f'This {IDEMPOTENCY_HEADER} was used for a different request.'},
+                status=422,
+            )
+        if stored is None:
+            idempotent_requests.inc(outcome='in_progress')
+            return JsonResponse(
+                {'detail': f'A request with this {IDEMPOTENCY_HEADER} is still in progress.'},
+                status=409,
+            )
+        idempotent_requests.inc(outcome='replayed')
+        status, content_type, content = stored
+        response = HttpResponse(content, status=status, content_type=content_type)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def process_response(self, request: HttpRequest,
+                         response: HttpResponseBase) -> HttpResponseBase:
+        """
+        Store the response of a request that reserved a key.
+        """
+        reservation = getattr(request, 'idempotency', None)
+        if reservation is None:
+            return response
+        store_key, fingerprint, reserved, keep_alive = reservation
+        keep_alive.stop()
+        store = get_idempotency_store()
+        if response.streaming or response.status_code >= 500 or response.status_code in (409, 429):
+            store.release(store_key, reserved)
+        else:
+            stored = (response.status_code, response.get('Content-Type'), response.content)
+            store.store(store_key, pickle.dumps((fingerprint, stored)), self.options['TTL'])
+        return response
@@ -0,0 +1,158 @@
+"""
+Shared view mixins for the Bloq.it API.
+"""
+
+from typing import Any, Optional, Tuple
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Model, QuerySet
+from django.http import Http404
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.serializers import Serializer
+from . import sharding
+from .serializers import ValuesSerializer
+
+FIELDS_QUERY_PARAM = 'fields'
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldset support for list and detail views.
+
+    A comma separated ``fields`` query parameter on GET requests narrows both the
+    serializer output and the SQL column list to the requested fields.
+    """
+
+    def get_requested_fields(self) -> Optional[Tuple[str, ...]]:
+        """
+        Parse and validate the ``fields`` query parameter.
+
+        Raises:
+            ValidationError: If an unknown field name is requested.
+
+        Returns:
+            Optional[Tuple[str, ...]]: The requested field names in serializer order,
+            or None when the full representation was requested.
+        """
+        if hasattr(self, '_requested_fields'):
+            return self._requested_fields
+        fields = None
+        raw = self.request.query_params.get(FIELDS_QUERY_PARAM, '')
+        requested = {name.strip() for name in raw.split(',') if name.strip()}
+        if requested and self.request.method == 'GET':
+            available = [
+                name for name, _, _ in
+                ValuesSerializer.for_serializer(self.get_serializer_class()).columns
+            ]
+            unknown = requested.difference(available)
+            if unknown:
+                raise ValidationError(
+                    {FIELDS_QUERY_PARAM: f"Unknown field(s): {', '.join(sorted(unknown))}."}
+                )
+            fields = tuple(name for name in available if name in requested)
+        self._requested_fields = fields  # pylint: disable=attribute-defined-outside-init
+        return fields
+
+    def get_serializer(self, *args: Any, **kwargs: Any) -> Serializer:
+        """
+        Return the serializer narrowed to the requested fields.
+        """
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        """
+        Restrict the selected columns to the requested fields.
+        """
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_requested_fields()
+        if fields is not None:
+            sources = ValuesSerializer.for_serializer(self.get_serializer_class(), fields).sources
+            # Related IDs are read from the related object, so keep the foreign
+            # keys, including those the view loads with select_related().
+            names = {source.split('__', 1)[0] for source in sources}
+            if isinstance(queryset.query.select_related, dict):
+                names.update(queryset.query.select_related)
+            queryset = queryset.only(*names)
+        return queryset
+
+
+class ValuesListMixin(SparseFieldsMixin):
+    """
+    Fast read path for list views.
+
+    Fetches the page with ``QuerySet.values()`` and renders it with a
+    ValuesSerializer derived from the view's serializer class, so no model
+    instances are built. The output is identical to the regular ``list()``.
+    """
+    shard_key_url_kwarg: Optional[str] = None
+
+    def get_values_serializer(self) -> ValuesSerializer:
+        """
+        Return the ValuesSerializer matching the view's serializer class.
+
+        Returns:
+            ValuesSerializer: The cached read-only serializer.
+        """
+        return ValuesSerializer.for_serializer(
+            self.get_serializer_class(), self.get_requested_fields()
+        )
+
+    def get_shard_key(self) -> Optional[str]:
+        """
+        Return the ID of the Bloq every listed row belongs to, if there is one.
+
+        Lists of one Bloq are read from its shard, all others from every shard.
+        Defaults to the URL keyword argument named by ``shard_key_url_kwarg``.
+        """
+        if self.shard_key_url_kwarg is None:
+            return None
+        return self.kwargs.get(self.shard_key_url_kwarg)
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        List the queryset using ``values()`` rows instead of model instances.
+
+        Returns:
+            - Response: A (paginated) list of serialized rows.
+        """
+        serializer = self.get_values_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        bloq_id = self.get_shard_key()
+        if bloq_id is None:
+            queryset = sharding.fan_out(queryset, *serializer.sources)
+        else:
+            queryset = sharding.for_bloq(queryset, bloq_id).values(*serializer.sources)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+
+class ShardedObjectMixin:
+    """
+    Detail view support for sharded models.
+
+    ``get_object()`` finds the object on whichever shard holds it; saving or
+    deleting it then goes to that shard as well.
+    """
+
+    def get_object(self) -> Model:
+        """
+        Return the object the view is displaying, looked up on its shard.
+
+        Raises:
+            Http404: If no shard has the object.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = sharding.locate(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (ObjectDoesNotExist, TypeError, ValueError) as exc:
+            raise Http404 from exc
+        self.check_object_permissions(self.request, obj)
+        return obj
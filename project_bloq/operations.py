@@ -0,0 +1,114 @@
+"""
+Migration operations shared by the Bloq.it apps.
+
+On Postgres these change large tables without blocking writes for long:
+indexes are built concurrently, NOT NULL is set after validating a check
+constraint, and backfills run in batches of ``BATCH_SIZE`` rows. SQLite
+(development and tests) has no online schema changes and runs the plain
+operations instead. Migrations using them must set ``atomic = False``.
+"""
+
+from typing import Any, Iterator
+from django.contrib.postgres import operations
+from django.db.backends.utils import truncate_name
+from django.db.migrations import AddIndex, AlterField, RemoveIndex
+from django.db.models import QuerySet
+
+BATCH_SIZE = 10000
+
+
+def batches(queryset: QuerySet, batch_size: int = BATCH_SIZE) -> Iterator[QuerySet]:
+    """
+    Split a queryset into consecutive primary key ranges of ``batch_size`` rows.
+
+    Each range is read right before it is yielded, so rows added behind the
+    current range are included.
+    """
+    keys = queryset.order_by('pk').values_list('pk', flat=True)
+    after = None
+    while True:
+        page = keys if after is None else keys.filter(pk__gt=after)
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+        rows = queryset.filter(pk__lte=batch[-1])
+        yield rows if after is None else rows.filter(pk__gt=after)
+        after = batch[-1]
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    """
+    Add an index with ``CREATE INDEX CONCURRENTLY`` on Postgres.
+
+    The migration must set ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label: str, schema_editor: Any, from_state: Any,
+                          to_state: Any) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label: str, schema_editor: Any, from_state: Any,
+                           to_state: Any) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class RemoveIndexConcurrently(operations.RemoveIndexConcurrently):
+    """
+    Remove an index with ``DROP INDEX CONCURRENTLY`` on Postgres.
+
+    The migration must set ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label: str, schema_editor: Any, from_state: Any,
+                          to_state: Any) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            RemoveIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label: str, schema_editor: Any, from_state: Any,
+                           to_state: Any) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            RemoveIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class AlterFieldNotNull(AlterField):
+    """
+    Alter a field to ``NOT NULL`` without scanning the table under a lock.
+
+    On Postgres a ``CHECK (column IS NOT NULL)`` constraint is added ``NOT
+    VALID`` and validated, which does not block writes; ``SET NOT NULL`` then
+    relies on it instead of scanning the table, and the check is dropped. A
+    NULL left in the column fails the validation, and the migration can be run
+    again once it is filled.
+    """
+
+    def database_forwards(self, app_label: str, schema_editor: Any, from_state: Any,
+                          to_state: Any) -> None:
+        # pylint: disable=protected-access
+        connection = schema_editor.connection
+        model = to_state.apps.get_model(app_label, self.model_name)
+        field = model._meta.get_field(self.name)
+        if connection.vendor != 'postgresql' or field.null:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+            return
+        quote = schema_editor.quote_name
+        table = model._meta.db_table
+        check = quote(truncate_name(f'{table}_{field.column}_notnull',
+                                    connection.ops.max_name_length()))
+        schema_editor.execute(f'ALTER TABLE {quote(table)} DROP CONSTRAINT IF EXISTS {check}')
+        schema_editor.execute(
+            f'ALTER TABLE {quote(table)} ADD CONSTRAINT {check} '
+            f'CHECK ({quote(field.column)} IS NOT NULL) NOT VALID'
+        )
+        schema_editor.execute(f'ALTER TABLE {quote(table)} VALIDATE CONSTRAINT {check}')
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+        schema_editor.execute(f'ALTER TABLE {quote(table)} DROP CONSTRAINT {check}')
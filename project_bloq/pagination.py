@@ -0,0 +1,226 @@
+"""
+Page number pagination without an exact ``COUNT(*)`` on large tables.
+
+On Postgres the paginator first reads the size of the queried table from
+``pg_class.reltuples``; a query never returns more rows than its table holds,
+so below ``PAGINATION_ESTIMATE_THRESHOLD`` rows (default 100,000; ``None``
+disables estimates) the count stays exact without planning anything. For
+larger tables it asks the planner how many rows the query returns
+(``EXPLAIN``); from the threshold up that estimate is returned and marked with
+``countEstimated``. With ``?count=false`` nothing is counted and ``count`` is
+null. Pages read without an exact count fetch one extra row to tell whether
+there is a next page.
+"""
+
+import json
+from functools import partial
+from typing import Any, List, Optional, Union
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.fields import BooleanField
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from .sharding import FanOutQuerySet
+
+
+def _parts(queryset: Union[QuerySet, FanOutQuerySet]) -> List[Any]:
+    """
+    Return the per shard querysets of a (fan-out) queryset.
+    """
+    return queryset.querysets if isinstance(queryset, FanOutQuerySet) else [queryset]
+
+
+def table_rows(queryset: Union[QuerySet, FanOutQuerySet]) -> Optional[int]:
+    """
+    Return the number of rows of the table a query reads, as last measured by
+    VACUUM or ANALYZE (``pg_class.reltuples``).
+
+    Fan-out queries add up the tables of their shards.
+
+    Returns:
+        Optional[int]: The number of rows, or None if a database is not
+        Postgres or a table was never analyzed.
+    """
+    # pylint: disable=protected-access
+    total = 0
+    for part in _parts(queryset):
+        if not isinstance(part, QuerySet):
+            return None
+        connection = connections[part.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+                [connection.ops.quote_name(part.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < 0:
+            return None
+        total += int(row[0])
+    return total
+
+
+def estimate_count(queryset: Union[QuerySet, FanOutQuerySet]) -> Optional[int]:
+    """
+    Return the Postgres planner's estimate of the number of rows of a query.
+
+    Fan-out queries add up the estimates of their shards.
+
+    Returns:
+        Optional[int]: The estimate, or None if a database is not Postgres.
+    """
+    total = 0
+    for part in _parts(queryset):
+        if not isinstance(part, QuerySet):
+            return None
+        connection = connections[part.db]
+        if connection.vendor != 'postgresql':
+            return None
+        try:
+            sql, params = part.order_by().query.get_compiler(using=part.db).as_sql()
+        except EmptyResultSet:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        total += int(plan[0]['Plan']['Plan Rows'])
+    return total
+
+
+class LookaheadPage(Page):
+    """
+    Page that knows whether a next page exists from the extra row read with it.
+    """
+
+    def __init__(self, object_list: List[Any], number: int, paginator: Paginator,
+                 more: bool) -> None:
+        super().__init__(object_list, number, paginator)
+        self.more = more
+
+    def has_next(self) -> bool:
+        return self.more
+
+
+class LookaheadPaginator(Paginator):
+    """
+    Paginator with a given (estimated or unknown) count.
+
+    Any page number is accepted; a page past the last row is empty and
+    invalid, except for the first page.
+    """
+
+    def __init__(self, object_list: Any, per_page: int, count: Optional[int] = None) -> None:
+        super().__init__(object_list, per_page)
+        self.__dict__['count'] = count
+
+    @cached_property
+    def num_pages(self) -> int:
+        """
+        Return the number of pages implied by the count, 0 if it is unknown.
+        """
+        return 0 if self.count is None else super().num_pages
+
+    def validate_number(self, number: Any) -> int:
+        """
+        Check that the page number is a positive integer.
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError) as exc:
+            raise PageNotAnInteger('That page number is not an integer') from exc
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number: Any) -> LookaheadPage:
+        """
+        Return a page, reading one row more than it holds.
+        """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        return LookaheadPage(rows[:self.per_page], number, self, len(rows) > self.per_page)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    Page number pagination with estimated or disabled counts for large tables.
+
+    Responses carry ``countEstimated`` next to ``count``.
+    """
+    count_query_param: str = 'count'
+    count_estimated: bool = False
+
+    def get_estimate_threshold(self) -> Optional[int]:
+        """
+        Return the number of rows from which counts are estimated.
+        """
+        return getattr(settings, 'PAGINATION_ESTIMATE_THRESHOLD', 100000)
+
+    def table_rows(self, queryset: Union[QuerySet, FanOutQuerySet]) -> Optional[int]:
+        """
+        Return the number of rows of the queryset's table, None if unknown.
+        """
+        return table_rows(queryset)
+
+    def estimate_count(self, queryset: Union[QuerySet, FanOutQuerySet]) -> Optional[int]:
+        """
+        Return the estimated number of rows of the queryset, None if unknown.
+        """
+        return estimate_count(queryset)
+
+    def should_estimate(self, queryset: Union[QuerySet, FanOutQuerySet],
+                        threshold: Optional[int]) -> bool:
+        """
+        Check whether the queryset's table may hold enough rows to estimate its count.
+        """
+        if threshold is None:
+            return False
+        rows = self.table_rows(queryset)
+        return rows is None or rows >= threshold
+
+    def paginate_queryset(self, queryset: Any, request: Request, view: Any = None) -> Any:
+        """
+        Choose how the queryset is counted, then paginate it.
+        """
+        self.count_estimated = False
+        self.django_paginator_class = Paginator
+        counting = request.query_params.get(self.count_query_param, '').lower()
+        if counting in BooleanField.FALSE_VALUES:
+            self.django_paginator_class = LookaheadPaginator
+        elif self.get_page_size(request):
+            threshold = self.get_estimate_threshold()
+            estimate = (self.estimate_count(queryset)
+                        if self.should_estimate(queryset, threshold) else None)
+            if estimate is not None and estimate >= threshold:
+                self.count_estimated = True
+                self.django_paginator_class = partial(LookaheadPaginator, count=estimate)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        """
+        Return the page, marking whether its count is an estimate.
+        """
+        return Response({
+            'count': self.page.paginator.count,
+            'countEstimated': self.count_estimated,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema: Any) -> Any:
+        paginated = super().get_paginated_response_schema(schema)
+        paginated['properties']['count']['nullable'] = True
+        paginated['properties']['countEstimated'] = {'type': 'boolean', 'example': False}
+        return paginated
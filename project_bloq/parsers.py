@@ -0,0 +1,56 @@
+"""
+Fast parsers for the Bloq.it API.
+
+This module contains a JSON parser backed by orjson and a MessagePack parser, so
+bulk endpoints accept request bodies in either encoding.
+"""
+
+import codecs
+from typing import Any, IO, Mapping, Optional
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+from .renderers import MessagePackRenderer, ORJSONRenderer
+
+
+class ORJSONParser(parsers.JSONParser):
+    """
+    Parses JSON-serialized data using orjson.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream: IO[bytes], media_type: Optional[str] = None,
+              parser_context: Optional[Mapping[str, Any]] = None) -> Any:
+        """
+        Parse the incoming bytestream as JSON and return the resulting data.
+        """
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read() if stream is not None else b''
+        try:
+            if codecs.lookup(encoding).name != 'utf-8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}') from exc
+
+
+class MessagePackParser(parsers.BaseParser):
+    """
+    Parses MessagePack-serialized data.
+    """
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream: IO[bytes], media_type: Optional[str] = None,
+              parser_context: Optional[Mapping[str, Any]] = None) -> Any:
+        """
+        Parse the incoming bytestream as MessagePack and return the resulting data.
+        """
+        body = stream.read() if stream is not None else b''
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except (msgpack.UnpackException, ValueError) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}') from exc
@@ -0,0 +1,81 @@
+"""
+Fast renderers for the Bloq.it API.
+
+This module contains a JSON renderer backed by orjson, a MessagePack renderer
+used by embedded locker controllers, and a plain text renderer for metrics. The
+JSON and MessagePack renderers fall back to DRF's JSON encoder for types they
+cannot encode natively (lazy strings, decimals, datetimes, ...).
+"""
+
+from typing import Any, Mapping, Optional
+import msgpack
+import orjson
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_encode_default = JSONEncoder().default
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    Renderer which serializes to JSON using orjson.
+
+    The output matches DRF's compact JSONRenderer. Indented output (requested by
+    the browsable API or an ``indent`` media type parameter) is delegated to the
+    stdlib based renderer.
+    """
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None,
+               renderer_context: Optional[Mapping[str, Any]] = None) -> bytes:
+        """
+        Render ``data`` into JSON, returning a bytestring.
+        """
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_encode_default, option=ORJSON_OPTIONS)
+        # Keep the output a strict javascript subset, like DRF does.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renderer which serializes to MessagePack.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None,
+               renderer_context: Optional[Mapping[str, Any]] = None) -> bytes:
+        """
+        Render ``data`` into MessagePack, returning a bytestring.
+        """
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True)
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    """
+    Renderer for metrics in the Prometheus text exposition format.
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None,
+               renderer_context: Optional[Mapping[str, Any]] = None) -> bytes:
+        """
+        Encode the already formatted exposition text.
+        """
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return str(data).encode(self.charset)
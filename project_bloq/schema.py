@@ -0,0 +1,217 @@
+"""
+Precomputed OpenAPI schema for the Bloq.it API.
+
+Generating the schema introspects every view and serializer, so it is done once
+per code version instead of on every request: ``manage.py generate_schema``
+writes it to ``OPENAPI_SCHEMA_DIR`` at build time, and workers load it from
+there (or generate it on first use) into memory. Files are keyed by a
+fingerprint of the project's source code, so any code change regenerates them.
+Responses carry an ETag derived from the content.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import django
+import drf_yasg
+import rest_framework
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.test import RequestFactory
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
+from drf_yasg import openapi
+from drf_yasg.codecs import yaml_sane_dump
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.authentication import TokenAuthentication
+
+API_INFO = openapi.Info(
+    title="Bloq.it API",
+    default_version='v1',
+    description="API Documentation",
+    terms_of_service="https://www.bloqit.com/terms/",
+    contact=openapi.Contact(email="contact@bloqit.com"),
+    license=openapi.License(name="MIT License"),
+)
+
+schema_view = get_schema_view(  # pylint: disable=invalid-name
+    API_INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+    authentication_classes=[TokenAuthentication]
+)
+
+# Renders the schema outside of a real request; the placeholder URL keeps the
+# generator from reading (and validating) the request host. It is dropped below.
+_generator_view = get_schema_view(
+    API_INFO,
+    url='http://localhost',
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+    authentication_classes=[TokenAuthentication]
+).without_ui(cache_timeout=0)
+
+FORMATS = {
+    'json': 'application/json',
+    'yaml': 'application/yaml',
+}
+SKIPPED_DIRS = {'__pycache__', 'migrations', 'benchmarks', 'venv'}
+
+
+class CachedSchema:
+    """
+    An encoded schema document and its ETag.
+    """
+
+    def __init__(self, content: bytes, content_type: str) -> None:
+        self.content = content
+        self.content_type = content_type
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+_schemas: Dict[Tuple[str, str], CachedSchema] = {}
+_lock = threading.Lock()
+_fingerprint: Optional[str] = None  # pylint: disable=invalid-name
+
+
+def source_fingerprint() -> str:
+    """
+    Return a hash of the project's Python sources and schema related versions.
+
+    Computed once per process.
+    """
+    global _fingerprint  # pylint: disable=global-statement
+    if _fingerprint is None:
+        digest = hashlib.sha256()
+        for version in (django.__version__, rest_framework.__version__, drf_yasg.__version__):
+            digest.update(version.encode())
+        base_dir = Path(settings.BASE_DIR)
+        for root, dirs, files in os.walk(base_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in SKIPPED_DIRS)
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = Path(root, name)
+                    digest.update(str(path.relative_to(base_dir)).encode())
+                    digest.update(path.read_bytes())
+        _fingerprint = digest.hexdigest()[:16]
+    return _fingerprint
+
+
+def schema_dir() -> Path:
+    """
+    Return the directory holding the generated schema files.
+    """
+    return Path(getattr(settings, 'OPENAPI_SCHEMA_DIR', Path(settings.BASE_DIR, '.openapi')))
+
+
+def generate_schema(version: str) -> dict:
+    """
+    Generate the schema of an API version.
+
+    The schema is rendered by the drf_yasg schema view for a synthetic request;
+    ``host`` and ``schemes`` are dropped so clients resolve paths against the
+    host they fetched the schema from.
+    """
+    request = RequestFactory().get(f'/swagger/{version}.json')
+    response = _generator_view(request, version=version, format='.json')
+    response.render()
+    spec = json.loads(response.content)
+    spec.pop('host', None)
+    spec.pop('schemes', None)
+    return spec
+
+
+def encode(spec: dict, fmt: str) -> bytes:
+    """
+    Encode a schema as JSON or YAML.
+    """
+    if fmt == 'yaml':
+        return yaml_sane_dump(spec, binary=True)
+    return json.dumps(spec, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def write_schema(version: str) -> Dict[str, Path]:
+    """
+    Generate the schema of a version and store it in every format.
+
+    Stale files of older code versions are removed.
+
+    Returns:
+        Dict[str, Path]: The written file of each format.
+    """
+    directory = schema_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    spec = generate_schema(version)
+    fingerprint = source_fingerprint()
+    written = {}
+    for fmt in FORMATS:
+        path = directory / f'{version}-{fingerprint}.{fmt}'
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as file:
+            file.write(encode(spec, fmt))
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+        written[fmt] = path
+        for stale in directory.glob(f'{version}-*.{fmt}'):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    return written
+
+
+def get_schema(version: str, fmt: str) -> CachedSchema:
+    """
+    Return the schema of a version, from memory, from disk or freshly generated.
+    """
+    key = (version, fmt)
+    schema = _schemas.get(key)
+    if schema is not None:
+        return schema
+    with _lock:
+        if key not in _schemas:
+            path = schema_dir() / f'{version}-{source_fingerprint()}.{fmt}'
+            try:
+                content = path.read_bytes()
+            except OSError:
+                content = None
+            if content is None:
+                try:
+                    content = write_schema(version)[fmt].read_bytes()
+                except OSError:
+                    # Read-only file system: keep the schema in memory only.
+                    content = encode(generate_schema(version), fmt)
+            _schemas[key] = CachedSchema(content, FORMATS[fmt])
+        return _schemas[key]
+
+
+def clear_cache() -> None:
+    """
+    Forget the schemas held in memory.
+    """
+    with _lock:
+        _schemas.clear()
+
+
+class SchemaView(View):
+    """
+    View serving the precomputed OpenAPI schema as JSON or YAML.
+
+    - **GET**: Returns the schema with a content hash ETag; clients sending a
+      matching ``If-None-Match`` get an empty 304 response.
+    """
+
+    def get(self, request: HttpRequest, version: str, format: str) -> HttpResponse:  # pylint: disable=redefined-builtin
+        """
+        Handle GET requests to fetch the schema.
+        """
+        schema = get_schema(version, format.lstrip('.'))
+        response = get_conditional_response(request, etag=schema.etag)
+        if response is None:
+            response = HttpResponse(schema.content, content_type=schema.content_type)
+        response['ETag'] = schema.etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
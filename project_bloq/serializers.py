@@ -0,0 +1,245 @@
+"""
+Shared serializer helpers for the Bloq.it API.
+
+This module contains a ModelSerializer base that can be narrowed to a subset of
+its fields and resolves related objects on their shard, and a lean, read-only
+serializer that renders rows fetched with ``QuerySet.values()`` into the exact
+representation produced by a regular ``ModelSerializer``, without building
+model instances or running the DRF field machinery for every row.
+"""
+
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Type
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator, qs_exists
+from . import sharding
+
+Converter = Callable[[Any], Any]
+
+
+class ShardedIdRelatedField(serializers.SlugRelatedField):
+    """
+    Related field represented by the public ``id`` of the related object.
+
+    Foreign keys reference the internal integer key, which never leaves the
+    API. The related object is found on whichever shard holds it.
+    """
+    default_error_messages = serializers.PrimaryKeyRelatedField.default_error_messages
+
+    def __init__(self, **kwargs: Any) -> None:
+        kwargs.setdefault('slug_field', 'id')
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data: Any) -> Any:
+        """
+        Look the related object up by ID.
+        """
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return sharding.locate(self.get_queryset(), **{self.slug_field: str(data)})
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        return None
+
+
+class ShardedUniqueValidator(UniqueValidator):
+    """
+    ``unique=True`` validator checking every shard.
+
+    The unique index of each shard only covers its own rows, so an ID must be
+    looked up on all of them. The check is not atomic across shards: two
+    concurrent writes of the same new ID to different shards can both pass.
+    """
+
+    def __call__(self, value: Any, serializer_field: serializers.Field) -> None:
+        field_name = serializer_field.source_attrs[-1]
+        instance = getattr(serializer_field.parent, 'instance', None)
+        instance_db = getattr(getattr(instance, '_state', None), 'db', None)
+        for queryset in sharding.each_shard(self.queryset.all()):
+            queryset = self.filter_queryset(value, queryset, field_name)
+            if instance_db is None or queryset.db == instance_db:
+                queryset = self.exclude_current_instance(queryset, instance)
+            if qs_exists(queryset):
+                raise serializers.ValidationError(self.message, code='unique')
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that accepts an optional ``fields`` argument.
+
+    When ``fields`` is given, only those fields are kept, which narrows the
+    serialized output for sparse fieldset requests. IDs listed in
+    ``reserved_ids`` are rejected: they name collection routes (``export/``)
+    that share the URL prefix of the detail views. Unique fields are checked
+    on every shard.
+    """
+    serializer_related_field = ShardedIdRelatedField
+    reserved_ids: FrozenSet[str] = frozenset()
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Drop every field that is not listed in the ``fields`` keyword argument.
+        """
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def build_standard_field(self, field_name: str, model_field: Any) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Build a model field, checking its uniqueness on every shard.
+        """
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        if 'validators' in field_kwargs:
+            field_kwargs['validators'] = [
+                ShardedUniqueValidator(validator.queryset, validator.message, validator.lookup)
+                if isinstance(validator, UniqueValidator) else validator
+                for validator in field_kwargs['validators']
+            ]
+        return field_class, field_kwargs
+
+    def validate_id(self, value: Any) -> Any:
+        """
+        Reject IDs that would shadow, or be shadowed by, a collection route.
+        """
+        if value in self.reserved_ids:
+            raise serializers.ValidationError(f"'{value}' is reserved and cannot be used as an ID.")
+        return value
+
+
+def _identity(value: Any) -> Any:
+    """
+    Return the value unchanged.
+    """
+    return value
+
+
+def _source_for(field: serializers.Field) -> str:
+    """
+    Return the ``values()`` lookup a serializer field reads.
+
+    Slug related fields read the slug through the relation, e.g. ``bloqId__id``.
+    Fields derived from another column name it in a ``values_source`` attribute.
+    """
+    if getattr(field, 'values_source', None):
+        return field.values_source
+    if isinstance(field, serializers.SlugRelatedField):
+        return f'{field.source}__{field.slug_field}'
+    return field.source
+
+
+def _converter_for(field: serializers.Field) -> Converter:
+    """
+    Build the converter for a single serializer field.
+
+    Common field types are mapped to a cheap builtin that gives the same result as
+    ``field.to_representation``; everything else falls back to the field itself.
+    Fields reading another column (see ``_source_for``) convert it with their
+    ``from_values`` method.
+
+    Args:
+        field (serializers.Field): A bound serializer field.
+
+    Returns:
+        Converter: A callable turning a raw column value into its representation.
+    """
+    if getattr(field, 'values_source', None):
+        return field.from_values
+    if isinstance(field, serializers.SlugRelatedField):
+        # The related ID is selected through the relation (see _source_for).
+        return _identity
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        # values() already yields the related primary key.
+        if field.pk_field is not None:
+            return field.pk_field.to_representation
+        return _identity
+    if isinstance(field, serializers.ChoiceField):
+        lookup = field.choice_strings_to_values.get
+        return lambda value: lookup(str(value), value)
+    if isinstance(field, serializers.BooleanField):
+        return bool
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.CharField):
+        return str
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer for rows returned by ``QuerySet.values()``.
+
+    The field layout and converters are derived once from a ``ModelSerializer``
+    class, so the output is identical to ``serializer_class(instance).data``.
+    Instances are immutable and cached; use :meth:`for_serializer` to get one.
+    """
+
+    def __init__(self, serializer_class: Type[serializers.ModelSerializer],
+                 fields: Optional[Sequence[str]] = None) -> None:
+        """
+        Precompute the field converters for a serializer class.
+
+        Args:
+            serializer_class (Type[serializers.ModelSerializer]): The serializer whose
+              output should be reproduced.
+            fields (Optional[Sequence[str]]): Optional subset of field names to render.
+        """
+        declared = serializer_class().fields
+        names = list(declared) if fields is None else [name for name in declared if name in fields]
+        self.columns: List[Tuple[str, str, Converter]] = [
+            (name, _source_for(declared[name]), _converter_for(declared[name]))
+            for name in names
+        ]
+        self.sources: Tuple[str, ...] = tuple(source for _, source, _ in self.columns)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def for_serializer(cls, serializer_class: Type[serializers.ModelSerializer],
+                       fields: Optional[Tuple[str, ...]] = None) -> 'ValuesSerializer':
+        """
+        Return the cached ValuesSerializer for a serializer class and field subset.
+
+        Args:
+            serializer_class (Type[serializers.ModelSerializer]): The serializer to mirror.
+            fields (Optional[Tuple[str, ...]]): Optional subset of field names.
+
+        Returns:
+            ValuesSerializer: The shared instance.
+        """
+        return cls(serializer_class, fields)
+
+    def to_representation(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert a single ``values()`` row.
+
+        Args:
+            row (Dict[str, Any]): A row keyed by model attribute names.
+
+        Returns:
+            Dict[str, Any]: The serialized representation.
+        """
+        data: Dict[str, Any] = {}
+        for name, source, convert in self.columns:
+            value = row[source]
+            data[name] = None if value is None else convert(value)
+        return data
+
+    def serialize(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Convert many ``values()`` rows.
+
+        Args:
+            rows (Iterable[Dict[str, Any]]): Rows keyed by model attribute names.
+
+        Returns:
+            List[Dict[str, Any]]: The serialized representations.
+        """
+        convert = self.to_representation
+        return [convert(row) for row in rows]
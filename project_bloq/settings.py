@@ -29,6 +29,11 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# 'full' serves everything; 'api' is meant for workers that only serve the REST
+# API: the admin is registered on first use and the browsable API is disabled.
+# The docs, auth and admin URLconfs are imported on first use in both profiles.
+DEPLOYMENT_PROFILE = os.environ.get('DEPLOYMENT_PROFILE', 'full')
+
 
 # Application definition
 
@@ -36,6 +41,10 @@ INSTALLED_APPS = [
     'bloq',
     'rent',
     'locker',
+    'changes',
+    'analytics',
+    'jobs',
+    'project_bloq',
     'djoser',
     'drf_yasg',
     'rest_framework',
@@ -49,14 +58,22 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 ]
 
+if DEPLOYMENT_PROFILE == 'api':
+    # Skip the admin autodiscovery at startup; project_bloq.admin_urls runs it.
+    INSTALLED_APPS[INSTALLED_APPS.index('django.contrib.admin')] = (
+        'django.contrib.admin.apps.SimpleAdminConfig'
+    )
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'project_bloq.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'project_bloq.middleware.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'project_bloq.urls'
@@ -94,6 +111,48 @@ DATABASES = {
     }
 }
 
+# Horizontal sharding of the fleet by Bloq (see project_bloq.sharding). Each host
+# in DATABASE_SHARD_HOSTS adds a shard using the credentials of the default
+# database, which always holds the first shard and every non-sharded table.
+for index, shard_host in enumerate(
+        filter(None, os.environ.get('DATABASE_SHARD_HOSTS', '').split(',')), start=1):
+    DATABASES[f'shard{index}'] = {**DATABASES['default'], 'HOST': shard_host.strip()}
+
+DATABASE_SHARDS = list(DATABASES)
+
+DATABASE_ROUTERS = ['project_bloq.sharding.ShardRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Token buckets of the rate limits, shared by all workers through Redis. For
+# development without Redis, THROTTLE_STORE_BACKEND=
+# project_bloq.throttling.CacheBucketStore keeps them in the local memory cache.
+THROTTLE_STORE = {
+    'BACKEND': os.environ.get('THROTTLE_STORE_BACKEND', 'project_bloq.throttling.RedisBucketStore'),
+    'OPTIONS': {
+        'URL': os.environ.get('THROTTLE_REDIS_URL', 'redis://localhost:6379/0'),
+    },
+}
+
+# Idempotency keys and the responses they replay, shared by all workers through
+# the Redis server of the rate limits. For development without Redis,
+# IDEMPOTENCY_STORE_BACKEND=project_bloq.idempotency.CacheIdempotencyStore
+# keeps them in the local memory cache.
+IDEMPOTENCY_STORE = {
+    'BACKEND': os.environ.get('IDEMPOTENCY_STORE_BACKEND',
+                              'project_bloq.idempotency.RedisIdempotencyStore'),
+    'OPTIONS': {
+        'URL': os.environ.get('THROTTLE_REDIS_URL', 'redis://localhost:6379/0'),
+    },
+}
+
+# Empties the throttle buckets and idempotency keys before every test.
+TEST_RUNNER = 'project_bloq.testing.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -120,10 +179,72 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated', 
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'project_bloq.renderers.ORJSONRenderer',
+        'project_bloq.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'project_bloq.parsers.ORJSONParser',
+        'project_bloq.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'TEST_REQUEST_RENDERER_CLASSES': [
+        'rest_framework.renderers.MultiPartRenderer',
+        'rest_framework.renderers.JSONRenderer',
+        'project_bloq.renderers.MessagePackRenderer',
+    ],
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.URLPathVersioning',
     'DEFAULT_VERSION': 'v1',
     'ALLOWED_VERSIONS': ['v1', 'v2'],  
     'VERSION_PARAM': 'version',
+    # Token buckets per user and scope (see project_bloq.throttling)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'project_bloq.throttling.ClientRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': os.environ.get('THROTTLE_RATE_READ', '600/min'),
+        'bulk_write': os.environ.get('THROTTLE_RATE_BULK_WRITE', '60/min'),
+        'transition': os.environ.get('THROTTLE_RATE_TRANSITION', '300/min'),
+    },
+}
+
+if DEPLOYMENT_PROFILE == 'api':
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].remove(
+        'rest_framework.renderers.BrowsableAPIRenderer'
+    )
+
+# Response compression (see project_bloq.middleware.CompressionMiddleware)
+API_COMPRESSION = {
+    'MIN_SIZE': int(os.environ.get('API_COMPRESSION_MIN_SIZE', '1024')),
+    'ALGORITHMS': ['br', 'gzip'],
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+}
+
+# Replays of requests retried with an Idempotency-Key (see
+# project_bloq.middleware.IdempotencyMiddleware)
+IDEMPOTENCY = {
+    'TTL': int(os.environ.get('IDEMPOTENCY_TTL', str(24 * 60 * 60))),
+    'LOCK_TIMEOUT': 60,
+}
+
+# Background jobs run by ``manage.py run_jobs`` workers (see jobs.queue)
+JOBS = {
+    'LEASE': int(os.environ.get('JOBS_LEASE', '300')),
+    'HEARTBEAT': 60,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    'POLL_INTERVAL': 1.0,
+}
+
+# Delivery of real-time locker events (SSE). The in-process backend only reaches
+# clients connected to the publishing worker; use Postgres LISTEN/NOTIFY when
+# running several workers.
+EVENT_BROKER = {
+    'BACKEND': os.environ.get('EVENT_BROKER_BACKEND', 'project_bloq.events.InProcessBackend'),
+    'OPTIONS': {},
 }
 
 LOGGING = {
@@ -198,6 +319,8 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SWAGGER_SETTINGS = {
+    # The UI pages load the precomputed schema instead of generating it inline.
+    'SPEC_URL': ('schema-json-v1', {'format': '.json'}),
     'SECURITY_DEFINITIONS': {
         'Token': {
             'type': 'apiKey',
@@ -210,3 +333,10 @@ SWAGGER_SETTINGS = {
         },
     },
 }
+
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json-v1', {'format': '.json'}),
+}
+
+# Where the precomputed OpenAPI schema is stored (see `manage.py generate_schema`).
+OPENAPI_SCHEMA_DIR = os.environ.get('OPENAPI_SCHEMA_DIR', os.path.join(BASE_DIR, '.openapi'))
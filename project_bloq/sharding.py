@@ -0,0 +1,335 @@
+"""
+Horizontal sharding of the fleet by Bloq.
+
+Every Locker and Rent belongs to exactly one Bloq, so a Bloq and everything
+below it (its Lockers, their Rents and rent events, and the change counter
+stamping them) live together on one database, picked by the shard map from the
+Bloq ID. Everything else (users, tokens, analytics, caches) stays on
+``default``, which is also the first shard.
+
+- Per-Bloq reads and writes go straight to the Bloq's shard (``for_bloq``).
+- Objects addressed by their own ID only (a Locker or Rent) are looked up on
+  each shard in turn (``locate``); writes then follow the instance's database.
+- Fleet-wide lists query every shard and merge the rows in order (``fan_out``).
+
+With a single database (the default) all of this reduces to the plain queries.
+"""
+# pylint: disable=protected-access
+
+import heapq
+import threading
+import zlib
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Model, QuerySet
+
+SHARDED_APPS = {'bloq', 'locker', 'rent', 'changes'}
+
+# Lookup path from each sharded model to the ID of its Bloq.
+SHARD_KEYS = {
+    'bloq.bloq': 'id',
+    'locker.locker': 'bloqId__id',
+    'rent.rent': 'lockerId__bloqId__id',
+    'rent.rentevent': 'bloqId',
+    'rent.archivedrent': 'bloqId',
+}
+
+
+class ShardMap:
+    """
+    Placement of Bloqs on database aliases.
+
+    A Bloq is placed by the CRC32 of its ID modulo the number of shards, so the
+    map needs no storage and is the same in every worker. Changing the number of
+    shards moves Bloqs, whose rows must be copied before the new map is deployed.
+    """
+
+    def __init__(self, aliases: Sequence[str]) -> None:
+        if not aliases:
+            raise ImproperlyConfigured('DATABASE_SHARDS must list at least one database.')
+        self.aliases: Tuple[str, ...] = tuple(aliases)
+
+    def __len__(self) -> int:
+        return len(self.aliases)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.aliases)
+
+    def __contains__(self, alias: object) -> bool:
+        return alias in self.aliases
+
+    def shard_for_bloq(self, bloq_id: Any) -> str:
+        """
+        Return the database alias holding a Bloq and its Lockers and Rents.
+        """
+        if len(self.aliases) == 1:
+            return self.aliases[0]
+        return self.aliases[zlib.crc32(str(bloq_id).encode()) % len(self.aliases)]
+
+
+_shard_map: Optional[ShardMap] = None  # pylint: disable=invalid-name
+_shard_map_lock = threading.Lock()
+
+
+def get_shard_map() -> ShardMap:
+    """
+    Return the process wide shard map configured by the ``DATABASE_SHARDS`` setting.
+    """
+    global _shard_map  # pylint: disable=global-statement
+    with _shard_map_lock:
+        if _shard_map is None:
+            _shard_map = ShardMap(getattr(settings, 'DATABASE_SHARDS', ['default']))
+        return _shard_map
+
+
+def _reset_shard_map(setting: str, **kwargs: Any) -> None:
+    """
+    Forget the shard map when the setting changes (in tests).
+    """
+    global _shard_map  # pylint: disable=global-statement
+    if setting == 'DATABASE_SHARDS':
+        _shard_map = None
+
+
+setting_changed.connect(_reset_shard_map)
+
+
+def is_sharded(model: Type[Model]) -> bool:
+    """
+    Check whether the rows of a model are spread over the shards.
+    """
+    return model._meta.app_label in SHARDED_APPS
+
+
+def shard_for_bloq(bloq_id: Any) -> str:
+    """
+    Return the database alias holding a Bloq.
+    """
+    return get_shard_map().shard_for_bloq(bloq_id)
+
+
+def for_bloq(queryset: QuerySet, bloq_id: Any) -> QuerySet:
+    """
+    Route a queryset over the rows of one Bloq to that Bloq's shard.
+    """
+    return queryset.using(shard_for_bloq(bloq_id))
+
+
+def each_shard(queryset: QuerySet) -> List[QuerySet]:
+    """
+    Return the queryset bound to every shard, for writes and unordered reads.
+    """
+    shard_map = get_shard_map()
+    if len(shard_map) == 1 or not is_sharded(queryset.model):
+        return [queryset]
+    return [queryset.using(alias) for alias in shard_map]
+
+
+def instance_shard(instance: Model) -> Optional[str]:
+    """
+    Return the database of an instance of a sharded model.
+
+    Unsaved instances are placed by their Bloq ID, following cached relations
+    (a Rent's Locker) when the ID is not stored on the instance itself.
+    """
+    if instance._state.db:
+        return instance._state.db
+    path = SHARD_KEYS.get(instance._meta.label_lower)
+    if path is None:
+        return None
+    *relations, name = path.split('__')
+    for relation in relations:
+        field = instance._meta.get_field(relation)
+        if not field.is_cached(instance):
+            return None
+        instance = field.get_cached_value(instance)
+        if instance is None:
+            return None
+        if instance._state.db:
+            return instance._state.db
+    bloq_id = getattr(instance, instance._meta.get_field(name).attname)
+    return None if bloq_id is None else shard_for_bloq(bloq_id)
+
+
+def _lookup_bloq_id(model: Type[Model], lookup: Dict[str, Any]) -> Optional[Any]:
+    """
+    Return the Bloq ID a lookup pins down, if any.
+    """
+    path = SHARD_KEYS.get(model._meta.label_lower)
+    if path is None:
+        return None
+    return lookup.get(path)
+
+
+def locate(queryset: QuerySet, **lookup: Any) -> Model:
+    """
+    Get one object of a sharded model from whichever shard holds it.
+
+    Lookups naming the Bloq (e.g. a Bloq by ID) go straight to its
+    shard; others try each shard in turn.
+
+    Raises:
+        ObjectDoesNotExist: The model's ``DoesNotExist`` if no shard has the object.
+    """
+    shard_map = get_shard_map()
+    if len(shard_map) == 1 or not is_sharded(queryset.model):
+        return queryset.get(**lookup)
+    bloq_id = _lookup_bloq_id(queryset.model, lookup)
+    if bloq_id is not None:
+        return for_bloq(queryset, bloq_id).get(**lookup)
+    for alias in shard_map:
+        try:
+            return queryset.using(alias).get(**lookup)
+        except queryset.model.DoesNotExist:
+            continue
+    raise queryset.model.DoesNotExist(
+        f'{queryset.model._meta.object_name} matching query does not exist.'
+    )
+
+
+class _Descending:
+    """
+    Sort key wrapper inverting the order of a value.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __lt__(self, other: '_Descending') -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.value == other.value
+
+    def __hash__(self) -> int:
+        return hash(self.value)
+
+
+class FanOutQuerySet:
+    """
+    Read-only union of the same ``values()`` query on several shards.
+
+    Rows are merged in the queries' common ordering. Implements what the
+    paginator and the export views use: ``count()``, slicing and iteration. A
+    slice ``[start:stop]`` reads ``stop`` rows from every shard.
+    """
+    ordered = True
+
+    def __init__(self, querysets: Sequence[QuerySet]) -> None:
+        self.querysets = list(querysets)
+        first = self.querysets[0]
+        self.ordering: List[Tuple[str, bool]] = [
+            (name.lstrip('-'), name.startswith('-'))
+            for name in (first.query.order_by or first.model._meta.ordering)
+        ]
+
+    def sort_key(self, row: Union[Dict[str, Any], Model]) -> Tuple[Any, ...]:
+        """
+        Return the merge key of a row.
+        """
+        key = []
+        for name, descending in self.ordering:
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            key.append(_Descending(value) if descending else value)
+        return tuple(key)
+
+    def merge(self, parts: Sequence[Any]) -> Iterator[Any]:
+        """
+        Merge per shard iterables that are each in order.
+        """
+        return heapq.merge(*parts, key=self.sort_key)
+
+    def count(self) -> int:
+        """
+        Return the number of rows on all shards.
+        """
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, key: Union[int, slice]) -> Any:
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if key.step is not None:
+            raise ValueError('Fan-out queries do not support slice steps.')
+        parts = [queryset if stop is None else queryset[:stop] for queryset in self.querysets]
+        return list(islice(self.merge(parts), start, stop))
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.iterator()
+
+    def iterator(self, chunk_size: int = 2000) -> Iterator[Any]:
+        """
+        Stream the merged rows with a server-side cursor per shard.
+        """
+        return self.merge([queryset.iterator(chunk_size=chunk_size) for queryset in self.querysets])
+
+
+def fan_out(queryset: QuerySet, *fields: str) -> Union[QuerySet, FanOutQuerySet]:
+    """
+    Return ``queryset.values(*fields)`` read from every shard, merged in order.
+
+    Columns the queryset is ordered by are selected as well, so the rows can be
+    merged; with a single shard the plain ``values()`` queryset is returned.
+    """
+    shards = each_shard(queryset)
+    if len(shards) == 1:
+        return queryset.values(*fields)
+    if fields:
+        ordering = [name.lstrip('-') for name in queryset.query.order_by]
+        fields += tuple(name for name in ordering if name not in fields)
+    return FanOutQuerySet([shard.values(*fields) for shard in shards])
+
+
+@contextmanager
+def atomic() -> Iterator[None]:
+    """
+    Run a block inside a transaction on every shard.
+
+    This is not a distributed transaction: an error rolls every shard back, but
+    a failure while committing can leave some shards committed.
+    """
+    with ExitStack() as stack:
+        for alias in get_shard_map():
+            stack.enter_context(transaction.atomic(using=alias))
+        yield
+
+
+class ShardRouter:
+    """
+    Database router keeping the rows of each Bloq on its shard.
+
+    Instances of the sharded apps are read and written on the database they
+    were loaded from, or, when unsaved, on their Bloq's shard. Queries without
+    an instance use ``default`` unless routed with ``for_bloq``, ``locate`` or
+    ``fan_out``. Tables of the sharded apps exist on every shard, all others
+    only on ``default``.
+    """
+
+    def db_for_read(self, model: Type[Model], **hints: Any) -> Optional[str]:
+        """
+        Route reads of related objects to the database of the instance.
+        """
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(model):
+            return instance_shard(instance)
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None,
+                      **hints: Any) -> bool:
+        """
+        Create the sharded tables on every shard and the others on ``default``.
+        """
+        if app_label in SHARDED_APPS:
+            return db in get_shard_map()
+        return db == 'default'
@@ -0,0 +1,196 @@
+"""
+Server-Sent Events endpoint for per-Bloq locker state changes.
+
+Django 3.2 cannot stream responses asynchronously, so the event stream is served
+by a small ASGI application mounted in front of Django in ``asgi.py``:
+
+    GET /api/<version>/bloq/<id>/events/
+
+Clients authenticate with the usual ``Authorization: Token <key>`` header, or
+with a ``?token=<key>`` query parameter for browser ``EventSource`` clients.
+Each locker change in the Bloq is pushed as an SSE message; a comment line is
+sent periodically to keep idle connections open.
+"""
+
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qs, unquote
+from asgiref.sync import sync_to_async
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from . import sharding
+from .events import bloq_channel, get_broker
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+EVENT_STREAM_PATH = re.compile(r'^/api/(?P<version>[^/]+)/bloq/(?P<bloq_id>[^/]+)/events/$')
+HEARTBEAT_SECONDS = 15
+QUEUE_SIZE = 256
+
+
+def _authenticate(token_key: Optional[str]) -> Optional[Any]:
+    """
+    Return the active user owning the token, if any.
+    """
+    if not token_key:
+        return None
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(token_key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+def _bloq_exists(bloq_id: str) -> bool:
+    """
+    Check that the Bloq exists.
+    """
+    from bloq.models import Bloq  # pylint: disable=import-outside-toplevel
+    return sharding.for_bloq(Bloq.objects.filter(id=bloq_id), bloq_id).exists()
+
+
+def _token_from_scope(scope: Scope) -> Optional[str]:
+    """
+    Read the token from the Authorization header or the query string.
+    """
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            scheme, _, key = value.decode('latin1').partition(' ')
+            if scheme.lower() == 'token':
+                return key.strip()
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    return query.get('token', [None])[0]
+
+
+async def _send_json(send: Send, status: int, detail: str) -> None:
+    """
+    Send a small JSON error response.
+    """
+    body = json.dumps({'detail': detail}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def format_event(payload: str) -> bytes:
+    """
+    Format a broker payload as an SSE message.
+    """
+    event = json.loads(payload)
+    lines = [f"event: {event.get('type', 'message')}"]
+    if event.get('seq') is not None:
+        lines.append(f"id: {event['seq']}")
+    lines.append(f'data: {payload}')
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class EventStreamApp:
+    """
+    ASGI application serving Bloq event streams and delegating everything else.
+    """
+
+    def __init__(self, application: Callable[[Scope, Receive, Send], Awaitable[None]]) -> None:
+        self.application = application
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        match = EVENT_STREAM_PATH.match(scope.get('path', '')) if scope['type'] == 'http' else None
+        if match is None:
+            await self.application(scope, receive, send)
+            return
+        await self.stream(scope, receive, send, unquote(match['bloq_id']))
+
+    async def stream(self, scope: Scope, receive: Receive, send: Send, bloq_id: str) -> None:
+        """
+        Authenticate the client and push the Bloq's events until it disconnects.
+        """
+        if scope.get('method') != 'GET':
+            await _send_json(send, 405, 'Method not allowed.')
+            return
+        user = await sync_to_async(_authenticate)(_token_from_scope(scope))
+        if user is None:
+            await _send_json(send, 401, 'Authentication credentials were not provided.')
+            return
+        if not await sync_to_async(_bloq_exists)(bloq_id):
+            await _send_json(send, 404, 'Bloq not found.')
+            return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        overflowed = asyncio.Event()
+
+        def enqueue(payload: str) -> None:
+            if overflowed.is_set():
+                return
+            if queue.full():
+                # Slow consumer: drop the connection rather than events, the
+                # client reconnects and reloads the current state.
+                overflowed.set()
+            else:
+                queue.put_nowait(payload)
+
+        subscription = get_broker().subscribe(
+            bloq_channel(bloq_id), lambda payload: loop.call_soon_threadsafe(enqueue, payload)
+        )
+        logger.info("User '%s' subscribed to events of Bloq ID '%s'.", user.id, bloq_id)
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        overflow = asyncio.ensure_future(overflowed.wait())
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b': connected\n\n',
+                        'more_body': True})
+            while not disconnected.done():
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, disconnected, overflow}, timeout=HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if overflowed.is_set():
+                    getter.cancel()
+                    logger.warning(
+                        "Dropping events stream of Bloq ID '%s' for user '%s': more than %d "
+                        "events behind.", bloq_id, user.id, QUEUE_SIZE
+                    )
+                    break
+                if getter not in done:
+                    getter.cancel()
+                    if not disconnected.done():
+                        await send({'type': 'http.response.body', 'body': b': ping\n\n',
+                                    'more_body': True})
+                    continue
+                payload = getter.result()
+                await send({'type': 'http.response.body', 'body': format_event(payload),
+                            'more_body': True})
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            subscription.close()
+            disconnected.cancel()
+            overflow.cancel()
+            logger.info("User '%s' unsubscribed from events of Bloq ID '%s'.", user.id, bloq_id)
+
+    @staticmethod
+    async def _wait_for_disconnect(receive: Receive) -> None:
+        """
+        Consume request messages until the client disconnects.
+        """
+        while (await receive())['type'] != 'http.disconnect':
+            pass
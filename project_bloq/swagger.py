@@ -0,0 +1,26 @@
+"""
+Shared OpenAPI parameter definitions for the Bloq.it API documentation.
+"""
+
+from drf_yasg import openapi
+
+FIELDS_PARAMETER = openapi.Parameter(
+    'fields',
+    openapi.IN_QUERY,
+    description="Comma separated list of fields to return (e.g. 'id,status,isOccupied')",
+    type=openapi.TYPE_STRING
+)
+
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    'Idempotency-Key',
+    openapi.IN_HEADER,
+    description="Unique key of the request; retries with the same key get the stored response",
+    type=openapi.TYPE_STRING
+)
+
+ASYNC_PARAMETER = openapi.Parameter(
+    'async',
+    openapi.IN_QUERY,
+    description="Run the request as a background job and return 202 with the job to poll",
+    type=openapi.TYPE_BOOLEAN
+)
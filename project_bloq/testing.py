@@ -0,0 +1,41 @@
+"""
+Test runner of the Bloq.it API.
+
+Database rows written by a test are rolled back after it, but the throttle
+buckets and idempotency keys live outside the database; the runner empties them
+before every test so the rate limits and replays of one test never spill into
+the next.
+"""
+
+import unittest
+from typing import Any, Type
+from django.test.runner import DiscoverRunner
+from .idempotency import get_idempotency_store
+from .throttling import get_bucket_store
+
+
+class BucketResetMixin:
+    """
+    Test result mixin emptying the throttle buckets and idempotency keys before each test.
+    """
+
+    def startTest(self, test: Any) -> None:  # pylint: disable=invalid-name
+        """
+        Empty the buckets and keys, then start the test.
+        """
+        get_bucket_store().clear()
+        get_idempotency_store().clear()
+        super().startTest(test)  # type: ignore[misc]
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Discover runner starting every test with empty throttle buckets and idempotency keys.
+    """
+
+    def get_resultclass(self) -> Type[unittest.TestResult]:
+        """
+        Return the result class of the base runner with the bucket reset mixed in.
+        """
+        base = super().get_resultclass() or unittest.TextTestResult
+        return type('BucketResetResult', (BucketResetMixin, base), {})
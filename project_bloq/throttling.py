@@ -0,0 +1,252 @@
+"""
+Per-client request throttling for the Bloq.it API.
+
+Each client (user, or IP address for anonymous requests) gets a token bucket
+per throttle scope, implemented with the generic cell rate algorithm: the only
+state kept is the time at which the bucket will be full again, stored in the
+bucket store of the ``THROTTLE_STORE`` setting so the limits hold across all
+workers.
+
+Stores:
+
+- ``RedisBucketStore`` (default): updates a bucket atomically in one round trip
+  with a Lua script timed by the Redis server clock.
+- ``CacheBucketStore``: a Django cache, for development and tests without
+  Redis. Concurrent requests of one client may all be let through.
+
+Scopes:
+
+- ``read``: every GET, HEAD and OPTIONS request.
+- ``bulk_write`` / ``transition``: unsafe requests to views whose
+  ``throttle_scope`` attribute names them.
+
+Rates come from ``DEFAULT_THROTTLE_RATES`` (e.g. ``'600/min'``: a bucket of 600
+requests refilled at 600 per minute). Scopes without a rate are not throttled.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Any, Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from .metrics import Counter
+
+READ_SCOPE = 'read'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+logger = logging.getLogger(__name__)
+
+throttled_requests = Counter(
+    'api_throttled_requests_total', 'Requests rejected by the rate limits.', ('scope', 'client')
+)
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """
+    Parse a rate like ``'100/min'`` into (requests, period in seconds).
+
+    Raises:
+        ImproperlyConfigured: If the rate is malformed.
+    """
+    try:
+        num, period = rate.split('/')
+        return int(num), PERIODS[period[0]]
+    except (KeyError, IndexError, ValueError) as exc:
+        raise ImproperlyConfigured(f"Invalid throttle rate '{rate}'.") from exc
+
+
+# Takes a token from a bucket: KEYS[1] is the bucket, ARGV the emission
+# interval and the period in microseconds. Returns -1 if the request is
+# allowed, else the microseconds to wait.
+GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local full_at = math.max(tonumber(redis.call('GET', KEYS[1]) or 0), now) + interval
+if full_at - now > period then
+    return full_at - now - period
+end
+local ttl = math.ceil((full_at - now) / 1000) + 1000
+redis.call('SET', KEYS[1], string.format('%.0f', full_at), 'PX', ttl)
+return -1
+"""
+
+
+class RedisBucketStore:
+    """
+    Token buckets kept in Redis.
+
+    Options:
+        URL: The Redis server (``redis://localhost:6379/0``).
+        KEY_PREFIX: Prefix of the bucket keys (``throttle:``).
+        TIMEOUT: Socket timeout in seconds (``0.5``).
+    """
+
+    def __init__(self, **options: Any) -> None:
+        import redis  # pylint: disable=import-outside-toplevel
+
+        self.error = redis.RedisError
+        self.prefix = options.get('KEY_PREFIX', 'throttle:')
+        timeout = options.get('TIMEOUT', 0.5)
+        self.client = redis.Redis.from_url(
+            options.get('URL', 'redis://localhost:6379/0'),
+            socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        self.script = self.client.register_script(GCRA_SCRIPT)
+
+    def take(self, key: str, interval: float, period: float) -> float:
+        """
+        Take a token from a bucket.
+
+        The request is let through when Redis cannot be reached, so an outage
+        of the store does not take the API down with it.
+
+        Returns:
+            float: 0 if the request is allowed, else the seconds to wait.
+        """
+        try:
+            wait = self.script(
+                keys=[self.prefix + key], args=[round(interval * 1e6), round(period * 1e6)]
+            )
+        except self.error:
+            logger.warning("Throttle store unavailable, allowing the request.", exc_info=True)
+            return 0.0
+        return 0.0 if wait < 0 else wait / 1e6
+
+    def clear(self) -> None:
+        """
+        Empty every bucket.
+        """
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class CacheBucketStore:
+    """
+    Token buckets kept in a Django cache.
+
+    The read and the write of a bucket are separate cache calls, so concurrent
+    requests of one client can all take the same token.
+
+    Options:
+        CACHE: The cache alias (``default``).
+    """
+
+    def __init__(self, **options: Any) -> None:
+        self.cache = caches[options.get('CACHE', 'default')]
+
+    def take(self, key: str, interval: float, period: float) -> float:
+        """
+        Take a token from a bucket.
+
+        Returns:
+            float: 0 if the request is allowed, else the seconds to wait.
+        """
+        now = time.time()
+        # The bucket is full again at ``full_at``; a request is allowed while
+        # that moment is less than one period away after taking its token.
+        full_at = max(self.cache.get(key, now), now) + interval
+        if full_at - now > period:
+            return full_at - now - period
+        self.cache.set(key, full_at, math.ceil(full_at - now) + 1)
+        return 0.0
+
+    def clear(self) -> None:
+        """
+        Empty every bucket.
+        """
+        self.cache.clear()
+
+
+_store: Any = None  # pylint: disable=invalid-name
+_store_lock = threading.Lock()
+
+
+def get_bucket_store() -> Any:
+    """
+    Return the process wide bucket store configured by ``THROTTLE_STORE``.
+    """
+    global _store  # pylint: disable=global-statement
+    with _store_lock:
+        if _store is None:
+            config = getattr(settings, 'THROTTLE_STORE', {})
+            backend = config.get('BACKEND', 'project_bloq.throttling.CacheBucketStore')
+            _store = import_string(backend)(**(config.get('OPTIONS') or {}))
+        return _store
+
+
+def _reset_store(setting: str, **kwargs: Any) -> None:
+    """
+    Drop the bucket store when ``THROTTLE_STORE`` is overridden.
+    """
+    global _store  # pylint: disable=global-statement
+    if setting == 'THROTTLE_STORE':
+        with _store_lock:
+            _store = None
+
+
+setting_changed.connect(_reset_store)
+
+
+class ClientRateThrottle(BaseThrottle):
+    """
+    Token bucket throttle keyed by the authenticated user or client IP.
+    """
+
+    def __init__(self) -> None:
+        self.wait_seconds = 0.0
+
+    @staticmethod
+    def get_scope(request: Request, view: Any) -> Optional[str]:
+        """
+        Return the throttle scope of a request.
+        """
+        if request.method in SAFE_METHODS:
+            return READ_SCOPE
+        return getattr(view, 'throttle_scope', None)
+
+    def get_client(self, request: Request) -> str:
+        """
+        Return the identity the buckets are keyed by.
+        """
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request: Request, view: Any) -> bool:
+        """
+        Take a token from the client's bucket for the request's scope.
+        """
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+        num_requests, period = parse_rate(rate)
+        interval = period / num_requests
+
+        client = self.get_client(request)
+        self.wait_seconds = get_bucket_store().take(f'{scope}:{client}', interval, period)
+        if self.wait_seconds:
+            throttled_requests.inc(
+                scope=scope, client=client if client.startswith('user:') else 'anonymous'
+            )
+            return False
+        return True
+
+    def wait(self) -> float:
+        """
+        Return the seconds until the next request will be allowed.
+        """
+        return self.wait_seconds
@@ -13,42 +13,28 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include, re_path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Bloq.it API",
-      default_version='v1',
-      description="API Documentation",
-      terms_of_service="https://www.bloqit.com/terms/",
-      contact=openapi.Contact(email="contact@bloqit.com"),
-      license=openapi.License(name="MIT License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-   authentication_classes=[TokenAuthentication]
-)
-
+from django.urls import path, include
+from .lazyurls import lazy_include
+from .views import MetricsView
 
+# The docs, admin and auth URLconfs are imported on first use (see project_bloq/lazyurls.py),
+# so workers serving only the API never load drf_yasg's generators, the admin or djoser's views.
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('admin/', lazy_include('project_bloq.admin_urls', app_name='admin')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('api/<str:version>/', include([
         path('bloq/', include('bloq.urls')),
         path('locker/', include('locker.urls')),
         path('rent/', include('rent.urls')),
+        path('changes/', include('changes.urls')),
+        path('analytics/', include('analytics.urls')),
+        path('jobs/', include('jobs.urls')),
 
-        path('auth/', include('djoser.urls')),  
-        path('auth/', include('djoser.urls.authtoken')),
+        path('auth/', lazy_include('djoser.urls')),
+        path('auth/', lazy_include('djoser.urls.authtoken')),
     ])),  
 
     # Rotas do Swagger
-    re_path(r'^swagger/v1(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), {'version': 'v1'}, name='schema-json-v1'),
-    path('swagger/v1/', schema_view.with_ui('swagger', cache_timeout=0), {'version': 'v1'}, name='schema-swagger-ui-v1'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('swagger/', lazy_include('project_bloq.docs_urls', 'swagger_urlpatterns')),
+    path('redoc/', lazy_include('project_bloq.docs_urls', 'redoc_urlpatterns')),
 ]
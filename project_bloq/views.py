@@ -0,0 +1,27 @@
+"""
+Project level views for the Bloq.it API.
+"""
+
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .metrics import render_prometheus
+from .renderers import PrometheusRenderer
+
+
+class MetricsView(APIView):
+    """
+    API view exposing the in-process metrics of this worker.
+
+    - **GET**: Returns every counter in the Prometheus text exposition format.
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+    swagger_schema = None
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        """
+        Handle GET requests to scrape the metrics.
+        """
+        return Response(render_prometheus())
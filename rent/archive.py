@@ -0,0 +1,104 @@
+"""
+Archiving of delivered Rents.
+
+DELIVERED is the last status of a Rent, so finished Rents are moved from the
+live ``Rent`` table to ``ArchivedRent`` in small batches. Each batch copies and
+deletes its rows in one short transaction, locking only those rows and
+skipping any that another transaction holds, so transitions and bulk creates
+are never blocked for long.
+
+A delivered Rent whose ID is already archived (the ID was reused after an
+earlier Rent was archived) is left in the live table rather than overwriting
+or dropping either copy; ``count_conflicts`` reports them.
+"""
+
+from typing import Optional
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+from project_bloq import sharding
+from .models import ArchivedRent, Rent, RentStatus
+
+COLUMNS = (
+    'pk', 'id', 'lockerId__id', 'lockerId__bloqId__id', 'weight', 'size', 'status', 'changeSeq'
+)
+
+
+def archivable(using: str) -> QuerySet:
+    """
+    Return the delivered Rents of one database whose ID is not archived yet.
+    """
+    archived = ArchivedRent.objects.using(using).filter(id=OuterRef('id'))
+    return (Rent.objects.using(using)
+            .filter(status=RentStatus.DELIVERED)
+            .filter(~Exists(archived)))
+
+
+def archive_batch(using: str, batch_size: int) -> int:
+    """
+    Move up to ``batch_size`` delivered Rents of one database to the archive.
+
+    Returns:
+        int: The number of Rents moved.
+    """
+    with transaction.atomic(using=using):
+        rows = list(
+            archivable(using)
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('id')
+            .values(*COLUMNS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        now = timezone.now()
+        ArchivedRent.objects.using(using).bulk_create([
+            ArchivedRent(
+                id=row['id'],
+                lockerId=row['lockerId__id'],
+                bloqId=row['lockerId__bloqId__id'],
+                weight=row['weight'],
+                size=row['size'],
+                status=row['status'],
+                changeSeq=row['changeSeq'],
+                archivedAt=now,
+            )
+            for row in rows
+        ])
+        Rent.objects.using(using).filter(
+            pk__in=[row['pk'] for row in rows], status=RentStatus.DELIVERED
+        ).delete()
+    return len(rows)
+
+
+def archive_delivered(batch_size: int = 1000, limit: Optional[int] = None) -> int:
+    """
+    Move delivered Rents to the archive, batch by batch, on every shard.
+
+    Args:
+        batch_size (int): The number of Rents moved per transaction.
+        limit (Optional[int]): Stop after moving about this many Rents per shard.
+
+    Returns:
+        int: The number of Rents moved.
+    """
+    moved = 0
+    for alias in sharding.get_shard_map():
+        moved_here = 0
+        while limit is None or moved_here < limit:
+            count = archive_batch(alias, batch_size)
+            moved_here += count
+            if count < batch_size:
+                break
+        moved += moved_here
+    return moved
+
+
+def count_conflicts() -> int:
+    """
+    Count the delivered Rents, on every shard, whose ID is already archived.
+    """
+    return sum(
+        Rent.objects.using(alias).filter(status=RentStatus.DELIVERED).count()
+        - archivable(alias).count()
+        for alias in sharding.get_shard_map()
+    )
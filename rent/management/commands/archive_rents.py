@@ -0,0 +1,37 @@
+"""
+Management command moving delivered Rents to the archive table.
+
+Run it regularly (e.g. hourly from cron):
+
+    python manage.py archive_rents --batch-size 1000
+"""
+
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from rent.archive import archive_delivered, count_conflicts
+
+
+class Command(BaseCommand):
+    """
+    Move DELIVERED Rents from the live table to ArchivedRent in batches.
+    """
+    help = 'Move delivered Rents from the live Rent table to the archive in small batches.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of Rents moved per transaction.',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Stop after moving about this many Rents per database.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        moved = archive_delivered(batch_size=options['batch_size'], limit=options['limit'])
+        self.stdout.write(f'Archived {moved} rents.')
+        conflicts = count_conflicts()
+        if conflicts:
+            self.stderr.write(
+                f'Kept {conflicts} delivered rents whose ID is already archived.'
+            )
@@ -0,0 +1,78 @@
+"""
+Management command maintaining the monthly partitions of the RentEvent log.
+
+Run it daily (e.g. from cron):
+
+    python manage.py rent_event_partitions --ahead 3 --retain 12
+"""
+
+import datetime
+from typing import Any
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rent import partitions
+from rent.models import RentEvent
+
+
+class Command(BaseCommand):
+    """
+    Create upcoming RentEvent partitions and drop the expired ones.
+
+    Expired rows of the default partition are deleted.
+    """
+    help = 'Create upcoming monthly RentEvent partitions and drop partitions past retention.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--ahead', type=int, default=3,
+            help='Number of months to create partitions for, starting with the current one.',
+        )
+        parser.add_argument(
+            '--retain', type=int, default=getattr(settings, 'RENT_EVENT_RETENTION_MONTHS', 12),
+            help='Number of past months to keep, besides the current one.',
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Only report what would be dropped.'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        connection = connections[options['database']]
+        current = partitions.month_start(datetime.date.today())
+        cutoff = partitions.add_months(current, -options['retain'])
+
+        if not partitions.is_partitioned(connection):
+            # Development databases have a plain table: fall back to DELETE.
+            expired = RentEvent.objects.using(connection.alias).filter(
+                createdAt__date__lt=cutoff
+            )
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {expired.count()} events before {cutoff}.')
+            else:
+                self.stdout.write(f'Deleted {expired.delete()[0]} events before {cutoff}.')
+            return
+
+        for offset in range(options['ahead']):
+            month = partitions.add_months(current, offset)
+            with transaction.atomic(using=connection.alias):
+                if partitions.create_partition(connection, month):
+                    self.stdout.write(f'Created {partitions.partition_name(month)}.')
+
+        for month, name in partitions.list_partitions(connection):
+            if month >= cutoff:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f'Would drop {name}.')
+                continue
+            with transaction.atomic(using=connection.alias):
+                partitions.drop_partition(connection, name)
+            self.stdout.write(f'Dropped {name}.')
+
+        default = partitions.DEFAULT_PARTITION
+        if options['dry_run']:
+            expired = partitions.count_expired_defaults(connection, cutoff)
+            self.stdout.write(f'Would delete {expired} events before {cutoff} from {default}.')
+        else:
+            deleted = partitions.delete_expired_defaults(connection, cutoff)
+            self.stdout.write(f'Deleted {deleted} events before {cutoff} from {default}.')
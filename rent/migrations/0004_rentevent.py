@@ -0,0 +1,78 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:53
+
+import datetime
+from django.db import migrations, models
+import django.utils.timezone
+from rent import partitions
+
+
+def create_table(apps, schema_editor):
+    '''
+    Create the RentEvent table, partitioned by month on Postgres.
+    '''
+    model = apps.get_model('rent', 'RentEvent')
+    connection = schema_editor.connection
+    if not partitions.is_partitioned(connection):
+        schema_editor.create_model(model)
+        return
+    # A partitioned table needs the partition key in its primary key.
+    schema_editor.execute(
+        'CREATE TABLE "rent_rentevent" ('
+        ' "id" bigint GENERATED BY DEFAULT AS IDENTITY,'
+        ' "rentId" varchar(255) NOT NULL,'
+        ' "lockerId" varchar(255) NOT NULL,'
+        ' "bloqId" varchar(255) NOT NULL,'
+        ' "size" varchar(2) NOT NULL,'
+        ' "eventType" varchar(10) NOT NULL,'
+        ' "status" varchar(20) NOT NULL,'
+        ' "createdAt" timestamp with time zone NOT NULL,'
+        ' PRIMARY KEY ("id", "createdAt")'
+        ') PARTITION BY RANGE ("createdAt")'
+    )
+    schema_editor.execute(
+        'CREATE INDEX "rent_rentevent_rentId_idx" ON "rent_rentevent" ("rentId")'
+    )
+    schema_editor.execute(
+        f'CREATE TABLE "{partitions.DEFAULT_PARTITION}" PARTITION OF "rent_rentevent" DEFAULT'
+    )
+    month = partitions.month_start(datetime.date.today())
+    for offset in range(3):
+        partitions.create_partition(connection, partitions.add_months(month, offset))
+
+
+def drop_table(apps, schema_editor):
+    '''
+    Drop the RentEvent table together with its partitions.
+    '''
+    schema_editor.delete_model(apps.get_model('rent', 'RentEvent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rent', '0003_rent_changeseq'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RentEvent',
+                    fields=[
+                        ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                        ('rentId', models.CharField(db_index=True, max_length=255)),
+                        ('lockerId', models.CharField(max_length=255)),
+                        ('bloqId', models.CharField(max_length=255)),
+                        ('size', models.CharField(choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], max_length=2)),
+                        ('eventType', models.CharField(choices=[('CREATED', 'Created'), ('DROPOFF', 'Dropoff'), ('PICKUP', 'Pickup')], max_length=10)),
+                        ('status', models.CharField(choices=[('CREATED', 'Created'), ('WAITING_DROPOFF', 'Waiting Dropoff'), ('WAITING_PICKUP', 'Waiting Pickup'), ('DELIVERED', 'Delivered')], max_length=20)),
+                        ('createdAt', models.DateTimeField(default=django.utils.timezone.now)),
+                    ],
+                    options={
+                        'ordering': ['id'],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_table, drop_table),
+    ]
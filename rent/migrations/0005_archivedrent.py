@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-19 01:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rent', '0004_rentevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRent',
+            fields=[
+                ('id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('lockerId', models.CharField(max_length=255)),
+                ('bloqId', models.CharField(db_index=True, max_length=255)),
+                ('weight', models.FloatField()),
+                ('size', models.CharField(choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], max_length=2)),
+                ('status', models.CharField(choices=[('CREATED', 'Created'), ('WAITING_DROPOFF', 'Waiting Dropoff'), ('WAITING_PICKUP', 'Waiting Pickup'), ('DELIVERED', 'Delivered')], max_length=20)),
+                ('changeSeq', models.BigIntegerField(default=0)),
+                ('archivedAt', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Moves Rents onto an integer surrogate key, keeping ``id`` as a unique column.
+
+from django.db import migrations, models
+from project_bloq import keys
+
+
+def convert(apps, schema_editor):
+    '''
+    Number the Rents.
+    '''
+    keys.convert(schema_editor, apps.get_model('rent', 'Rent'))
+
+
+class Migration(migrations.Migration):
+
+    # The conversion batches its updates and builds indexes concurrently on Postgres.
+    atomic = False
+
+    dependencies = [
+        ('rent', '0005_archivedrent'),
+        ('locker', '0006_locker_key'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='rent',
+                    name='key',
+                    field=models.BigAutoField(default=None, primary_key=True, serialize=False),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='rent',
+                    name='id',
+                    field=models.CharField(max_length=255, unique=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(convert),
+    ]
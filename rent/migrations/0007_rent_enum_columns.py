@@ -0,0 +1,170 @@
+# Stores the Rent status and size as small integers.
+#
+# Expands the table online on Postgres; the old columns are dropped by
+# 0009_rent_drop_old_columns once no running code reads them. The new columns
+# (status_code, size_code) are added next to the old ones, which become
+# nullable, and a trigger keeps both sets in sync with whichever the running
+# application writes. The new columns are then backfilled in batches and NOT
+# NULL is set after validating a check.
+
+from django.db import migrations, models, transaction
+import project_bloq.fields
+from project_bloq import operations
+
+# The values as of this migration.
+STATUSES = ['CREATED', 'WAITING_DROPOFF', 'WAITING_PICKUP', 'DELIVERED']
+SIZES = ['XS', 'S', 'M', 'L', 'XL']
+
+# Fills the columns the writer left out from the ones it wrote: code written
+# before this migration writes status and size, code written after it
+# status_code and size_code. The codes are the 1-based positions of STATUSES
+# and SIZES.
+CREATE_SYNC = '''
+CREATE OR REPLACE FUNCTION rent_enum_sync() RETURNS trigger AS $$
+DECLARE
+    statuses varchar[] := ARRAY['CREATED', 'WAITING_DROPOFF', 'WAITING_PICKUP', 'DELIVERED'];
+    sizes varchar[] := ARRAY['XS', 'S', 'M', 'L', 'XL'];
+BEGIN
+    IF TG_OP = 'INSERT' AND NEW."status" IS NOT NULL THEN
+        NEW."status_code" := array_position(statuses, NEW."status");
+    ELSIF TG_OP = 'INSERT' THEN
+        NEW."status" := statuses[NEW."status_code"];
+    ELSIF NEW."status" IS DISTINCT FROM OLD."status" THEN
+        NEW."status_code" := array_position(statuses, NEW."status");
+    ELSIF NEW."status_code" IS DISTINCT FROM OLD."status_code" THEN
+        NEW."status" := statuses[NEW."status_code"];
+    END IF;
+    IF TG_OP = 'INSERT' AND NEW."size" IS NOT NULL THEN
+        NEW."size_code" := array_position(sizes, NEW."size");
+    ELSIF TG_OP = 'INSERT' THEN
+        NEW."size" := sizes[NEW."size_code"];
+    ELSIF NEW."size" IS DISTINCT FROM OLD."size" THEN
+        NEW."size_code" := array_position(sizes, NEW."size");
+    ELSIF NEW."size_code" IS DISTINCT FROM OLD."size_code" THEN
+        NEW."size" := sizes[NEW."size_code"];
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS rent_enum_sync ON rent_rent;
+CREATE TRIGGER rent_enum_sync BEFORE INSERT OR UPDATE ON rent_rent
+    FOR EACH ROW EXECUTE PROCEDURE rent_enum_sync();
+'''
+DROP_SYNC = '''
+DROP TRIGGER IF EXISTS rent_enum_sync ON rent_rent;
+DROP FUNCTION IF EXISTS rent_enum_sync();
+'''
+
+
+def create_sync(apps, schema_editor):
+    '''
+    Keep the old and the new columns in sync with writes of the running application.
+    '''
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SYNC)
+
+
+def drop_sync(apps, schema_editor):
+    '''
+    Drop the sync trigger.
+    '''
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SYNC)
+
+
+def forwards(apps, schema_editor):
+    '''
+    Fill the small-integer columns from the old ones, in batches.
+    '''
+    Rent = apps.get_model('rent', 'Rent')
+    alias = schema_editor.connection.alias
+    for rents in operations.batches(Rent.objects.using(alias)):
+        with transaction.atomic(using=alias):
+            for status in STATUSES:
+                rents.filter(statusName=status).update(status=status)
+            for size in SIZES:
+                rents.filter(sizeName=size).update(size=size)
+
+
+def backwards(apps, schema_editor):
+    '''
+    Fill the old columns from the small-integer ones, in batches.
+    '''
+    Rent = apps.get_model('rent', 'Rent')
+    alias = schema_editor.connection.alias
+    for rents in operations.batches(Rent.objects.using(alias)):
+        with transaction.atomic(using=alias):
+            for status in STATUSES:
+                rents.filter(status=status).update(statusName=status)
+            for size in SIZES:
+                rents.filter(size=size).update(sizeName=size)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('rent', '0006_rent_key'),
+    ]
+
+    operations = [
+        # Rows inserted by the new code leave the old columns to the trigger.
+        migrations.AlterField(
+            model_name='rent',
+            name='size',
+            field=models.CharField(choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], max_length=2, null=True),
+        ),
+        migrations.AlterField(
+            model_name='rent',
+            name='status',
+            field=models.CharField(choices=[('CREATED', 'Created'), ('WAITING_DROPOFF', 'Waiting Dropoff'), ('WAITING_PICKUP', 'Waiting Pickup'), ('DELIVERED', 'Delivered')], max_length=20, null=True),
+        ),
+        # The old columns keep their names; their fields are renamed so the new
+        # ones can take the names.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name='rent',
+                    old_name='size',
+                    new_name='sizeName',
+                ),
+                migrations.AlterField(
+                    model_name='rent',
+                    name='sizeName',
+                    field=models.CharField(choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], db_column='size', max_length=2, null=True),
+                ),
+                migrations.RenameField(
+                    model_name='rent',
+                    old_name='status',
+                    new_name='statusName',
+                ),
+                migrations.AlterField(
+                    model_name='rent',
+                    name='statusName',
+                    field=models.CharField(choices=[('CREATED', 'Created'), ('WAITING_DROPOFF', 'Waiting Dropoff'), ('WAITING_PICKUP', 'Waiting Pickup'), ('DELIVERED', 'Delivered')], db_column='status', max_length=20, null=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rent',
+            name='size',
+            field=project_bloq.fields.EnumField(choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], db_column='size_code', null=True),
+        ),
+        migrations.AddField(
+            model_name='rent',
+            name='status',
+            field=project_bloq.fields.EnumField(choices=[('CREATED', 'Created'), ('WAITING_DROPOFF', 'Waiting Dropoff'), ('WAITING_PICKUP', 'Waiting Pickup'), ('DELIVERED', 'Delivered')], db_column='status_code', null=True),
+        ),
+        migrations.RunPython(create_sync, drop_sync),
+        migrations.RunPython(forwards, backwards),
+        operations.AlterFieldNotNull(
+            model_name='rent',
+            name='size',
+            field=project_bloq.fields.EnumField(choices=[('XS', 'Extra Small'), ('S', 'Small'), ('M', 'Medium'), ('L', 'Large'), ('XL', 'Extra Large')], db_column='size_code'),
+        ),
+        operations.AlterFieldNotNull(
+            model_name='rent',
+            name='status',
+            field=project_bloq.fields.EnumField(choices=[('CREATED', 'Created'), ('WAITING_DROPOFF', 'Waiting Dropoff'), ('WAITING_PICKUP', 'Waiting Pickup'), ('DELIVERED', 'Delivered')], db_column='status_code'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Stamps Rents with their transaction ID and orders the change feed by it.
+
+from django.db import migrations, models
+from project_bloq.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # The change feed index is built concurrently on Postgres.
+    atomic = False
+
+    dependencies = [
+        ('rent', '0007_rent_enum_columns'),
+        ('changes', '0003_change_sequence'),
+    ]
+
+    operations = [
+        # Existing rows keep transaction ID 0, so they sort before new changes
+        # in their current sequence order.
+        migrations.AddField(
+            model_name='rent',
+            name='changeXid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        AddIndexConcurrently(
+            model_name='rent',
+            index=models.Index(fields=['changeXid', 'changeSeq'], name='rent_change_idx'),
+        ),
+        migrations.AlterField(
+            model_name='rent',
+            name='changeSeq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
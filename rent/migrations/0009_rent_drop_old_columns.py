@@ -0,0 +1,34 @@
+# Drops the Rent status and size columns replaced by 0007_rent_enum_columns.
+#
+# Apply it only once every web server and worker runs code that reads the new
+# columns (see "Compact Enum Columns" in the README): code from before
+# 0007_rent_enum_columns still reads these columns.
+
+from importlib import import_module
+from django.db import migrations
+
+expand = import_module('rent.migrations.0007_rent_enum_columns')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('rent', '0008_rent_change_position'),
+    ]
+
+    operations = [
+        # Reversed, the columns are restored, the trigger syncs them again and
+        # they are backfilled from the new columns.
+        migrations.RunPython(migrations.RunPython.noop, expand.backwards),
+        migrations.RunPython(expand.drop_sync, expand.create_sync),
+        migrations.RemoveField(
+            model_name='rent',
+            name='sizeName',
+        ),
+        migrations.RemoveField(
+            model_name='rent',
+            name='statusName',
+        ),
+    ]
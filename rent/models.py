@@ -1,8 +1,12 @@
 '''
 This file contains the model for the Rent object.
 '''
-from django.db import models
+from collections import defaultdict
+from django.db import models, router
+from django.utils import timezone
+from changes.models import ChangeStampedModel, ChangeStampedQuerySet
 from locker.models import Locker,LockerSize
+from project_bloq.fields import EnumField
 
 class RentStatus(models.TextChoices):
     '''
@@ -13,17 +17,124 @@ class RentStatus(models.TextChoices):
     WAITING_PICKUP = 'WAITING_PICKUP', 'Waiting Pickup'
     DELIVERED = 'DELIVERED', 'Delivered'
 
-class Rent(models.Model):
+class Rent(ChangeStampedModel):
     '''
     Model for Rent object
     '''
-    id = models.CharField(max_length=255, primary_key=True)
+    key = models.BigAutoField(primary_key=True)
+    id = models.CharField(max_length=255, unique=True)
     lockerId = models.ForeignKey(Locker, on_delete=models.CASCADE)
     weight = models.FloatField()
+    size = EnumField(choices=LockerSize.choices, db_column='size_code')
+    status = EnumField(choices=RentStatus.choices, db_column='status_code')
+
+    objects = ChangeStampedQuerySet.as_manager()
+
+    class Meta:
+        '''
+        Meta class for Rent.
+        '''
+        indexes = [
+            # Change feed order.
+            models.Index(fields=['changeXid', 'changeSeq'], name='rent_change_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rent {self.id} - {self.status}"
+
+
+class RentEventType(models.TextChoices):
+    '''
+    Enum for Rent lifecycle transitions
+    '''
+    CREATED = 'CREATED', 'Created'
+    DROPOFF = 'DROPOFF', 'Dropoff'
+    PICKUP = 'PICKUP', 'Pickup'
+
+
+class RentEvent(models.Model):
+    '''
+    Append-only log entry for a Rent transition.
+
+    Entries are written in the same transaction as the transition and never
+    updated. On Postgres the table is range-partitioned by month on
+    ``createdAt`` (see ``manage.py rent_event_partitions``), so old months are
+    removed by dropping partitions. Rent, Locker and Bloq are referenced by ID
+    only, so the log outlives the rows it describes.
+    '''
+    id = models.BigAutoField(primary_key=True)
+    rentId = models.CharField(max_length=255, db_index=True)
+    lockerId = models.CharField(max_length=255)
+    bloqId = models.CharField(max_length=255)
+    size = models.CharField(max_length=2, choices=LockerSize.choices)
+    eventType = models.CharField(max_length=10, choices=RentEventType.choices)
+    status = models.CharField(max_length=20, choices=RentStatus.choices)
+    createdAt = models.DateTimeField(default=timezone.now)
+
+    objects = models.Manager()
+
+    class Meta:
+        '''
+        Meta class for RentEvent.
+        '''
+        ordering = ['id']
+
+    def __str__(self):
+        return f"RentEvent {self.id} - {self.rentId} {self.eventType}"
+
+    @classmethod
+    def record(cls, rents, event_type):
+        '''
+        Append one event per Rent, describing its current status.
+
+        Must be called inside the transaction of the transition. Events are
+        written to the database of their Rent. The Rents should come with their
+        Locker and Bloq loaded (``select_related('lockerId__bloqId')``).
+        '''
+        now = timezone.now()
+        batches = defaultdict(list)
+        for rent in rents:
+            batches[router.db_for_write(cls, instance=rent)].append(cls(
+                rentId=rent.id,
+                lockerId=rent.lockerId.id,
+                bloqId=rent.lockerId.bloqId.id,
+                size=rent.size,
+                eventType=event_type,
+                status=rent.status,
+                createdAt=now,
+            ))
+        return [
+            event
+            for using, events in batches.items()
+            for event in cls.objects.using(using).bulk_create(events)
+        ]
+
+
+class ArchivedRent(models.Model):
+    '''
+    Cold storage for DELIVERED Rents.
+
+    Delivered Rents never change again, so ``manage.py archive_rents`` moves
+    them out of the live table in small batches, keeping the Rent table and its
+    indexes down to the active Rents. The Locker and Bloq are referenced by ID
+    only, so archived Rents outlive them.
+    '''
+    id = models.CharField(max_length=255, primary_key=True)
+    lockerId = models.CharField(max_length=255)
+    bloqId = models.CharField(max_length=255, db_index=True)
+    weight = models.FloatField()
     size = models.CharField(max_length=2, choices=LockerSize.choices)
     status = models.CharField(max_length=20, choices=RentStatus.choices)
+    changeSeq = models.BigIntegerField(default=0)
+    archivedAt = models.DateTimeField(default=timezone.now)
 
     objects = models.Manager()
 
+    class Meta:
+        '''
+        Meta class for ArchivedRent.
+        '''
+        ordering = ['id']
+
     def __str__(self):
-        return f"Rent {self.id} - {self.status}"
+        return f"ArchivedRent {self.id} - {self.status}"
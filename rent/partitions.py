@@ -0,0 +1,166 @@
+"""
+Monthly partition management for the RentEvent log.
+
+On Postgres ``rent_rentevent`` is range-partitioned on ``createdAt`` with one
+partition per calendar month (``rent_rentevent_p2024_05``) and a default
+partition catching rows outside every month range. Partitions are created ahead
+of time and expired by detaching and dropping them, which is a metadata change
+instead of a bulk DELETE competing with the transition path. Only the expired
+rows of the default partition, which is never dropped, are deleted, in batches.
+"""
+
+import datetime
+import re
+from typing import List, Tuple
+from django.db import transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+TABLE = 'rent_rentevent'
+DEFAULT_PARTITION = f'{TABLE}_default'
+re_partition = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+DELETE_BATCH_SIZE = 10000
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    """
+    Return the first day of the month of the given date.
+    """
+    return day.replace(day=1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    """
+    Return the first day of the month ``months`` after the given month.
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    """
+    Return the name of the partition holding the given month.
+    """
+    return f'{TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def is_partitioned(connection: BaseDatabaseWrapper) -> bool:
+    """
+    Check whether the RentEvent table is partitioned on this database.
+    """
+    return connection.vendor == 'postgresql'
+
+
+def create_partition(connection: BaseDatabaseWrapper, month: datetime.date) -> bool:
+    """
+    Create the partition of the given month if it does not exist yet.
+
+    Rows of the month already in the default partition (written before the
+    partition existed, e.g. after a missed run) would make ``CREATE TABLE ...
+    PARTITION OF`` fail. The month's table is therefore created standalone,
+    those rows are moved into it and it is then attached; a check constraint
+    matching its range spares ``ATTACH PARTITION`` a scan of the new table.
+    Inserts into the default partition wait until the transaction ends, reads
+    do not. Must run inside a transaction.
+
+    Returns:
+        bool: True if the partition was created.
+    """
+    name = partition_name(month)
+    if name in dict(list_partitions(connection)).values():
+        return False
+    quote = connection.ops.quote_name
+    created = quote('createdAt')
+    bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+    with connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(DEFAULT_PARTITION)} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'ALTER TABLE {quote(name)} ADD CONSTRAINT {quote(name + "_range")} '
+            f'CHECK ({created} >= %s AND {created} < %s)',
+            bounds,
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)}'
+            f' WHERE {created} >= %s AND {created} < %s RETURNING *)'
+            f' INSERT INTO {quote(name)} SELECT * FROM moved',
+            bounds,
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            bounds,
+        )
+        cursor.execute(f'ALTER TABLE {quote(name)} DROP CONSTRAINT {quote(name + "_range")}')
+    return True
+
+
+def list_partitions(connection: BaseDatabaseWrapper) -> List[Tuple[datetime.date, str]]:
+    """
+    Return the monthly partitions as (month, name) pairs, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s',
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = re_partition.match(name)
+        if match:
+            months.append((datetime.date(int(match[1]), int(match[2]), 1), name))
+    return sorted(months)
+
+
+def drop_partition(connection: BaseDatabaseWrapper, name: str) -> None:
+    """
+    Detach a partition and drop it.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}')
+        cursor.execute(f'DROP TABLE {quote(name)}')
+
+
+def count_expired_defaults(connection: BaseDatabaseWrapper, cutoff: datetime.date) -> int:
+    """
+    Count the rows of the default partition created before the cutoff.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT count(*) FROM {quote(DEFAULT_PARTITION)} WHERE {quote("createdAt")} < %s',
+            [cutoff.isoformat()],
+        )
+        return cursor.fetchone()[0]
+
+
+def delete_expired_defaults(connection: BaseDatabaseWrapper, cutoff: datetime.date,
+                            batch_size: int = DELETE_BATCH_SIZE) -> int:
+    """
+    Delete the rows of the default partition created before the cutoff.
+
+    Rows outside every monthly range (written before their month's partition
+    was created, or back-dated) land in the default partition. Each batch is
+    deleted in its own short transaction.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    quote = connection.ops.quote_name
+    deleted = 0
+    while True:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote(DEFAULT_PARTITION)} WHERE ctid IN ('
+                f' SELECT ctid FROM {quote(DEFAULT_PARTITION)}'
+                f' WHERE {quote("createdAt")} < %s LIMIT %s)',
+                [cutoff.isoformat(), batch_size],
+            )
+            count = cursor.rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
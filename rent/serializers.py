@@ -6,27 +6,48 @@ and a list serializer for handling bulk operations.
 """
 
 from typing import List, Dict, Any
-from django.db import transaction
 from rest_framework import serializers
-from .models import Rent
+from locker.models import Locker
+from project_bloq import sharding
+from project_bloq.serializers import DynamicFieldsModelSerializer
+from .models import ArchivedRent, Rent
 
 
-class RentSerializer(serializers.ModelSerializer):
+class RentSerializer(DynamicFieldsModelSerializer):
     """
     Serializer for the Rent model.
 
     This serializer handles the serialization and deserialization of Rent instances.
-    It includes all fields of the Rent model.
+    It includes all public fields of the Rent model.
     """
 
     class Meta:
         """
         Meta class for RentSerializer.
 
-        Specifies the model to serialize and the fields to include.
+        Specifies the model to serialize and the fields to exclude.
         """
         model = Rent
-        fields = '__all__'
+        exclude = ['key', 'changeSeq']
+        # The event log records the Locker's Bloq, so load it along.
+        extra_kwargs = {'lockerId': {'queryset': Locker.objects.select_related('bloqId')}}
+
+
+class ArchivedRentSerializer(DynamicFieldsModelSerializer):
+    """
+    Read-only serializer for archived Rents.
+
+    Renders the same fields as RentSerializer, plus the Bloq ID and the time
+    the Rent was archived.
+    """
+
+    class Meta:
+        """
+        Meta class for ArchivedRentSerializer.
+        """
+        model = ArchivedRent
+        fields = ['id', 'weight', 'size', 'status', 'lockerId', 'bloqId', 'archivedAt']
+        read_only_fields = fields
 
 
 class RentListSerializer(serializers.ListSerializer):
@@ -38,7 +59,7 @@ class RentListSerializer(serializers.ListSerializer):
 
     child = RentSerializer()
 
-    @transaction.atomic
+    @sharding.atomic()
     def create(self, validated_data: List[Dict[str, Any]]) -> List[Rent]:
         """
         Create multiple Rent instances.
@@ -58,7 +79,7 @@ class RentListSerializer(serializers.ListSerializer):
             instances.append(instance)
         return instances
 
-    @transaction.atomic
+    @sharding.atomic()
     def update(self, instances: List[Rent], validated_data: List[Dict[str, Any]]) -> List[Rent]:
         """
         Update multiple Rent instances.
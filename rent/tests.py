@@ -1,3 +1,7 @@
+import datetime
+import json
+import time
+from io import StringIO
 from django.test import TestCase
 from rest_framework.test import APITestCase
 from django.urls import reverse
@@ -5,7 +9,14 @@ from locker.models import Locker, LockerStatus
 from bloq.models import Bloq
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
-from .models import Rent, RentStatus, LockerSize as RentSize
+from project_bloq.events import bloq_channel, get_broker
+from project_bloq.idempotency import KeepAlive, get_idempotency_store
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from . import partitions
+from .models import ArchivedRent, Rent, RentEvent, RentEventType, RentStatus, LockerSize as RentSize
+from .serializers import RentSerializer
 
 class RentModelTest(TestCase):
     def setUp(self):
@@ -66,6 +77,11 @@ class RentAPITest(APITestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(Rent.objects.count(), 2)
 
+    def test_create_multiple_rents_msgpack(self):
+        response = self.client.post(self.url, self.rent_data, format='msgpack')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Rent.objects.count(), 2)
+
     def test_get_rent_list(self):
         # Primeiro, cria alguns Rents
         Rent.objects.create(
@@ -86,6 +102,9 @@ class RentAPITest(APITestCase):
         response = self.client.get(self.url, format='json')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['count'], 2)
+        expected = RentSerializer(Rent.objects.order_by('id'), many=True).data
+        self.assertEqual(response.data['results'], expected)
+        self.assertIsInstance(response.data['results'][1]['weight'], float)
 
     def test_dropoff_rent(self):
         rent = Rent.objects.create(
@@ -103,6 +122,26 @@ class RentAPITest(APITestCase):
         locker = Locker.objects.get(id=self.locker.id)
         self.assertTrue(locker.isOccupied)
 
+    def test_dropoff_publishes_locker_event(self):
+        rent = Rent.objects.create(
+            id="1",
+            lockerId=self.locker,
+            weight=10.5,
+            size=RentSize.M,
+            status=RentStatus.WAITING_DROPOFF
+        )
+        received = []
+        subscription = get_broker().subscribe(bloq_channel(self.bloq.id), received.append)
+        self.addCleanup(subscription.close)
+        url = reverse('rent-dropoff', kwargs={'version': 'v1', 'id': rent.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {}, format='json')
+        self.assertEqual(len(received), 1)
+        event = json.loads(received[0])
+        self.assertEqual(event['id'], self.locker.id)
+        self.assertEqual(event['status'], LockerStatus.CLOSED)
+        self.assertTrue(event['isOccupied'])
+
     def test_pickup_rent(self):
         rent = Rent.objects.create(
             id="1",
@@ -118,4 +157,189 @@ class RentAPITest(APITestCase):
         self.assertEqual(rent.status, RentStatus.DELIVERED)
         locker = Locker.objects.get(id=self.locker.id)
         self.assertFalse(locker.isOccupied)
-        self.assertEqual(locker.status, LockerStatus.OPEN)
\ No newline at end of file
+        self.assertEqual(locker.status, LockerStatus.OPEN)
+
+    def test_export_rents_by_bloq(self):
+        other_bloq = Bloq.objects.create(id="2", title="Bloq B", address="Endereço B")
+        other_locker = Locker.objects.create(
+            id="2", bloqId=other_bloq, status=LockerStatus.OPEN, isOccupied=False
+        )
+        Rent.objects.create(
+            id="1", lockerId=self.locker, weight=1.0, size=RentSize.M, status=RentStatus.CREATED
+        )
+        Rent.objects.create(
+            id="2", lockerId=other_locker, weight=2.0, size=RentSize.S, status=RentStatus.CREATED
+        )
+        url = reverse('rent-export', kwargs={'version': 'v1'})
+        response = self.client.get(url, {'bloqId': other_bloq.id})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['id'], '2')
+
+
+class RentEventLogTest(APITestCase):
+    def setUp(self):
+        self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Endereço A")
+        self.locker = Locker.objects.create(id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_lifecycle_is_logged(self):
+        url = reverse('rent-list-create', kwargs={'version': 'v1'})
+        rent_data = [{"id": "1", "lockerId": "1", "weight": 1.0, "size": "M", "status": "CREATED"}]
+        self.client.post(url, rent_data, format='json')
+        self.client.patch(reverse('rent-dropoff', kwargs={'version': 'v1', 'id': '1'}), {}, format='json')
+        self.client.patch(reverse('rent-pickup', kwargs={'version': 'v1', 'id': '1'}), {}, format='json')
+        events = list(RentEvent.objects.values_list('rentId', 'bloqId', 'eventType', 'status'))
+        self.assertEqual(events, [
+            ('1', '1', RentEventType.CREATED, RentStatus.WAITING_DROPOFF),
+            ('1', '1', RentEventType.DROPOFF, RentStatus.WAITING_PICKUP),
+            ('1', '1', RentEventType.PICKUP, RentStatus.DELIVERED),
+        ])
+
+    def test_failed_bulk_create_is_not_logged(self):
+        url = reverse('rent-list-create', kwargs={'version': 'v1'})
+        rent_data = [{"id": "1", "lockerId": "1", "weight": "heavy", "size": "M", "status": "CREATED"}]
+        response = self.client.post(url, rent_data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RentEvent.objects.exists())
+
+    def test_retention_removes_expired_events(self):
+        rent = Rent.objects.create(id="1", lockerId=self.locker, weight=1.0, size=RentSize.M,
+                                   status=RentStatus.CREATED)
+        RentEvent.record([rent], RentEventType.CREATED)
+        RentEvent.objects.update(createdAt=timezone.now() - datetime.timedelta(days=800))
+        RentEvent.record([rent], RentEventType.CREATED)
+        if partitions.is_partitioned(connection):
+            # No monthly partition covers the expired event: it sits in the default one.
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT count(*) FROM "{partitions.DEFAULT_PARTITION}"')
+                self.assertEqual(cursor.fetchone()[0], 1)
+        out = StringIO()
+        call_command('rent_event_partitions', retain=12, stdout=out)
+        self.assertEqual(RentEvent.objects.count(), 1)
+        self.assertIn('Deleted 1 events', out.getvalue())
+
+    def test_partition_takes_over_its_rows_from_the_default_partition(self):
+        if not partitions.is_partitioned(connection):
+            self.skipTest("Only Postgres partitions the RentEvent table.")
+        month = partitions.month_start(datetime.date.today())
+        name = partitions.partition_name(month)
+        partitions.drop_partition(connection, name)
+        rent = Rent.objects.create(id="1", lockerId=self.locker, weight=1.0, size=RentSize.M,
+                                   status=RentStatus.CREATED)
+        RentEvent.record([rent], RentEventType.CREATED)
+        out = StringIO()
+        call_command('rent_event_partitions', ahead=1, stdout=out)
+        self.assertIn(f'Created {name}.', out.getvalue())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{partitions.DEFAULT_PARTITION}"')
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute(f'SELECT count(*) FROM "{name}"')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(RentEvent.objects.get().rentId, '1')
+
+
+class IdempotencyKeyTest(APITestCase):
+    def setUp(self):
+        self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Endereço A")
+        self.locker = Locker.objects.create(id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('rent-list-create', kwargs={'version': 'v1'})
+        self.rent_data = [{"id": "1", "lockerId": "1", "weight": 1.0, "size": "M", "status": "CREATED"}]
+
+    def test_retried_create_is_replayed(self):
+        first = self.client.post(self.url, self.rent_data, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(first.status_code, 201)
+        second = self.client.post(self.url, self.rent_data, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(RentEvent.objects.count(), 1)
+
+    def test_retried_dropoff_is_replayed(self):
+        Rent.objects.create(id="1", lockerId=self.locker, weight=1.0, size=RentSize.M,
+                            status=RentStatus.WAITING_DROPOFF)
+        url = reverse('rent-dropoff', kwargs={'version': 'v1', 'id': '1'})
+        for _ in range(2):
+            response = self.client.patch(url, {}, format='json', HTTP_IDEMPOTENCY_KEY='k2')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(RentEvent.objects.filter(eventType=RentEventType.DROPOFF).count(), 1)
+
+    def test_key_reused_for_other_request(self):
+        self.client.post(self.url, self.rent_data, format='json', HTTP_IDEMPOTENCY_KEY='k3')
+        self.rent_data[0]['id'] = '2'
+        response = self.client.post(self.url, self.rent_data, format='json', HTTP_IDEMPOTENCY_KEY='k3')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Rent.objects.filter(id='2').exists())
+
+    def test_keys_are_scoped_to_credentials(self):
+        self.client.post(self.url, self.rent_data, format='json', HTTP_IDEMPOTENCY_KEY='k4')
+        other = Token.objects.create(user=User.objects.create_user(username='other', password='pass'))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + other.key)
+        response = self.client.post(self.url, self.rent_data, format='json', HTTP_IDEMPOTENCY_KEY='k4')
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_reservation_is_kept_while_the_request_runs(self):
+        store = get_idempotency_store()
+        self.assertTrue(store.reserve('k5', b'first', 0.3))
+        keep_alive = KeepAlive(store, 'k5', b'first', 0.3)
+        keep_alive.start()
+        time.sleep(0.6)
+        self.assertFalse(store.reserve('k5', b'retry', 0.3))
+        keep_alive.stop()
+        store.release('k5', b'retry')
+        self.assertEqual(store.get('k5'), b'first')
+        store.release('k5', b'first')
+        self.assertTrue(store.reserve('k5', b'retry', 0.3))
+
+
+class RentArchiveTest(APITestCase):
+    def setUp(self):
+        self.bloq = Bloq.objects.create(id="1", title="Bloq A", address="Endereço A")
+        self.locker = Locker.objects.create(id="1", bloqId=self.bloq, status=LockerStatus.OPEN, isOccupied=False)
+        for i, status in enumerate([RentStatus.DELIVERED, RentStatus.WAITING_PICKUP,
+                                    RentStatus.DELIVERED, RentStatus.DELIVERED]):
+            Rent.objects.create(id=str(i), lockerId=self.locker, weight=1.0, size=RentSize.M,
+                                status=status)
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_delivered_rents_are_moved_in_batches(self):
+        out = StringIO()
+        call_command('archive_rents', batch_size=2, stdout=out)
+        self.assertIn('Archived 3 rents', out.getvalue())
+        self.assertEqual(list(Rent.objects.values_list('id', flat=True)), ['1'])
+        archived = ArchivedRent.objects.get(id='2')
+        self.assertEqual((archived.lockerId, archived.bloqId, archived.status),
+                         ('1', '1', RentStatus.DELIVERED))
+
+    def test_reused_ids_are_not_overwritten(self):
+        ArchivedRent.objects.create(id='2', lockerId='old', bloqId='old', weight=2.0,
+                                    size=RentSize.L, status=RentStatus.DELIVERED)
+        out, err = StringIO(), StringIO()
+        call_command('archive_rents', batch_size=1, stdout=out, stderr=err)
+        self.assertIn('Archived 2 rents', out.getvalue())
+        self.assertIn('Kept 1 delivered rents', err.getvalue())
+        self.assertEqual(list(Rent.objects.order_by('id').values_list('id', flat=True)), ['1', '2'])
+        self.assertEqual(ArchivedRent.objects.get(id='2').lockerId, 'old')
+
+    def test_archive_is_read_only_on_request(self):
+        call_command('archive_rents', stdout=StringIO())
+        response = self.client.get(reverse('rent-list-create', kwargs={'version': 'v1'}))
+        self.assertEqual([rent['id'] for rent in response.data['results']], ['1'])
+        response = self.client.get(reverse('rent-archived', kwargs={'version': 'v1'}),
+                                   {'bloqId': '1', 'fields': 'id,status,bloqId'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': rent_id, 'status': RentStatus.DELIVERED, 'bloqId': '1'} for rent_id in '023'
+        ])
+        response = self.client.get(reverse('rent-archived', kwargs={'version': 'v1'}),
+                                   {'bloqId': 'other'})
+        self.assertEqual(response.data['count'], 0)
@@ -1,8 +1,12 @@
 from django.urls import path
-from .views import RentBulkCreateView, RentDropoffView, RentPickupView
+from .views import (
+    ArchivedRentListView, RentBulkCreateView, RentDropoffView, RentPickupView, RentExportView
+)
 
 urlpatterns = [
     path('', RentBulkCreateView.as_view(), name='rent-list-create'),
+    path('export/', RentExportView.as_view(), name='rent-export'),
+    path('archived/', ArchivedRentListView.as_view(), name='rent-archived'),
     path('<str:id>/dropoff/', RentDropoffView.as_view(), name='rent-dropoff'),
     path('<str:id>/pickup/', RentPickupView.as_view(), name='rent-pickup'),
 ]
@@ -2,26 +2,38 @@
 Views for the Rent app.
 
 This module contains API views for managing Rent instances, including listing,
-creating multiple rents, handling rent drop-offs, and processing rent pickups.
+creating multiple rents, handling rent drop-offs, processing rent pickups and
+listing archived rents.
 """
 
 import logging
-from typing import Any, Type
+from typing import Any, Optional, Type
+from django.db import transaction
+from django.db.models import QuerySet
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.request import Request
+from rest_framework.serializers import BaseSerializer
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from locker.models import Locker, LockerStatus
-from .models import Rent, RentStatus
-from .serializers import RentSerializer, RentListSerializer
+from jobs.mixins import DeferrableMixin
+from jobs.serializers import JobSerializer
+from project_bloq.exports import ExportView
+from project_bloq import sharding
+from project_bloq.mixins import ShardedObjectMixin, ValuesListMixin
+from project_bloq.pagination import EstimatedCountPagination
+from project_bloq.swagger import ASYNC_PARAMETER, FIELDS_PARAMETER, IDEMPOTENCY_KEY_PARAMETER
+from locker.events import publish_locker_changes
+from locker.models import Locker, LockerState, LockerStatus
+from .models import ArchivedRent, Rent, RentEvent, RentEventType, RentStatus
+from .serializers import ArchivedRentSerializer, RentSerializer, RentListSerializer
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 
-class StandardResultsSetPagination(PageNumberPagination):
+class StandardResultsSetPagination(EstimatedCountPagination):
     """
     Standard pagination class for Rent views.
 
@@ -35,16 +47,19 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size: int = 100
 
 
-class RentBulkCreateView(generics.ListCreateAPIView):
+class RentBulkCreateView(DeferrableMixin, ValuesListMixin, generics.ListCreateAPIView):
     """
     API view to list all Rents or create multiple Rents at once.
 
     - **GET**: Returns a paginated list of all Rent instances.
     - **POST**: Allows bulk creation of multiple Rent instances.
+      With ``?async=true`` the creation runs as a background job (202).
     """
     queryset = Rent.objects.all().order_by('id')
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    idempotent_methods = ['POST']
+    throttle_scope = 'bulk_write'
 
     def get_serializer_class(self) -> Type[RentSerializer]:
         """
@@ -59,7 +74,8 @@ class RentBulkCreateView(generics.ListCreateAPIView):
         return RentSerializer
 
     @swagger_auto_schema(
-        responses={200: RentSerializer(many=True)}
+        responses={200: RentSerializer(many=True)},
+        manual_parameters=[FIELDS_PARAMETER]
     )
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -73,8 +89,10 @@ class RentBulkCreateView(generics.ListCreateAPIView):
 
     @swagger_auto_schema(
         request_body=RentListSerializer,
-        responses={201: RentSerializer(many=True)}
+        responses={201: RentSerializer(many=True), 202: JobSerializer},
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER, ASYNC_PARAMETER]
     )
+    @sharding.atomic()
     def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
         Handle POST requests to create multiple Rents.
@@ -85,31 +103,52 @@ class RentBulkCreateView(generics.ListCreateAPIView):
             - Response: The created Rent instances.
         """
         logger.info("User '%s' is creating multiple Rents.", request.user.id)
+        deferred = self.defer(request)
+        if deferred is not None:
+            logger.info(
+                "User '%s' queued the creation of Rents as Job '%s'.",
+                request.user.id, deferred.data['id']
+            )
+            return deferred
         # Change the status of the lockers to 'OPEN' and 'isOccupied' to False
+        locker_ids = []
         for rent_data in request.data:
-            locker_id = rent_data['lockerId']
-            Locker.objects.filter(id=locker_id).update(status=LockerStatus.OPEN, isOccupied=False)
             rent_data['status'] = RentStatus.WAITING_DROPOFF
-            logger.debug("Updated Locker ID '%s' to status OPEN and isOccupied False.", locker_id)
+            locker_ids.append(rent_data['lockerId'])
+        lockers = sharding.each_shard(Locker.objects.filter(id__in=locker_ids))
+        for queryset in lockers:
+            queryset.update(state=LockerState.AVAILABLE)
+        logger.debug("Updated Lockers %s to status OPEN and isOccupied False.", locker_ids)
         response = super().post(request, *args, **kwargs)
+        for queryset in lockers:
+            publish_locker_changes(queryset.select_related('bloqId'))
         logger.info("User '%s' successfully created Rents.", request.user.id)
         return response
 
+    def perform_create(self, serializer: BaseSerializer) -> None:
+        """
+        Save the Rents and append their creation to the event log.
+        """
+        RentEvent.record(serializer.save(), RentEventType.CREATED)
+
 
-class RentDropoffView(generics.UpdateAPIView):
+class RentDropoffView(ShardedObjectMixin, generics.UpdateAPIView):
     """
     API view for processing a Rent drop-off.
 
     - **PATCH**: Updates the Rent and associated Locker statuses to reflect a drop-off.
     """
     permission_classes = [IsAuthenticated]
-    queryset = Rent.objects.all()
+    queryset = Rent.objects.select_related('lockerId__bloqId')
     serializer_class = RentSerializer
     lookup_field: str = 'id'
+    idempotent_methods = ['PATCH']
+    throttle_scope = 'transition'
 
     @swagger_auto_schema(
         request_body=RentSerializer,
-        responses={200: RentSerializer}
+        responses={200: RentSerializer},
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER]
     )
     def patch(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -125,32 +164,40 @@ class RentDropoffView(generics.UpdateAPIView):
         rent_id = kwargs.get('id')
         logger.info("User '%s' is processing drop-off for Rent ID '%s'.", request.user.id, rent_id)
         rent = self.get_object()
-        locker = rent.lockerId
-        locker.status = LockerStatus.CLOSED
-        locker.isOccupied = True
-        locker.save()
-        logger.debug("Updated Locker ID '%s' to status CLOSED and isOccupied True.", locker.id)
-        rent.status = RentStatus.WAITING_PICKUP
-        rent.save()
+        with transaction.atomic(using=sharding.instance_shard(rent)):
+            locker = rent.lockerId
+            locker.status = LockerStatus.CLOSED
+            locker.isOccupied = True
+            locker.save()
+            publish_locker_changes([locker])
+            logger.debug(
+                "Updated Locker ID '%s' to status CLOSED and isOccupied True.", locker.id
+            )
+            rent.status = RentStatus.WAITING_PICKUP
+            rent.save()
+            RentEvent.record([rent], RentEventType.DROPOFF)
         logger.info("Rent ID '%s' status updated to WAITING_PICKUP.", rent_id)
         serializer = self.get_serializer(rent)
         return Response(serializer.data)
 
 
-class RentPickupView(generics.UpdateAPIView):
+class RentPickupView(ShardedObjectMixin, generics.UpdateAPIView):
     """
     API view for processing a Rent pickup.
 
     - **PATCH**: Updates the Rent and associated Locker statuses to reflect a pickup.
     """
     permission_classes = [IsAuthenticated]
-    queryset = Rent.objects.all()
+    queryset = Rent.objects.select_related('lockerId__bloqId')
     serializer_class = RentSerializer
     lookup_field: str = 'id'
+    idempotent_methods = ['PATCH']
+    throttle_scope = 'transition'
 
     @swagger_auto_schema(
         request_body=RentSerializer,
-        responses={200: RentSerializer}
+        responses={200: RentSerializer},
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER]
     )
     def patch(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -166,13 +213,85 @@ class RentPickupView(generics.UpdateAPIView):
         rent_id = kwargs.get('id')
         logger.info("User '%s' is processing pickup for Rent ID '%s'.", request.user.id, rent_id)
         rent = self.get_object()
-        locker = rent.lockerId
-        locker.status = LockerStatus.OPEN
-        locker.isOccupied = False
-        locker.save()
-        logger.debug("Updated Locker ID '%s' to status OPEN and isOccupied False.", locker.id)
-        rent.status = RentStatus.DELIVERED
-        rent.save()
+        with transaction.atomic(using=sharding.instance_shard(rent)):
+            locker = rent.lockerId
+            locker.status = LockerStatus.OPEN
+            locker.isOccupied = False
+            locker.save()
+            publish_locker_changes([locker])
+            logger.debug(
+                "Updated Locker ID '%s' to status OPEN and isOccupied False.", locker.id
+            )
+            rent.status = RentStatus.DELIVERED
+            rent.save()
+            RentEvent.record([rent], RentEventType.PICKUP)
         logger.info("Rent ID '%s' status updated to DELIVERED.", rent_id)
         serializer = self.get_serializer(rent)
         return Response(serializer.data)
+
+
+class ArchivedRentListView(ValuesListMixin, generics.ListAPIView):
+    """
+    API view to list archived Rents.
+
+    Delivered Rents are moved out of the live table by ``manage.py archive_rents``;
+    this is the only view reading them.
+
+    - **GET**: Returns a paginated list of archived Rents, optionally filtered by
+      Bloq ID ('bloqId').
+    """
+    queryset = ArchivedRent.objects.all().order_by('id')
+    serializer_class = ArchivedRentSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+
+    def get_shard_key(self) -> Optional[str]:
+        """
+        Read from the shard of the Bloq when filtering by Bloq ID.
+        """
+        return self.request.query_params.get('bloqId') or None
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Get the queryset of archived Rents, filtered by the 'bloqId' query parameter.
+        """
+        queryset = super().get_queryset()
+        bloq_id = self.request.query_params.get('bloqId')
+        if bloq_id:
+            queryset = queryset.filter(bloqId=bloq_id)
+        return queryset
+
+    @swagger_auto_schema(
+        responses={200: ArchivedRentSerializer(many=True)},
+        manual_parameters=[
+            openapi.Parameter(
+                'bloqId',
+                openapi.IN_QUERY,
+                description="Filter by Bloq ID",
+                type=openapi.TYPE_STRING
+            ),
+            FIELDS_PARAMETER,
+        ]
+    )
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests to list archived Rents.
+
+        Returns:
+            - Response: A paginated list of archived Rents.
+        """
+        logger.info("User '%s' requested a list of archived Rents.", request.user.id)
+        return super().get(request, *args, **kwargs)
+
+
+class RentExportView(ExportView):
+    """
+    API view to export all Rents.
+
+    - **GET**: Streams every Rent as NDJSON (default) or CSV, optionally filtered
+      by Bloq ID ('bloqId') and status ('status').
+    """
+    queryset = Rent.objects.all().order_by('id')
+    serializer_class = RentSerializer
+    export_name = 'rents'
+    export_filters = {'bloqId': 'lockerId__bloqId__id', 'status': 'status'}